@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # infer_zero123.py  (roomie-interior 루트)
 
-import argparse, os, gc, sys, math
+import argparse, os, gc, sys, math, json
 from pathlib import Path
 import torch
 from PIL import Image
@@ -32,56 +32,118 @@ def load_model(cfg_path, ckpt_path):
     return model.to(device).eval()
 
 # ── 실행 루틴 ────────────────────────────────────────────────────
-def main(a):
-    model    = load_model(a.config, a.checkpoint)
-    sampler  = DDIMSampler(model)
+def render_views(model, sampler, input_path, poses, outputs, size=256):
+    """한 장의 가구 이미지로 여러 (yaw, pitch) 뷰를 한 번의 배치 DDIM 으로 생성
+
+    encode_first_stage / get_learned_conditioning 은 한 번만 계산하고
+    ray map 만 포즈 개수만큼 쌓아서 batch 로 샘플링한다.
+    """
+    n = len(poses)
 
-    # 1. RGB → latent (4×32×32)
-    img = Image.open(a.input).convert("RGB").resize((a.size, a.size))
+    # 1. RGB → latent (4×32×32) — 한 번만 인코딩
+    img = Image.open(input_path).convert("RGB").resize((size, size))
     x   = to_tensor(img).unsqueeze(0).to(device) * 2.0 - 1.0
-    z   = model.get_first_stage_encoding(model.encode_first_stage(x))
+    with torch.no_grad():
+        z   = model.get_first_stage_encoding(model.encode_first_stage(x))
 
-    # 2. ray map (4-채널: dx,dy,dz,1) — yaw/pitch 반영
-    ray_map = build_camera_tensor(
-        yaw   = a.yaw,
-        pitch = a.pitch,
-        roll  = 0.0,
-        fov   = 60.0,
-        H = 32, W = 32,
-        device = device)                    # [1,4,32,32]
+    # 2. ray map (4-채널: dx,dy,dz,1) — 포즈별로 만들어 batch 축으로 연결
+    ray_map = torch.cat([
+        build_camera_tensor(
+            yaw   = yaw,
+            pitch = pitch,
+            roll  = 0.0,
+            fov   = 60.0,
+            H = 32, W = 32,
+            device = device)                # [1,4,32,32]
+        for yaw, pitch in poses
+    ], dim=0)                               # [N,4,32,32]
 
-    # 3. dummy cross-attn (shape 충족용)
-    txt = model.get_learned_conditioning([""])          # [1,77,768]
+    # 3. dummy cross-attn (shape 충족용) — 한 번만 계산 후 복제
+    with torch.no_grad():
+        txt = model.get_learned_conditioning([""])      # [1,77,768]
+    txt = txt.expand(n, -1, -1)
 
     cond = {"c_concat": [ray_map], "c_crossattn": [txt]}
 
-    # 4. DDIM 1-step 샘플링
+    # 4. DDIM 1-step 배치 샘플링
     with torch.no_grad():
         sample, _ = sampler.sample(
             S           = 1,
             conditioning= cond,
-            batch_size  = 1,
+            batch_size  = n,
             shape       = [4, 32, 32],
             verbose     = False,
-            x_T         = z          # start from encoded latent
+            x_T         = z.expand(n, -1, -1, -1)  # start from encoded latent
         )
         rgb = model.decode_first_stage(sample)          # [-1,1]
         rgb = (rgb.clamp(-1, 1) + 1) / 2               # [0,1]
 
     # 5. 저장
-    out = (rgb * 255).byte().squeeze(0).permute(1, 2, 0).cpu().numpy()
-    out_path = a.output if a.output.endswith(".png") else a.output + ".png"
-    Image.fromarray(out).save(out_path)
-    print("✅ 저장 완료:", out_path)
+    outs = (rgb * 255).byte().permute(0, 2, 3, 1).cpu().numpy()
+    out_paths = []
+    for out, output in zip(outs, outputs):
+        out_path = output if output.endswith(".png") else output + ".png"
+        Image.fromarray(out).save(out_path)
+        print("✅ 저장 완료:", out_path)
+        out_paths.append(out_path)
+    return out_paths
+
+def rotate(model, sampler, input_path, yaw, pitch, output, size=256):
+    return render_views(model, sampler, input_path, [(yaw, pitch)], [output], size)[0]
+
+def main(a):
+    model    = load_model(a.config, a.checkpoint)
+    sampler  = DDIMSampler(model)
+    rotate(model, sampler, a.input, a.yaw, a.pitch, a.output, a.size)
+
+# ── 상주 워커 모드 ───────────────────────────────────────────────
+#   stdin 으로 JSON 한 줄씩 작업을 받고, stdout 으로 JSON 한 줄씩 응답
+#   {"id":..., "input":..., "poses":[[yaw,pitch],...], "outputs":[...], "size":256}
+#   → {"id":..., "ok":true, "outputs":[...]} | {"id":..., "ok":false, "error":...}
+#   (단일 뷰용 "yaw"/"pitch"/"output" 형식도 그대로 받음)
+def serve(a):
+    # 프로토콜 채널(stdout)을 따로 떼어두고, 나머지 출력은 전부 stderr 로 보냄
+    proto = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    model    = load_model(a.config, a.checkpoint)
+    sampler  = DDIMSampler(model)
+    proto.write(json.dumps({"ready": True}) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        try:
+            if "poses" in job:
+                poses   = [(float(y), float(p)) for y, p in job["poses"]]
+                outputs = job["outputs"]
+            else:
+                poses   = [(float(job["yaw"]), float(job["pitch"]))]
+                outputs = [job["output"]]
+            out_paths = render_views(model, sampler, job["input"], poses, outputs,
+                                     int(job.get("size", a.size)))
+            rsp = {"id": job.get("id"), "ok": True, "outputs": out_paths, "output": out_paths[0]}
+        except Exception as e:
+            rsp = {"id": job.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"}
+        proto.write(json.dumps(rsp) + "\n")
 
 # ── CLI ──────────────────────────────────────────────────────────
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
-    p.add_argument("--input",      required=True)
-    p.add_argument("--yaw",  type=float, required=True)
-    p.add_argument("--pitch",type=float, required=True)
-    p.add_argument("--output",     required=True)
+    p.add_argument("--serve", action="store_true", help="모델을 한 번 로딩하고 stdin 작업을 계속 처리")
+    p.add_argument("--input")
+    p.add_argument("--yaw",  type=float)
+    p.add_argument("--pitch",type=float)
+    p.add_argument("--output")
     p.add_argument("--checkpoint", required=True)
     p.add_argument("--config",     required=True)
     p.add_argument("--size", type=int, default=256)
-    main(p.parse_args())
+    args = p.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        if None in (args.input, args.yaw, args.pitch, args.output):
+            p.error("--input, --yaw, --pitch, --output 는 --serve 가 아닐 때 필수")
+        main(args)
@@ -1,17 +1,90 @@
-from fastapi import FastAPI, UploadFile, Form
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, Form, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pathlib import Path
+import asyncio
+import importlib
+import json
 import uuid
+from typing import Literal
 
-from pipeline import run_interior_pipeline
+from modules import model_registry
+from modules.jobs import JobQueue
+from modules.microbatch import batcher_stats
+from modules.quality import resolve_tier
+from modules.sessions import sessions
+from modules import telemetry
 
 app = FastAPI()
 
+# 모드 값은 폼 단계에서 검증 (오타가 기본값으로 조용히 바뀌지 않고 422)
+CompositeMode = Literal["sequential", "merged"]
+InpaintMode = Literal["full", "region"]
+
+# 파이프라인은 이벤트 루프 밖 워커 풀에서 실행 (ROOMIE_JOB_WORKERS, ROOMIE_JOB_STORE)
+jobs = JobQueue()
+
+
+# ---------------------------------------------------------------
+# 지연 import
+#   pipeline 은 PIL / numpy 와 모든 백엔드 모듈을 끌고 오므로 서버 시작 시
+#   import 하지 않고, 첫 요청(또는 워밍업 스레드)에서 불러옴
+# ---------------------------------------------------------------
+
+def _pipeline():
+    return importlib.import_module("pipeline")
+
+
+def run_interior_pipeline(**kwargs):
+    return _pipeline().run_interior_pipeline(**kwargs)
+
+
+def draft_interior_pipeline(**kwargs):
+    return _pipeline().draft_interior_pipeline(**kwargs)
+
+
+def refine_interior_pipeline(**kwargs):
+    return _pipeline().refine_interior_pipeline(**kwargs)
+
+
+# ---------------------------------------------------------------
+# 서버 시작 시 워밍업
+#   • ROOMIE_WARMUP = eager | background | lazy (기본 lazy)
+#   • ROOMIE_PRELOAD_MODELS="sd_lora,sd_inpaint,carvekit" (비어 있으면 전체)
+#   상태는 GET /readyz 에서 확인
+# ---------------------------------------------------------------
+
+@app.on_event("startup")
+def warmup_models():
+    model_registry.warmup(prepare=_pipeline)
+
+
+def _check_quality(quality: str | None) -> str:
+    """잘못된 품질 티어는 작업 큐에 넣기 전에 400 으로 거절"""
+    try:
+        return resolve_tier(quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _save_upload(file: UploadFile) -> Path:
+    uid = uuid.uuid4().hex[:8]
+    input_path = Path(f"./assets/input_{uid}.jpg")
+    input_path.parent.mkdir(exist_ok=True)
+    with open(input_path, "wb") as f:
+        f.write(await file.read())
+    return input_path
+
+
 # ---------------------------------------------------------------
 # /interior/compose  엔드포인트
 #   • file          : 빈 방 이미지 (multipart/form-data)
 #   • description   : 사용자의 대화 요약(가구 배치 요구)
 #   • room_summary  : GPT-Vision 등으로 얻은 방 구조 설명
+#   • composite_mode: "sequential" | "merged" (생략 시 ROOMIE_COMPOSITE_MODE)
+#   • inpaint_mode  : "full" | "region" (생략 시 ROOMIE_INPAINT_MODE)
+#   • quality       : "draft" | "standard" | "final" (생략 시 ROOMIE_QUALITY)
+#   완료까지 기다렸다가 이미지를 돌려주지만, 실행은 작업 큐에서 하므로
+#   그동안 다른 요청(헬스체크 등)은 막히지 않음
 # ---------------------------------------------------------------
 
 @app.post("/interior/compose")
@@ -19,21 +92,245 @@ async def compose(
     file: UploadFile,
     description: str = Form(...),
     room_summary: str | None = Form(None),
+    composite_mode: CompositeMode | None = Form(None),
+    inpaint_mode: InpaintMode | None = Form(None),
+    quality: str | None = Form(None),
 ):
+    quality = _check_quality(quality)
+
     # 1) 업로드 이미지 임시 저장 -----------------------------------
-    uid = uuid.uuid4().hex[:8]
-    input_path = Path(f"./assets/input_{uid}.jpg")
-    input_path.parent.mkdir(exist_ok=True)
-    with open(input_path, "wb") as f:
-        f.write(await file.read())
+    input_path = await _save_upload(file)
 
-    # 2) 파이프라인 실행 ------------------------------------------
+    # 2) 파이프라인 실행 (워커 풀) ---------------------------------
     print("[*] 인테리어 파이프라인 시작")
-    output_path = run_interior_pipeline(
+    _, output_path = await jobs.run(
+        run_interior_pipeline,
         description=description,
         image_path=input_path,
         room_summary=room_summary or "",
+        composite_mode=composite_mode,
+        inpaint_mode=inpaint_mode,
+        quality=quality,
     )
 
     # 3) 결과 이미지 반환 ------------------------------------------
     return FileResponse(output_path, media_type="image/jpeg")
+
+
+# ---------------------------------------------------------------
+# 초안 → 다듬기 (레이아웃을 여러 번 바꿔 보는 동안은 초안만)
+#   • POST /interior/draft  : /interior/compose 와 같은 입력, 줄인 해상도 + draft 티어로 합성
+#                             → 초안 이미지, 세션 id 는 X-Roomie-Session 헤더
+#   • POST /interior/refine : session_id 의 객체 / 배치 / 가구 / 회전 뷰를 재사용해
+#                             원본 배경에서 인페인팅만 다시 (quality 생략 시 final)
+#   • DELETE /interior/sessions/{id} : 세션 정리 (안 지우면 ROOMIE_SESSION_TTL 후 만료)
+# ---------------------------------------------------------------
+
+@app.post("/interior/draft")
+async def draft(
+    file: UploadFile,
+    description: str = Form(...),
+    room_summary: str | None = Form(None),
+    composite_mode: CompositeMode | None = Form(None),
+    inpaint_mode: InpaintMode | None = Form(None),
+    quality: str | None = Form(None),
+):
+    if quality is not None:
+        quality = _check_quality(quality)
+    input_path = await _save_upload(file)
+    _, (session_id, output_path) = await jobs.run(
+        draft_interior_pipeline,
+        description=description,
+        image_path=input_path,
+        room_summary=room_summary or "",
+        composite_mode=composite_mode,
+        inpaint_mode=inpaint_mode,
+        quality=quality,
+    )
+    return FileResponse(output_path, media_type="image/jpeg", headers={"X-Roomie-Session": session_id})
+
+
+@app.post("/interior/refine")
+async def refine(
+    session_id: str = Form(...),
+    inpaint_mode: InpaintMode | None = Form(None),
+    quality: str | None = Form(None),
+):
+    if quality is not None:
+        quality = _check_quality(quality)
+    if sessions.get(session_id) is None:
+        raise HTTPException(status_code=404, detail="session not found")
+    _, output_path = await jobs.run(
+        refine_interior_pipeline,
+        session_id=session_id,
+        inpaint_mode=inpaint_mode,
+        quality=quality,
+    )
+    return FileResponse(output_path, media_type="image/jpeg", headers={"X-Roomie-Session": session_id})
+
+
+@app.delete("/interior/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="session not found")
+    return {"session_id": session_id, "deleted": True}
+
+
+# ---------------------------------------------------------------
+# /interior/jobs  엔드포인트 (비동기 제출 → 상태 조회 → 결과)
+#   • POST /interior/jobs               : job_id 즉시 반환
+#   • GET  /interior/jobs/{id}          : queued | running | done | failed
+#   • GET  /interior/jobs/{id}/result   : 완료 시 결과 이미지
+# ---------------------------------------------------------------
+
+@app.post("/interior/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile,
+    description: str = Form(...),
+    room_summary: str | None = Form(None),
+    composite_mode: CompositeMode | None = Form(None),
+    inpaint_mode: InpaintMode | None = Form(None),
+    quality: str | None = Form(None),
+):
+    quality = _check_quality(quality)
+    input_path = await _save_upload(file)
+    job_id = jobs.submit(
+        run_interior_pipeline,
+        events=True,
+        description=description,
+        image_path=input_path,
+        room_summary=room_summary or "",
+        composite_mode=composite_mode,
+        inpaint_mode=inpaint_mode,
+        quality=quality,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/interior/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@app.get("/interior/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if job["status"] == "failed":
+        return JSONResponse(status_code=500, content=job)
+    if job["status"] != "done":
+        return JSONResponse(status_code=409, content={"id": job_id, "status": job["status"]})
+    return FileResponse(job["result"], media_type="image/jpeg")
+
+
+# ---------------------------------------------------------------
+# GET /interior/jobs/{id}/events  (Server-Sent Events)
+#   • stage   : parse / pose / lora / rotate / mask / fopa / inpaint 시작·종료 (+ elapsed)
+#   • preview : 객체 하나가 합성될 때마다 progressive JPEG(base64) 미리보기
+#   • done / failed : 마지막 이벤트, 이후 스트림 종료
+# ---------------------------------------------------------------
+
+EVENT_POLL_SEC = 0.2
+KEEPALIVE_SEC = 15
+
+
+@app.get("/interior/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="job not found")
+
+    async def stream():
+        sent, idle = 0, 0.0
+        while True:
+            events = jobs.store.events(job_id, sent)
+            for event in events:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if event["type"] in ("done", "failed"):
+                    return
+            sent += len(events)
+            idle = 0.0 if events else idle + EVENT_POLL_SEC
+            if idle >= KEEPALIVE_SEC:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENT_POLL_SEC)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+# ---------------------------------------------------------------
+# GET /metrics/batching : 디퓨전 마이크로 배처 지표
+#   (요청 수, 배치 수, 평균 배치 크기, 채움률, 대기 시간)
+# ---------------------------------------------------------------
+
+@app.get("/metrics/batching")
+async def batching_metrics():
+    return batcher_stats()
+
+
+# ---------------------------------------------------------------
+# GET /metrics/cache : 에셋 캐시 지표
+#   (가구 RGBA 캐시 hot/disk 히트·미스·축출, Zero123 시점 캐시 히트·미스·축출,
+#    LLM 응답 캐시 히트·미스·병합, LLM 클라이언트 호출·재시도·실패·회로 상태)
+# ---------------------------------------------------------------
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    from modules.asset_cache import furniture_cache
+    from modules.zero123_runner import get_view_cache
+    from modules.llm_cache import llm_cache_stats
+    from modules.llm_client import llm_client_stats
+    return {
+        "furniture": furniture_cache.stats(),
+        "zero123_views": get_view_cache().stats(),
+        "llm": dict(llm_cache_stats),
+        "llm_client": llm_client_stats(),
+    }
+
+
+# ---------------------------------------------------------------
+# GET /metrics/memory : 모델 메모리 관리자
+#   (GPU 예산, 디바이스 / CPU 상주량, 모델별 위치·점유량·사용 중 여부,
+#    offload / 재로딩 / unload / 예산 초과 횟수)
+# ---------------------------------------------------------------
+
+@app.get("/metrics/memory")
+async def memory_metrics():
+    return model_registry.memory.stats()
+
+
+# ---------------------------------------------------------------
+# GET /metrics : Prometheus 지표
+#   (스팬 지연 히스토그램, 큐 대기, 모델 로딩, 캐시 조회, 서브프로세스 실행,
+#    배치 크기, CPU RSS / GPU 메모리 최고치, LLM 클라이언트 회로 상태 / 재시도)
+# ---------------------------------------------------------------
+
+@app.get("/metrics")
+async def metrics():
+    from modules.llm_client import record_llm_client
+    record_llm_client()
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+
+# ---------------------------------------------------------------
+# GET /healthz : 프로세스가 살아 있는지 (모델 로딩과 무관, 항상 200)
+# GET /readyz  : 트래픽을 받을 수 있는지
+#   • lazy / background 는 바로 ready (로딩 중인 모델을 쓰는 요청은 로딩이 끝날 때까지 대기)
+#   • 워밍업이 실패하면 503
+#   • 워밍업 상태, 로딩 완료 / 로딩 중(경과 초) / 등록된 모델 목록 포함
+# ---------------------------------------------------------------
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    status = model_registry.warmup_status()
+    ready = status["state"] != "failed"
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, **status})
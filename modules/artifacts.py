@@ -0,0 +1,83 @@
+# modules/artifacts.py
+
+"""
+파이프라인 단계 간 아티팩트 버스
+================================
+
+같은 프로세스 안의 단계끼리는 디코딩된 이미지(PIL) / 배열(numpy)을 참조로 넘기고,
+디스크에는 서브프로세스 경계(Zero123 워커, FOPA test.py 등)에서 필요할 때나
+`persist=True` 일 때만 쓴다. PNG/JPEG 인코딩·디코딩 반복과 JPEG 재저장에 의한
+화질 열화를 없애는 것이 목적.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+import uuid
+
+import numpy as np
+from PIL import Image
+
+ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
+ASSET_DIR.mkdir(exist_ok=True)
+
+ImageLike = Union[str, Path, Image.Image, np.ndarray]
+
+
+def load_image(src: ImageLike, mode: Optional[str] = None) -> Image.Image:
+    """경로 / PIL / ndarray 무엇이 오든 PIL 이미지로 반환 (이미 PIL 이면 디코딩 없음)"""
+    if isinstance(src, Image.Image):
+        img = src
+    elif isinstance(src, np.ndarray):
+        img = Image.fromarray(src)
+    else:
+        img = Image.open(src)
+    if mode is not None and img.mode != mode:
+        img = img.convert(mode)
+    return img
+
+
+class ArtifactStore:
+    """요청(run) 하나의 중간 산출물 저장소
+
+    * `put(key, value)` : 이미지/배열/경로를 메모리에 보관 (persist 면 즉시 디스크에도)
+    * `get(key)`        : 보관한 값 그대로 반환
+    * `image(key)`      : PIL 이미지로 반환
+    * `path(key)`       : 디스크 경로가 필요할 때만 한 번 PNG 로 기록하고 경로 반환
+    """
+
+    def __init__(self, run_id: Optional[str] = None, root: Path = ASSET_DIR, persist: bool = False):
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.root = Path(root)
+        self.persist = persist
+        self._items: Dict[str, Any] = {}
+        self._paths: Dict[str, Path] = {}
+
+    def put(self, key: str, value: Any) -> Any:
+        self._items[key] = value
+        self._paths.pop(key, None)
+        if isinstance(value, (str, Path)):
+            self._paths[key] = Path(value)
+        elif self.persist:
+            self.path(key)
+        return value
+
+    def get(self, key: str) -> Any:
+        return self._items[key]
+
+    def image(self, key: str, mode: Optional[str] = None) -> Image.Image:
+        return load_image(self._items[key], mode)
+
+    def path(self, key: str) -> Path:
+        """서브프로세스 경계용: 아직 디스크에 없으면 무손실 PNG 로 한 번만 기록"""
+        if key not in self._paths:
+            path = self.root / f"{self.run_id}_{key.replace('/', '_')}.png"
+            load_image(self._items[key]).save(path)
+            self._paths[key] = path
+        return self._paths[key]
+
+    def save(self, key: str, path: Path, **save_kwargs) -> Path:
+        """최종 결과처럼 지정 경로/포맷으로 저장해야 하는 경우"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        load_image(self._items[key], "RGB").save(path, **save_kwargs)
+        return path
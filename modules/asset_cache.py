@@ -0,0 +1,176 @@
+# modules/asset_cache.py
+
+"""
+내용 주소 기반(content-addressed) 에셋 캐시
+==========================================
+
+생성 조건(프롬프트, 베이스 모델, LoRA, 시드, 해상도, 매팅 모델 …)을 해시한 키로
+RGBA 결과 이미지를 저장한다.
+
+* hot tier  : 프로세스 메모리 LRU (디코딩된 PIL 이미지)
+* disk tier : PNG 파일, 총 용량 상한을 넘으면 가장 오래 안 쓴 파일부터 삭제
+* `stats()` : hot / disk 히트, 미스, 축출 횟수
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set
+
+from PIL import Image
+
+from modules import telemetry
+
+ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
+
+
+class AssetCache:
+
+    def __init__(self, root: Path, max_bytes: int, hot_items: int = 64, name: str = "asset"):
+        self.name = name
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hot_items = hot_items
+
+        self._hot: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hot_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+        # 디스크 인덱스: 키 → 파일 크기 (오래 안 쓴 순서). 재시작 시 mtime 순서로 복원
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        files = sorted(self.root.glob("*.png"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            self._disk[path.stem] = path.stat().st_size
+        self._disk_bytes = sum(self._disk.values())
+
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        """필드들을 정렬된 JSON 으로 직렬화해 sha256 키 생성"""
+        blob = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.png"
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        with self._lock:
+            img = self._hot.get(key)
+            if img is not None:
+                self._hot.move_to_end(key)
+                self.counters["hot_hits"] += 1
+                telemetry.CACHE_REQUESTS.inc(cache=self.name, result="hot_hit")
+                return img.copy()
+            on_disk = key in self._disk
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                img = Image.open(path)
+                img.load()
+                os.utime(path)      # LRU 갱신
+            except OSError:
+                img = None
+            if img is not None:
+                with self._lock:
+                    self._disk.move_to_end(key)
+                    self.counters["disk_hits"] += 1
+                    telemetry.CACHE_REQUESTS.inc(cache=self.name, result="disk_hit")
+                    self._remember(key, img)
+                return img.copy()
+
+        with self._lock:
+            self.counters["misses"] += 1
+        telemetry.CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        return None
+
+    def put(self, key: str, img: Image.Image) -> Path:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        img.save(tmp, format="PNG")
+        os.replace(tmp, path)       # 동시에 같은 키를 써도 반쯤 쓴 파일이 보이지 않게
+        size = path.stat().st_size
+
+        with self._lock:
+            self.counters["puts"] += 1
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._remember(key, img)
+            self._evict()
+        return path
+
+    def get_path(self, key: str) -> Optional[Path]:
+        """디코딩 없이 캐시된 파일 경로만 (다른 프로세스가 쓴 파일을 경로로 넘기는 캐시용)"""
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                self.counters["disk_hits"] += 1
+                result = "disk_hit"
+            else:
+                self.counters["misses"] += 1
+                result = "miss"
+        telemetry.CACHE_REQUESTS.inc(cache=self.name, result=result)
+        if result == "miss":
+            return None
+        path = self._path(key)
+        os.utime(path)      # LRU 갱신 (재시작 후 순서 복원용)
+        return path
+
+    def path_for(self, key: str) -> Path:
+        """키가 저장될 파일 경로 (외부 프로세스가 직접 쓰게 할 때)"""
+        return self._path(key)
+
+    def adopt(self, key: str, keep: Iterable[str] = ()) -> Path:
+        """`path_for(key)` 에 외부에서 직접 쓴 파일을 인덱스에 넣고 용량 상한 적용
+
+        keep 의 키들은 축출하지 않음 (호출자가 아직 경로를 넘기기 전인 같은 요청의 파일)
+        """
+        path = self._path(key)
+        size = path.stat().st_size
+        with self._lock:
+            self.counters["puts"] += 1
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._evict(keep={key, *keep})
+        return path
+
+    def _remember(self, key: str, img: Image.Image):
+        self._hot[key] = img.copy()
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_items:
+            self._hot.popitem(last=False)
+
+    def _evict(self, keep: Set[str] = frozenset()):
+        for key in list(self._disk):
+            if self._disk_bytes <= self.max_bytes or len(self._disk) <= 1:
+                break
+            if key in keep:
+                continue
+            self._disk_bytes -= self._disk.pop(key)
+            self._path(key).unlink(missing_ok=True)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hot_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "hot_items": len(self._hot),
+                "disk_items": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# 가구 RGBA 캐시 (프로세스 전역)
+furniture_cache = AssetCache(
+    root=ASSET_DIR / "furniture_cache",
+    max_bytes=int(float(os.getenv("ROOMIE_FURNITURE_CACHE_MB", "2048")) * 1024 * 1024),
+    hot_items=int(os.getenv("ROOMIE_FURNITURE_HOT_ITEMS", "64")),
+    name="furniture",
+)
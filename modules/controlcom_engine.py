@@ -0,0 +1,359 @@
+# modules/controlcom_engine.py
+
+"""
+프로세스 상주 ControlCom 엔진
+============================
+
+`scripts/wrapper_controlcom.py` → `inference.py` 두 번의 서브프로세스 대신,
+ControlCom 모델(UNet + VAE + CLIP ViT-L 인코더)을 한 번만 만들어 두고
+메모리 위의 배경 / 전경 / bbox 를 받아 합성 이미지를 바로 돌려준다.
+
+* 네 가지 작업을 모델 하나로 처리 — 가중치 파일은 두 개라서 작업이 바뀔 때만 교체
+    - blending / harmonization    : ControlCom_blend_harm.pth  (indicator [0,0] / [1,0])
+    - viewsynthesis / composition : ControlCom_view_comp.pth   (indicator [0,1] / [1,1])
+* 교체 : 처음 바꿀 때 두 체크포인트에서 값이 다른 텐서만 골라 CPU(pinned)에 보관하고,
+  이후에는 그 텐서들만 `copy_()` (CLIP 등 공유 가중치는 다시 읽지 않음)
+* 배치 : `compose_batch()` 가 여러 (배경, 전경, bbox, 작업) 요청 × 샘플을 패딩된 큰 배치로 실행하고,
+  배경 latent / 전경 CLIP 조건은 같은 입력끼리 공유 (한 방의 harmonization 변형 여러 개 ≈ 한 번 비용)
+* 모델 레지스트리에 "controlcom" 으로 등록 → 메모리 관리자가 예산에 따라 CPU 로 내리고 다시 올림
+
+경로: `CONTROLCOM_DIR` (기본 external/ControlCom-Image-Composition),
+`CONTROLCOM_CKPT_DIR` (기본 <CONTROLCOM_DIR>/checkpoints)
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from PIL import Image
+
+from modules.model_registry import register
+from modules import telemetry
+
+ROOT = Path(__file__).resolve().parent.parent
+CTRL_DIR = Path(os.getenv("CONTROLCOM_DIR", str(ROOT / "external" / "ControlCom-Image-Composition")))
+TAMING_DIR = ROOT / "external" / "taming"
+CKPT_DIR = Path(os.getenv("CONTROLCOM_CKPT_DIR", str(CTRL_DIR / "checkpoints")))
+CONFIG_PATH = CTRL_DIR / "configs" / "controlcom.yaml"
+
+IMAGE_SIZE = 512            # ControlCom 입력 / 출력 해상도
+CLIP_SIZE = 224             # 전경 CLIP 인코더 입력 해상도
+DEFAULT_STEPS = 50
+DEFAULT_SCALE = 5.0
+BATCH_MAX = int(os.getenv("CONTROLCOM_BATCH_MAX", "8"))          # sampler 한 번에 넣는 최대 행 수
+COND_CACHE_SIZE = int(os.getenv("CONTROLCOM_COND_CACHE", "64"))   # 배경 latent / 전경 CLIP 조건 캐시 개수
+
+WEIGHT_FILES = {
+    "blend_harm": "ControlCom_blend_harm.pth",
+    "view_comp": "ControlCom_view_comp.pth",
+}
+# 작업 → (가중치, indicator)
+TASKS = {
+    "blending": ("blend_harm", [0, 0]),
+    "harmonization": ("blend_harm", [1, 0]),
+    "viewsynthesis": ("view_comp", [0, 1]),
+    "composition": ("view_comp", [1, 1]),
+}
+
+ImageLike = Union[str, Path, Image.Image]
+
+
+def _open(src: ImageLike) -> Image.Image:
+    return src if isinstance(src, Image.Image) else Image.open(src)
+
+
+def _src_hash(src: ImageLike) -> str:
+    """경로 또는 PIL 이미지의 내용 해시"""
+    if isinstance(src, Image.Image):
+        data = src.tobytes() + repr((src.mode, src.size)).encode()
+    else:
+        data = Path(src).read_bytes()
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def _add_paths():
+    """ldm / taming 패키지를 import 할 수 있게 (inference.py 처럼 chdir 하지 않음)"""
+    for path in (CTRL_DIR, TAMING_DIR):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+
+class ControlComEngine:
+    """ControlCom 모델 하나로 네 가지 합성 작업 실행 (스레드 안전, 한 번에 하나씩)"""
+
+    def __init__(self, ckpt_dir: Path = CKPT_DIR, config_path: Path = CONFIG_PATH,
+                 device: Optional[str] = None, weights: str = "view_comp"):
+        import torch
+        from omegaconf import OmegaConf
+
+        _add_paths()
+        from ldm.util import instantiate_from_config
+        from ldm.models.diffusion.ddim import DDIMSampler
+        from ldm.data.open_images_control import get_tensor, get_tensor_clip, get_bbox_tensor, bbox2mask
+
+        self.ckpt_dir = Path(ckpt_dir)
+        clip_path = self.ckpt_dir / "openai-clip-vit-large-patch14"
+        if not clip_path.exists():
+            raise FileNotFoundError(f"CLIP 가중치 없음: {clip_path} (scripts/download_controlcom_weights.py)")
+
+        config = OmegaConf.load(str(config_path))
+        config.model.params.cond_stage_config.params.version = str(clip_path)
+        self.model = instantiate_from_config(config.model).eval()     # CLIP 인코더도 여기서 한 번만 생성
+
+        self.weights: Optional[str] = None
+        self._swap: Dict[str, Dict[str, "torch.Tensor"]] = {}        # 가중치 → 교체할 텐서 (CPU)
+        self._load_full(weights)
+
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.model.to(self.device)
+        self.sampler = DDIMSampler(self.model)
+
+        self._bbox_tensor, self._bbox2mask = get_bbox_tensor, bbox2mask
+        self._clip_t = get_tensor_clip(image_size=(CLIP_SIZE, CLIP_SIZE))
+        self._sd_t = get_tensor(image_size=(IMAGE_SIZE, IMAGE_SIZE))
+        self._mask_t = get_tensor(normalize=False, image_size=(IMAGE_SIZE, IMAGE_SIZE))
+        self._bg_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._fg_cache: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ── 가중치 ───────────────────────────────────────────
+    def _read(self, weights: str) -> dict:
+        import torch
+
+        path = self.ckpt_dir / WEIGHT_FILES[weights]
+        if not path.exists():
+            raise FileNotFoundError(f"ControlCom 체크포인트 없음: {path}")
+        print(f"[DEBUG] ControlCom 체크포인트 로딩: {path}")
+        return torch.load(path, map_location="cpu")["state_dict"]
+
+    def _load_full(self, weights: str):
+        self.model.load_state_dict(self._read(weights), strict=False)
+        self.weights = weights
+
+    def _use_weights(self, weights: str):
+        """필요한 가중치로 교체 (다른 텐서만 복사)"""
+        import torch
+
+        if weights == self.weights:
+            return
+        with telemetry.span("controlcom.swap_weights", weights=weights) as attrs:
+            if weights not in self._swap:
+                # 처음 교체: 현재 모델 텐서와 값이 다른 것만 양쪽 모두 보관
+                state = self.model.state_dict()
+                incoming = self._read(weights)
+                keys = [k for k, v in incoming.items()
+                        if k in state and not torch.equal(state[k].detach().cpu(), v.to(state[k].dtype))]
+
+                def keep(t):
+                    t = t.detach().cpu().clone()
+                    return t.pin_memory() if self.device.type == "cuda" else t
+
+                self._swap[self.weights] = {k: keep(state[k]) for k in keys}
+                self._swap[weights] = {k: keep(incoming[k]) for k in keys}
+                del incoming
+                print(f"[DEBUG] ControlCom 교체 텐서: {len(keys)}개 "
+                      f"({sum(t.numel() * t.element_size() for t in self._swap[weights].values()) / 2**20:.0f}MB)")
+
+            state = self.model.state_dict()
+            with torch.no_grad():
+                for k, t in self._swap[weights].items():
+                    state[k].copy_(t, non_blocking=True)
+            if self.device.type == "cuda":
+                torch.cuda.synchronize(self.device)
+            attrs["tensors"] = len(self._swap[weights])
+        self.weights = weights
+
+    def to(self, device) -> "ControlComEngine":
+        """메모리 관리자용 — 모델만 옮기고 교체용 텐서는 CPU 에 둠"""
+        import torch
+
+        self.device = torch.device(device)
+        self.model.to(self.device)
+        return self
+
+    # ── 입력 준비 (배경 latent / 전경 CLIP 조건은 LRU 캐시) ──────────
+    def _lookup(self, cache: "OrderedDict", name: str, keys: List[tuple], compute: Callable[[List[int]], list]):
+        """keys 중 캐시에 없는 것만 compute(미스 인덱스들) 로 한 번에 계산해 채움"""
+        found: Dict[tuple, Any] = {}
+        misses = []
+        for i, k in enumerate(keys):
+            if k in found:
+                continue
+            found[k] = cache.get(k)
+            if found[k] is None:
+                misses.append(i)
+            else:
+                cache.move_to_end(k)
+        telemetry.CACHE_REQUESTS.inc(len(found) - len(misses), cache=f"controlcom_{name}", result="hit")
+        if misses:
+            telemetry.CACHE_REQUESTS.inc(len(misses), cache=f"controlcom_{name}", result="miss")
+            for i, value in zip(misses, compute(misses)):
+                found[keys[i]] = cache[keys[i]] = value
+            while len(cache) > COND_CACHE_SIZE:
+                cache.popitem(last=False)
+        return [found[k] for k in keys]
+
+    def _backgrounds(self, items: List[dict]) -> List[dict]:
+        """bbox 자리를 비운 배경의 latent + latent 해상도 마스크 + bbox 텐서 (항목별, CPU)"""
+        import torch
+        import torch.nn.functional as F
+
+        model = self.model
+        keys = [(self.weights, _src_hash(it["background"]), tuple(it["bbox"])) for it in items]
+
+        def compute(idx: List[int]) -> List[dict]:
+            imgs, masks, boxes = [], [], []
+            for i in idx:
+                bg = _open(items[i]["background"]).convert("RGB")
+                bbox = items[i]["bbox"]
+                mask_t = self._mask_t(Image.fromarray(self._bbox2mask(bbox, *bg.size)))
+                mask_t = torch.where(mask_t > 0.5, 1, 0).float()
+                imgs.append(self._sd_t(bg) * (1 - mask_t))
+                masks.append(mask_t)
+                boxes.append(self._bbox_tensor(bbox, *bg.size))
+            latent = model.get_first_stage_encoding(
+                model.encode_first_stage(torch.stack(imgs).to(self.device))).detach()
+            rs_mask = F.interpolate(torch.stack(masks).to(self.device), latent.shape[-2:])
+            rs_mask = torch.where(rs_mask > 0.5, 1.0, 0.0)
+            return [{"bg_latent": latent[j:j + 1].cpu(), "bg_mask": rs_mask[j:j + 1].cpu(), "bbox": boxes[j][None]}
+                    for j in range(len(idx))]
+
+        return self._lookup(self._bg_cache, "bg_latent", keys, compute)
+
+    def _foregrounds(self, items: List[dict]) -> List[list]:
+        """전경 CLIP 조건 [global, local] (같은 전경이면 한 번만 인코딩, CPU)"""
+        import numpy as np
+        import torch
+
+        keys = [(self.weights, _src_hash(it["foreground"]),
+                 _src_hash(it["fg_mask"]) if it.get("fg_mask") is not None else None) for it in items]
+
+        def compute(idx: List[int]) -> List[list]:
+            tensors = []
+            for i in idx:
+                fg_src, fg_mask = _open(items[i]["foreground"]), items[i].get("fg_mask")
+                if fg_mask is None and fg_src.mode == "RGBA":
+                    fg_mask = fg_src.getchannel("A")        # RGBA 전경은 알파를 마스크로
+                fg = fg_src.convert("RGB")
+                if fg_mask is not None:
+                    m = np.asarray(_open(fg_mask).convert("RGB").resize(fg.size))
+                    fg = Image.fromarray(np.where(m > 127, np.asarray(fg), 0).astype(np.uint8))
+                tensors.append(self._clip_t(fg))
+            c = self.model.get_learned_conditioning((torch.stack(tensors).to(self.device), None))
+            return [[t[j:j + 1].cpu() for t in c] for j in range(len(idx))]
+
+        return self._lookup(self._fg_cache, "clip", keys, compute)
+
+    def _prepare(self, bgs: List[dict], fgs: List[list], indicators: List[List[int]]):
+        """inference.prepare_input 과 같은 조건 구성 (행마다 배경 / 전경 / indicator 가 다를 수 있음)"""
+        import torch
+
+        device, n = self.device, len(bgs)
+        kwargs = {k: torch.cat([b[k] for b in bgs]).to(device) for k in ("bg_latent", "bg_mask", "bbox")}
+        c = [torch.cat([f[i] for f in fgs]).to(device) for i in range(len(fgs[0]))]
+        ind = torch.tensor(indicators).int().to(device)
+        c.append(ind)
+        c.append(torch.tensor([True] * n))
+        uc_global = self.model.learnable_vector.repeat(n, 1, 1)
+        # 무조건부 local 임베딩: scripts/inference.py prepare_input 과 같이, 모델이 제공하지 않으면 c[1]
+        if hasattr(self.model, "get_unconditional_local_embedding"):
+            uc_local = self.model.get_unconditional_local_embedding(c[1])
+        else:
+            uc_local = c[1]
+        uc = [uc_global, uc_local, ind, torch.tensor([False] * n)]
+        return kwargs, c, uc
+
+    # ── 실행 ─────────────────────────────────────────────
+    def compose(self, background: ImageLike, foreground: ImageLike, bbox: Sequence[int],
+                task: str = "composition", fg_mask: Optional[ImageLike] = None,
+                steps: int = DEFAULT_STEPS, scale: float = DEFAULT_SCALE,
+                seed: Optional[int] = None, num_samples: int = 1) -> List[Image.Image]:
+        """배경의 bbox([x1, y1, x2, y2], 픽셀) 자리에 전경을 합성 → 배경 해상도 PIL 리스트"""
+        item = {"background": background, "foreground": foreground, "bbox": bbox, "task": task,
+                "fg_mask": fg_mask, "num_samples": num_samples, "seed": seed}
+        return self.compose_batch([item], steps=steps, scale=scale)[0]
+
+    def compose_batch(self, items: Sequence[dict], steps: int = DEFAULT_STEPS, scale: float = DEFAULT_SCALE,
+                      seed: Optional[int] = None) -> List[List[Image.Image]]:
+        """여러 합성 요청을 큰 배치로 실행 → 항목별 PIL 리스트 (num_samples 개)
+
+        items 원소: {"background", "foreground", "bbox", "task"(기본 composition),
+                     "fg_mask"(선택), "num_samples"(기본 1), "seed"(선택, 없으면 seed + 순번)}
+
+        * 항목 × 샘플을 행으로 펼쳐 가중치(blend_harm / view_comp)별로 묶고,
+          `CONTROLCOM_BATCH_MAX` 행씩 2의 거듭제곱 크기로 패딩해 sampler 한 번에 실행
+        * 같은 배경+bbox 의 latent, 같은 전경의 CLIP 조건은 한 번만 계산 (호출 간에도 캐시)
+        * 시드가 같으면 num_samples=1 결과가 num_samples=4 의 첫 샘플과 같음
+        """
+        import torch
+        from torchvision.transforms import Resize
+
+        items = [dict(it, bbox=[int(v) for v in it["bbox"]], task=it.get("task", "composition"))
+                 for it in items]
+        for it in items:
+            if it["task"] not in TASKS:
+                raise ValueError(f"task 는 {'|'.join(TASKS)} 중 하나: {it['task']}")
+
+        shape = [4, IMAGE_SIZE // 8, IMAGE_SIZE // 8]
+        # (항목, 샘플) 행 + 항목별 시작 노이즈
+        rows: Dict[str, List[tuple]] = {}
+        for i, it in enumerate(items):
+            n = int(it.get("num_samples", 1))
+            item_seed = it.get("seed")
+            if item_seed is None and seed is not None:     # "seed": None 도 배치 시드를 따름
+                item_seed = seed + i
+            gen = torch.Generator().manual_seed(item_seed) if item_seed is not None else None
+            noise = torch.randn([n, *shape], generator=gen)
+            for j in range(n):
+                rows.setdefault(TASKS[it["task"]][0], []).append((i, j, noise[j:j + 1]))
+
+        outputs: List[List[Any]] = [[None] * int(it.get("num_samples", 1)) for it in items]
+        with self._lock, torch.no_grad(), telemetry.span("controlcom.compose", items=len(items), steps=steps) as attrs:
+            batches = 0
+            for weights, group in rows.items():
+                self._use_weights(weights)
+                for start in range(0, len(group), BATCH_MAX):
+                    chunk = group[start:start + BATCH_MAX]
+                    size = min(BATCH_MAX, 1 << (len(chunk) - 1).bit_length())
+                    padded = chunk + [chunk[-1]] * (size - len(chunk))     # 배치 모양을 몇 가지로 고정
+                    row_items = [items[i] for i, _, _ in padded]
+
+                    kwargs, c, uc = self._prepare(self._backgrounds(row_items), self._foregrounds(row_items),
+                                                  [TASKS[it["task"]][1] for it in row_items])
+                    x_T = torch.cat([noise for _, _, noise in padded]).to(self.device)
+                    samples, _ = self.sampler.sample(
+                        S=steps,
+                        conditioning=c,
+                        batch_size=len(padded),
+                        shape=shape,
+                        verbose=False,
+                        eta=0.0,
+                        x_T=x_T,
+                        unconditional_guidance_scale=scale,
+                        unconditional_conditioning=uc,
+                        test_model_kwargs=kwargs,
+                    )
+                    x = self.model.decode_first_stage(samples[:len(chunk), :4]).cpu().float()
+                    for (i, j, _), img in zip(chunk, x):
+                        outputs[i][j] = img
+                    batches += 1
+                    telemetry.BATCH_SIZE.observe(len(chunk), batcher="controlcom")
+            attrs["batches"] = batches
+
+        results = []
+        for it, imgs in zip(items, outputs):
+            w, h = _open(it["background"]).size
+            x = Resize((h, w), antialias=True)(torch.stack(imgs))
+            x = ((x + 1.0) / 2.0).clamp(0.0, 1.0).permute(0, 2, 3, 1).numpy()
+            results.append([Image.fromarray((img * 255).astype("uint8")) for img in x])
+        return results
+
+
+@register("controlcom")
+def _load_controlcom():
+    """ControlCom (UNet + VAE + CLIP ViT-L) — 네 작업 공용"""
+    return ControlComEngine(weights=os.getenv("CONTROLCOM_DEFAULT_WEIGHTS", "view_comp"))
@@ -1,35 +1,109 @@
 # modules/controlcom_runner.py
 
 import json
+import os
 import subprocess
 import tempfile
 from pathlib import Path
+from typing import Optional, Sequence
+
+from PIL import Image
+
+from modules.model_registry import use
+from modules.controlcom_engine import ImageLike, TASKS  # "controlcom" 로더 등록
+from modules.quality import sampler_for
+from modules import telemetry
 
 SCRIPT_PATH = Path(__file__).resolve().parent.parent / "scripts" / "wrapper_controlcom.py"
 
-def run_controlcom(description: str) -> list[dict]:
+# "inprocess" (기본, 상주 엔진) | "subprocess" (wrapper_controlcom.py → inference.py, 호출마다 모델 로딩)
+CONTROLCOM_MODE = os.getenv("CONTROLCOM_MODE", "inprocess")
+
+
+def _open(src: ImageLike) -> Image.Image:
+    return src if isinstance(src, Image.Image) else Image.open(src)
+
+
+def run_controlcom(background: ImageLike, foreground: ImageLike, bbox: Sequence[int],
+                   task: str = "composition", fg_mask: Optional[ImageLike] = None,
+                   steps: Optional[int] = None, scale: Optional[float] = None,
+                   seed: Optional[int] = None, quality: Optional[str] = None) -> Image.Image:
     """
-    ControlCom으로 자연어 설명을 파싱해
-    [
-      {prompt:str, bbox:[x,y,w,h], yaw:float, pitch:float},
-      ...
-    ] 형태 리스트 반환
+    ControlCom 으로 배경의 bbox([x1, y1, x2, y2], 픽셀) 자리에 전경을 합성해
+    배경 해상도의 PIL(RGB) 이미지 반환
+
+    task: blending | harmonization | viewsynthesis | composition
+    steps / scale 을 생략하면 품질 티어(quality, 생략 시 ROOMIE_QUALITY)의 DDIM 설정을 따른다.
     """
+    if task not in TASKS:
+        raise ValueError(f"task 는 {'|'.join(TASKS)} 중 하나: {task}")
+    steps, scale = _sampling(steps, scale, quality)
+    if CONTROLCOM_MODE == "subprocess":
+        return _run_controlcom_subprocess(background, foreground, bbox, task, fg_mask, steps, scale)
+
+    with use("controlcom") as engine:
+        return engine.compose(background, foreground, bbox, task=task, fg_mask=fg_mask,
+                              steps=steps, scale=scale, seed=seed)[0]
+
+
+def run_controlcom_batch(items: Sequence[dict], steps: Optional[int] = None, scale: Optional[float] = None,
+                         seed: Optional[int] = None, quality: Optional[str] = None) -> list[list[Image.Image]]:
+    """
+    여러 합성 요청을 한 번에 실행 → 항목별 PIL 리스트 (num_samples 개)
+
+    items 원소: {"background", "foreground", "bbox", "task", "fg_mask", "num_samples", "seed"}
+    (예: 같은 방 / 같은 가구로 harmonization 변형 여러 장 → 배경 latent, CLIP 조건 1회)
+    """
+    steps, scale = _sampling(steps, scale, quality)
+    if CONTROLCOM_MODE == "subprocess":
+        return [
+            [_run_controlcom_subprocess(it["background"], it["foreground"], it["bbox"],
+                                        it.get("task", "composition"), it.get("fg_mask"), steps, scale)
+             for _ in range(int(it.get("num_samples", 1)))]
+            for it in items
+        ]
+    with use("controlcom") as engine:
+        return engine.compose_batch(items, steps=steps, scale=scale, seed=seed)
+
+
+def _sampling(steps: Optional[int], scale: Optional[float], quality: Optional[str]) -> tuple[int, float]:
+    """명시한 steps / scale 우선, 나머지는 품질 티어에서"""
+    sampler = sampler_for("controlcom", quality)
+    return (sampler.steps if steps is None else steps,
+            sampler.guidance if scale is None else scale)
+
+
+def _run_controlcom_subprocess(background, foreground, bbox, task, fg_mask, steps, scale) -> Image.Image:
+    """예전 경로: 입력을 임시 파일로 쓰고 wrapper_controlcom.py 실행"""
+    with tempfile.TemporaryDirectory(prefix="controlcom-") as tmp:
+        tmp = Path(tmp)
+        bg_path, fg_path = tmp / "bg.png", tmp / "fg.png"
+        _open(background).convert("RGB").save(bg_path)
+        _open(foreground).save(fg_path)
+        result_path = tmp / "result.json"
+
+        cmd = [
+            "python", str(SCRIPT_PATH),
+            "--background", str(bg_path),
+            "--foreground", str(fg_path),
+            "--bbox", *[str(int(v)) for v in bbox],
+            "--task", task,
+            "--steps", str(steps),
+            "--scale", str(scale),
+            "--out", str(result_path),
+        ]
+        if fg_mask is not None:
+            mask_path = tmp / "fg_mask.png"
+            _open(fg_mask).save(mask_path)
+            cmd += ["--fg-mask", str(mask_path)]
+
+        print(f"[DEBUG] ControlCom 실행: {' '.join(cmd)}")
+        telemetry.SUBPROCESS_LAUNCHES.inc(name="controlcom")
+        with telemetry.span("subprocess.controlcom", task=task):
+            subprocess.run(cmd, check=True)
 
-    # 1. 임시 JSON 파일 생성
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tf:
-        result_path = Path(tf.name)
-
-    # 2. subprocess 실행
-    cmd = [
-        "python", str(SCRIPT_PATH),
-        "--text", description,
-        "--out", str(result_path),
-    ]
-    print(f"[DEBUG] ControlCom 실행: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
-
-    # 3. JSON 결과 파싱
-    data = json.loads(result_path.read_text(encoding="utf-8"))
-    print("[DEBUG] ControlCom 결과:", data)
-    return data
+        data = json.loads(result_path.read_text(encoding="utf-8"))
+        print("[DEBUG] ControlCom 결과:", data)
+        result = Image.open(data["generated_images"][0]).convert("RGB")
+        result.load()
+    return result.resize(_open(background).size)
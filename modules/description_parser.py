@@ -1,6 +1,8 @@
-import openai, json, re
+import json, re
 from pathlib import Path
 
+from modules.llm_cache import cached_chat
+
 SYSTEM_PROMPT = """
 너는 인테리어 배치 어시스턴트야.
 입력 문장과 방 구조 설명을 보고,
@@ -13,12 +15,38 @@ def parse_description(user_text: str, room_summary: str = "") -> list[dict]:
         {"role":"system", "content": SYSTEM_PROMPT},
         {"role":"user",   "content": f"[방 구조]\n{room_summary}\n\n[요청]\n{user_text}"}
     ]
-    rsp = openai.ChatCompletion.create(
-        model = "gpt-4o",
-        messages = messages,
-        temperature = 0.3
-    )
+    # 같은 (문장, 방 구조) 요청은 캐시된 응답을 재사용 (modules.llm_cache)
+    try:
+        return cached_chat("gpt-4o", messages, temperature=0.3, parse=_extract_objects)
+    except Exception as e:  # 회로 차단 / 재시도 소진 / 응답 파싱 실패 → 작업 전체를 실패시키지 않고 룰 기반으로
+        print(f"[!] 설명 파싱 LLM 실패 ({e}) → 룰 기반 파싱")
+        return _rule_parse(user_text)
+
+
+# 문장을 가구 단위로 나누는 구분자 (쉼표, 줄바꿈, 접속어)
+_SPLIT_RE = re.compile(r"[,，\n]|\s+(?:그리고|및|and)\s+")
+_REL_KEYWORDS = [
+    ("left_wall",  ("왼쪽", "좌측", "left")),
+    ("right_wall", ("오른쪽", "우측", "right")),
+    ("back_wall",  ("뒷벽", "안쪽", "정면", "back")),
+]
+
+
+def _rule_parse(user_text: str) -> list[dict]:
+    """LLM 장애 시 사용할 간단 휴리스틱 파서 (조각 하나 = 가구 하나, 위치는 키워드로)"""
+    objects = []
+    for chunk in _SPLIT_RE.split(user_text):
+        chunk = chunk.strip(" .")
+        if not chunk:
+            continue
+        lowered = chunk.lower()
+        rel = next((r for r, words in _REL_KEYWORDS if any(w in lowered for w in words)), "center")
+        objects.append({"label": chunk, "rel": rel, "prompt": chunk})
+    return objects
+
+
+def _extract_objects(content: str) -> list[dict]:
     # JSON 블록만 추출
-    match = re.search(r"\\[.*\\]", rsp.choices[0].message.content, re.S)
+    match = re.search(r"\[.*\]", content, re.S)
     data  = json.loads(match.group(0))
     return data
@@ -1,38 +1,67 @@
 # interior/fopa_runner.py
 
 from pathlib import Path
+from collections import OrderedDict
+import hashlib
+import os
 import shutil
 import subprocess
+import sys
+import threading
 import json
+import uuid
 import numpy as np
 from PIL import Image
 
+from modules.model_registry import register, use
+from modules import telemetry
+
 FOPA_DIR = Path(__file__).resolve().parent.parent / "fopa"
 FOPA_DATA_DIR = FOPA_DIR / "data/data"
+FOPA_CKPT = Path(os.getenv("FOPA_CHECKPOINT", str(FOPA_DIR / "best_weight.pth")))
 ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
 
-def write_fopa_test_json(ann_id, sc_id, new_w, new_h, scale, pos_label):
+FOPA_INPUT_SIZE = 256       # FOPA 네트워크 입력 해상도 (test.py 와 동일)
+HEATMAP_CACHE_SIZE = 32     # (배경, 전경, 크기) 별 히트맵 LRU 개수
+SEARCH_RADIUS = 0.1         # 위치 미세 조정 시 원래 bbox 중심에서 탐색할 반경 (이미지 비율)
+# 후보 점수 계산에 쓸 히트맵(= forward) 수 상한 — 후보 크기가 더 많으면 가까운 크기의 히트맵을 공유
+FOPA_SCORE_SIZES = max(1, int(os.getenv("FOPA_SCORE_SIZES", "1")))
+
+# run_fopa_batch 의 실행 방식: "inprocess" (기본, 파일 공유 없음) | "subprocess" (test.py 실행)
+# 요청 경로(run_fopa_selection)는 이 값과 무관하게 항상 in-process 스코어러를 쓴다.
+FOPA_MODE = os.getenv("FOPA_MODE", "inprocess")
+
+# ────────────────────────────── subprocess(test.py) 경로 ──────────────────────────────
+# test.py 는 FOPA_DATA_DIR 아래 고정 경로와 test_pair_new.json 을 읽기 때문에
+# 파일 이름을 실행별 ID 로 네임스페이스하고, 스테이징 → test.py 실행 → 히트맵 읽기 전체를
+# 파일 락 하나로 감싼다 (한 번에 하나씩만 실행). 그래서 요청 경로에서는 쓰지 않고,
+# 여러 쌍을 모아 test.py 한 번으로 처리하는 오프라인 배치(run_fopa_batch)에만 남겨 둔다.
+
+def write_fopa_test_json(entries: list[dict]):
     test_json = [{
-        "id": "test1",
-        "scID": sc_id,
-        "annID": ann_id,
-        "bg": f"{sc_id}.jpg",
-        "fg": f"{ann_id}.jpg",
+        "id": f"test{i + 1}",
+        "scID": e["sc_id"],
+        "annID": e["ann_id"],
+        "bg": f"{e['sc_id']}.jpg",
+        "fg": f"{e['ann_id']}.jpg",
         "mask": "",
         "fg_class": "object",
-        "composite_fg": f"{ann_id}.jpg",
-        "newWidth": new_w,
-        "newHeight": new_h,
-        "scale": scale,
-        "pos_label": [pos_label],
+        "composite_fg": f"{e['ann_id']}.jpg",
+        "newWidth": e["new_w"],
+        "newHeight": e["new_h"],
+        "scale": e["scale"],
+        "pos_label": [e["pos_label"]],
         "neg_label": [[50, 50]]
-    }]
+    } for i, e in enumerate(entries)]
     with open(FOPA_DATA_DIR / "test_pair_new.json", "w") as f:
         json.dump(test_json, f, indent=2)
 
-def get_best_position_from_heatmap(ann_id, new_w, new_h, scale):
+def _heatmap_path(ann_id, new_w, new_h, scale) -> Path:
     key = f"{ann_id}_1_{new_w}_{new_h}_{scale}"
-    heatmap_path = FOPA_DIR / "best_weight_test_heatmap" / f"{key}.jpg"
+    return FOPA_DIR / "best_weight_test_heatmap" / f"{key}.jpg"
+
+def get_best_position_from_heatmap(ann_id, new_w, new_h, scale):
+    heatmap_path = _heatmap_path(ann_id, new_w, new_h, scale)
 
     if not heatmap_path.exists():
         print(f"[-] Heatmap 없음: {heatmap_path}")
@@ -40,30 +69,267 @@ def get_best_position_from_heatmap(ann_id, new_w, new_h, scale):
 
     arr = np.array(Image.open(heatmap_path).convert("L"))
     y, x = np.unravel_index(np.argmax(arr), arr.shape)
-    return (x, y)
+    return (int(x), int(y))
+
+def _run_fopa_subprocess(pairs: list[dict]) -> list[tuple[int, int]]:
+    from filelock import FileLock
+
+    req_id = uuid.uuid4().hex[:12]
+    scale = 0.6
+    entries, staged = [], []
+    for i, pair in enumerate(pairs):
+        x1, y1, x2, y2 = pair["bbox"]
+        entries.append({
+            "ann_id": f"{req_id}_{i}",
+            "sc_id": f"{req_id}_{i}",
+            "new_w": max(1, x2 - x1),
+            "new_h": max(1, y2 - y1),
+            "scale": scale,
+            "pos_label": [x1, y1],      # 최초 위치 기준
+        })
+
+    with FileLock(str(FOPA_DATA_DIR / ".fopa.lock")):
+        try:
+            # FOPA 입력 경로 세팅 (요청별 ID 로 네임스페이스)
+            for pair, e in zip(pairs, entries):
+                size_tag = f"{e['ann_id']}_1_{e['new_w']}_{e['new_h']}.jpg"
+                targets = [
+                    (pair["bg"],   FOPA_DATA_DIR / "bg" / f"{e['sc_id']}.jpg"),
+                    (pair["fg"],   FOPA_DATA_DIR / "fg/foreground" / f"{e['ann_id']}.jpg"),
+                    (pair["mask"], FOPA_DATA_DIR / "fg/test" / size_tag),
+                    (pair["mask"], FOPA_DATA_DIR / "mask/test" / size_tag),
+                ]
+                for src, dst in targets:
+                    if isinstance(src, Image.Image):   # 메모리 이미지는 경계에서만 기록
+                        src.convert("RGB").save(dst)
+                    else:
+                        shutil.copy(src, dst)
+                    staged.append(dst)
+                staged.append(_heatmap_path(e["ann_id"], e["new_w"], e["new_h"], e["scale"]))
+
+            write_fopa_test_json(entries)
+
+            # FOPA 실행 (heatmap 모드 1회로 모든 쌍 처리)
+            telemetry.SUBPROCESS_LAUNCHES.inc(name="fopa")
+            with telemetry.span("subprocess.fopa_test", pairs=len(pairs)):
+                subprocess.run(["python", "test.py", "--mode", "heatmap"], cwd=FOPA_DIR)
+
+            results = []
+            for pair, e in zip(pairs, entries):
+                pos = get_best_position_from_heatmap(e["ann_id"], e["new_w"], e["new_h"], e["scale"])
+                results.append(pos if pos else tuple(pair["bbox"][:2]))  # fallback
+            return results
+        finally:
+            for path in staged:
+                path.unlink(missing_ok=True)
+
+# ────────────────────────────── In-process FOPA 스코어러 ──────────────────────────────
+# 모델은 레지스트리로 한 번만 로딩하고, (배경, 전경, 크기) 조합마다 히트맵을
+# 한 번만 계산해 두었다가 후보 bbox 들은 히트맵 조회로 점수를 매긴다.
 
-def run_fopa_selection(bg_path: Path, fg_path: Path, mask_path: Path, bbox: list[int]) -> tuple[int, int]:
+@register("fopa")
+def _load_fopa():
+    """FOPA ObjPlaNet (test.py 의 heatmap 모드와 같은 네트워크)"""
+    import torch
+
+    if str(FOPA_DIR) not in sys.path:
+        sys.path.insert(0, str(FOPA_DIR))
+    from network.ObjPlaNet import ObjPlaNet_simopa
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = ObjPlaNet_simopa()
+    model.load_state_dict(torch.load(FOPA_CKPT, map_location="cpu"))
+    return model.to(device).eval()
+
+
+_heatmaps: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_heatmap_lock = threading.Lock()
+
+
+def _src_hash(src) -> str:
+    """경로 또는 PIL 이미지의 내용 해시"""
+    if isinstance(src, Image.Image):
+        data = src.tobytes() + repr((src.mode, src.size)).encode()
+    else:
+        data = Path(src).read_bytes()
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def _open(src) -> Image.Image:
+    return src if isinstance(src, Image.Image) else Image.open(src)
+
+
+def _predict_heatmap(bg, fg, fg_w: int, fg_h: int) -> np.ndarray:
+    """FOPA 한 번 forward → [S, S] 배치 적합도 히트맵 (0~1, S=FOPA_INPUT_SIZE)
+
+    히트맵 (y, x) 값은 전경 중심을 그 위치에 놓았을 때의 점수.
     """
-    FOPA를 실행해서 가장 자연스러운 배치 위치(x, y)를 반환
+    import torch
+    from torchvision.transforms.functional import to_tensor
+
+    S = FOPA_INPUT_SIZE
+
+    bg_img = _open(bg).convert("RGB").resize((S, S))
+    fg_img = _open(fg)
+    alpha = fg_img.getchannel("A") if fg_img.mode == "RGBA" else Image.new("L", fg_img.size, 255)
+    fg_img = fg_img.convert("RGB").resize((fg_w, fg_h))
+    alpha = alpha.resize((fg_w, fg_h))
+
+    # 전경/마스크는 S×S 캔버스 중앙에 배치 (test.py 입력 규약)
+    fg_canvas = Image.new("RGB", (S, S))
+    mask_canvas = Image.new("L", (S, S))
+    offset = ((S - fg_w) // 2, (S - fg_h) // 2)
+    fg_canvas.paste(fg_img, offset)
+    mask_canvas.paste(alpha, offset)
+
+    with use("fopa") as model, torch.no_grad():
+        device = next(model.parameters()).device
+        bg_t = to_tensor(bg_img).unsqueeze(0).to(device)
+        fg_t = to_tensor(fg_canvas).unsqueeze(0).to(device)
+        mask_t = to_tensor(mask_canvas).unsqueeze(0).to(device)
+        out = model(bg_t, fg_t, mask_t)
+    heat = out[0] if isinstance(out, (tuple, list)) else out
+    heat = torch.nn.functional.interpolate(heat.float().reshape(1, 1, *heat.shape[-2:]), size=(S, S),
+                                           mode="bilinear", align_corners=False)[0, 0]
+    heat = heat.cpu().numpy()
+    rng = heat.max() - heat.min()
+    return (heat - heat.min()) / rng if rng > 0 else np.zeros_like(heat)
+
+
+def get_heatmap(bg, fg, fg_w: int, fg_h: int) -> np.ndarray:
+    """(배경, 전경, 크기) 별로 캐시된 히트맵 반환 (없으면 forward 1회)"""
+    key = (_src_hash(bg), _src_hash(fg), fg_w, fg_h)
+    with _heatmap_lock:
+        if key in _heatmaps:
+            _heatmaps.move_to_end(key)
+            telemetry.CACHE_REQUESTS.inc(cache="fopa_heatmap", result="hit")
+            return _heatmaps[key]
+
+    telemetry.CACHE_REQUESTS.inc(cache="fopa_heatmap", result="miss")
+    with telemetry.span("fopa.heatmap", size=f"{fg_w}x{fg_h}"):
+        heat = _predict_heatmap(bg, fg, fg_w, fg_h)
+    with _heatmap_lock:
+        _heatmaps[key] = heat
+        while len(_heatmaps) > HEATMAP_CACHE_SIZE:
+            _heatmaps.popitem(last=False)
+    return heat
+
+
+def _fg_source(obj: dict):
+    fg = obj.get("fg_image") or obj.get("fg_path")
+    if fg is None:
+        raise ValueError(f"FOPA 점수 계산에 필요한 전경 이미지가 없음: {obj.get('label')}")
+    return fg
+
+
+def score_bboxes(bg_path, obj: dict, bboxes_norm: list[list[float]]) -> list[float]:
+    """정규화 bbox 후보들의 FOPA 점수를 한 번에 계산
+
+    히트맵은 후보 크기별로 필요하지만 forward 는 객체당 최대 FOPA_SCORE_SIZES 회(기본 1).
+    후보 크기들을 면적 순으로 나눠 구간마다 가운데 크기 하나로 히트맵을 만들고,
+    각 후보는 면적이 가장 가까운 히트맵에서 중심 위치 값을 조회한다.
+    (pose_planner 의 SCALES 5개 × 격자 전체도 기본값이면 forward 1회)
     """
-    ann_id = "3"  # 객체 ID 고정 또는 uuid도 가능
-    sc_id = "000000000001"
-    new_w, new_h = 200, 100  # 크기 고정 or bbox 비율 기반 추후 개선
-    scale = 0.6
-    pos_label = [bbox[0], bbox[1]]  # 최초 위치 기준
+    fg = _fg_source(obj)
+    S = FOPA_INPUT_SIZE
+    boxes = np.asarray(bboxes_norm, dtype=np.float32).reshape(-1, 4)
+
+    sizes = np.stack([boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1)
+    sizes = np.clip(np.rint(sizes * S), 1, S).astype(int)
+    cx = np.clip(((boxes[:, 0] + boxes[:, 2]) / 2 * S).astype(int), 0, S - 1)
+    cy = np.clip(((boxes[:, 1] + boxes[:, 3]) / 2 * S).astype(int), 0, S - 1)
+
+    # 대표 크기 고르기: 서로 다른 크기를 면적 순으로 FOPA_SCORE_SIZES 구간으로 나눈 각 구간의 가운데
+    distinct = sorted({tuple(sz) for sz in sizes.tolist()}, key=lambda wh: wh[0] * wh[1])
+    n = min(FOPA_SCORE_SIZES, len(distinct))
+    refs = [distinct[int((k + 0.5) * len(distinct) / n)] for k in range(n)]
+    log_area = np.log(sizes[:, 0] * sizes[:, 1])
+    ref_log_area = np.log([w * h for w, h in refs])
+    nearest = np.abs(log_area[:, None] - ref_log_area[None, :]).argmin(axis=1)
+
+    scores = np.zeros(len(boxes), dtype=np.float32)
+    for k, (w, h) in enumerate(refs):
+        sel = nearest == k
+        heat = get_heatmap(bg_path, fg, w, h)
+        scores[sel] = heat[cy[sel], cx[sel]]
+    return scores.tolist()
+
+
+def score_bbox(bg_path, obj: dict, bbox_norm: list[float]) -> float:
+    """단일 정규화 bbox 의 FOPA 점수 (0~1, 클수록 자연스러움)"""
+    return score_bboxes(bg_path, obj, [bbox_norm])[0]
 
-    # FOPA 입력 경로 세팅
-    shutil.copy(bg_path, FOPA_DATA_DIR / "bg" / f"{sc_id}.jpg")
-    shutil.copy(fg_path, FOPA_DATA_DIR / "fg/foreground" / f"{ann_id}.jpg")
-    shutil.copy(mask_path, FOPA_DATA_DIR / "fg/test" / f"{ann_id}_1_200_100.jpg")
-    shutil.copy(mask_path, FOPA_DATA_DIR / "mask/test" / f"{ann_id}_1_200_100.jpg")
 
-    write_fopa_test_json(ann_id, sc_id, new_w, new_h, scale, pos_label)
+# ────────────────────────────── 위치 미세 조정 ──────────────────────────────
 
-    # FOPA 실행
-    subprocess.run(["python", "test.py", "--mode", "heatmap"], cwd=FOPA_DIR)
-    subprocess.run(["python", "test.py", "--mode", "composite"], cwd=FOPA_DIR)
+def _overlaps_any(x: float, y: float, w: float, h: float, avoid) -> bool:
+    return any(x < ax2 and x + w > ax1 and y < ay2 and y + h > ay1 for ax1, ay1, ax2, ay2 in avoid)
 
-    best_pos = get_best_position_from_heatmap(ann_id, new_w, new_h, scale)
+
+def _select_inprocess(pair: dict) -> tuple[int, int]:
+    """히트맵에서 원래 bbox 주변(SEARCH_RADIUS) 최고점으로 bbox 좌상단 (x, y) 반환
+
+    pair["avoid"] 의 bbox 들과 겹치게 되는 위치는 후보에서 뺀다 (남는 후보가 없으면 원래 위치).
+    """
+    S = FOPA_INPUT_SIZE
+    bg = _open(pair["bg"])
+    W, H = bg.size
+    x1, y1, x2, y2 = pair["bbox"]
+    fg_w = int(np.clip(round((x2 - x1) / W * S), 1, S))
+    fg_h = int(np.clip(round((y2 - y1) / H * S), 1, S))
+    heat = get_heatmap(pair["bg"], pair["fg"], fg_w, fg_h)
+
+    cx, cy = (x1 + x2) / 2 / W * S, (y1 + y2) / 2 / H * S
+    r = SEARCH_RADIUS * S
+    ys, xs = np.mgrid[0:S, 0:S]
+    window = (np.abs(xs - cx) <= r) & (np.abs(ys - cy) <= r)
+    bw, bh = x2 - x1, y2 - y1
+    left, top = (xs + 0.5) / S * W - bw / 2, (ys + 0.5) / S * H - bh / 2
+    for ax1, ay1, ax2, ay2 in pair.get("avoid") or ():
+        window &= ~((left < ax2) & (left + bw > ax1) & (top < ay2) & (top + bh > ay1))
+    if not window.any():
+        return x1, y1
+    y, x = np.unravel_index(np.argmax(np.where(window, heat, -1.0)), heat.shape)
+
+    # 히트맵 좌표(전경 중심) → 배경 픽셀 좌표(bbox 좌상단)
+    best_x = int((x + 0.5) / S * W - (x2 - x1) / 2)
+    best_y = int((y + 0.5) / S * H - (y2 - y1) / 2)
+    return best_x, best_y
+
+
+def run_fopa_batch(pairs: list[dict]) -> list[tuple[int, int]]:
+    """여러 (배경, 전경, bbox) 쌍에 대해 FOPA 최적 위치를 한 번에 계산
+
+    pairs 원소: {"bg": 경로|PIL, "fg": 경로|PIL, "mask": 경로|PIL, "bbox": [x1, y1, x2, y2],
+                "avoid": 겹치면 안 되는 bbox 목록 (선택)}
+    반환: 쌍별 bbox 좌상단 (x, y) — avoid 와 겹치는 위치는 고르지 않음 (원래 위치로 대체)
+
+    inprocess 모드는 공유 파일을 쓰지 않으므로 서로 다른 요청이 동시에 실행돼도 안전하다.
+    FOPA_MODE=subprocess 면 pairs 전체를 한 번의 test.py 실행으로 처리한다 (파일 락으로 직렬화 —
+    오프라인 배치용, 요청 경로는 run_fopa_selection 으로 항상 inprocess).
+    """
+    if FOPA_MODE == "subprocess":
+        results = _run_fopa_subprocess(pairs)
+        return [
+            tuple(p["bbox"][:2]) if _overlaps_any(x, y, p["bbox"][2] - p["bbox"][0], p["bbox"][3] - p["bbox"][1],
+                                                  p.get("avoid") or ()) else (x, y)
+            for p, (x, y) in zip(pairs, results)
+        ]
+    return [_select_inprocess(p) for p in pairs]
+
+
+def run_fopa_selection(bg_path: Path, fg_path: Path, mask_path: Path, bbox: list[int],
+                       avoid: list[list[int]] | None = None) -> tuple[int, int]:
+    """
+    FOPA를 실행해서 가장 자연스러운 배치 위치(x, y)를 반환
+    - avoid: 다른 객체 bbox([x1, y1, x2, y2]) 들 — 이들과 겹치는 위치는 고르지 않음
+    - 요청 경로이므로 FOPA_MODE 와 무관하게 in-process 스코어러 사용 (전역 파일 락 없음)
+    """
+    pair = {"bg": bg_path, "fg": fg_path, "mask": mask_path, "bbox": bbox, "avoid": avoid}
+    try:
+        best_pos = _select_inprocess(pair)
+    except Exception as e:
+        print(f"[-] FOPA 실패, 원래 위치 사용: {e}")
+        best_pos = (bbox[0], bbox[1])  # fallback
     print(f"[+] FOPA 최적 위치: {best_pos}")
-    return best_pos if best_pos else (bbox[0], bbox[1])  # fallback
+    return best_pos
@@ -1,47 +1,81 @@
-import torch
-from diffusers import StableDiffusionPipeline
+import os
 from pathlib import Path
 
-# 1) 배경 제거 모듈 추가 ---------------------- (추가)
-from carvekit.api.high import HiInterface
+# 모델은 레지스트리에서 프로세스당 한 번만 로딩 (SD+LoRA, CarveKit)
+from modules.model_registry import use, SD_BASE_MODEL, SD_LORA_MODEL, CARVEKIT_OBJECT_TYPE
+from modules.microbatch import MicroBatcher
+from modules.asset_cache import furniture_cache
+from modules.quality import Sampler, apply_sampler, sampler_for
 
-# 2) CarveKit 인터페이스를 전역에서 한 번만 초기화 (추가)
-remover = HiInterface(
-    object_type="object",  # or "h" for human
-    device="cuda" if torch.cuda.is_available() else "cpu"
-)
+IMAGE_SIZE = 512
+# 시드를 고정해야 같은 프롬프트 → 같은 이미지 (캐시 키의 일부)
+DEFAULT_SEED = int(os.getenv("ROOMIE_FURNITURE_SEED", "0"))
 
-def generate_lora_furniture(prompt: str, obj_id: str) -> str:
-    prompt = obj["prompt"]
-    base_model = "stabilityai/stable-diffusion-2-1"
-    lora_model = "triggah61/lora-home-furniture"
 
-    dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+def _run_lora_batch(key, items: list[tuple[str, int]]):
+    """같은 (모델, 해상도, 샘플러) 요청을 한 번의 SD+LoRA 호출로 생성 (요청별 시드 유지)"""
+    import torch
 
-    print(f"[DEBUG] Loading base model: {base_model}")
-    pipe = StableDiffusionPipeline.from_pretrained(
-        base_model,
-        torch_dtype=dtype
-    ).to(device)
+    _, height, width, *sampler = key
+    sampler = Sampler(*sampler)
+    prompts, seeds = zip(*items)
+    with use("sd_lora") as pipe:
+        apply_sampler(pipe, sampler, "sd_lora")
+        generators = [torch.Generator(device=pipe.device).manual_seed(s) for s in seeds]
+        result = pipe(list(prompts), height=height, width=width, generator=generators,
+                      num_inference_steps=sampler.steps, guidance_scale=sampler.guidance)
 
-    print(f"[DEBUG] Loading LoRA: {lora_model}")
-    pipe.load_lora_weights(lora_model)
-    print(f"[DEBUG] LoRA 적용 완료")
+    if not hasattr(result, "images") or len(result.images) != len(prompts):
+        raise RuntimeError("pipe() 결과에 이미지가 없습니다.")
+    return result.images
 
-    print(f"[DEBUG] Running prompt: {prompt}")
-    result = pipe(prompt, height=512, width=512)
 
-    if not hasattr(result, "images") or not result.images:
-        raise RuntimeError("pipe() 결과에 이미지가 없습니다.")
+# 요청 간 마이크로 배칭 (동시에 들어온 가구 생성 요청을 묶어서 실행)
+_lora_batcher = MicroBatcher("sd_lora", _run_lora_batch)
+
+
+def furniture_cache_key(prompt: str, seed: int = DEFAULT_SEED, sampler: Sampler | None = None) -> str:
+    """가구 이미지를 결정하는 모든 입력으로 만든 캐시 키"""
+    return furniture_cache.make_key(
+        prompt=prompt,
+        base=SD_BASE_MODEL,
+        lora=SD_LORA_MODEL,
+        seed=seed,
+        sampler=list(sampler or sampler_for("lora")),
+        resolution=[IMAGE_SIZE, IMAGE_SIZE],
+        matting=f"carvekit:{CARVEKIT_OBJECT_TYPE}",
+    )
+
+
+def generate_lora_furniture(obj: dict, obj_id: str, persist: bool = True, quality: str | None = None):
+    """가구 RGBA 이미지 생성 — persist=False 면 저장하지 않고 PIL(RGBA) 그대로 반환
+
+    같은 (프롬프트, 모델, 시드, 샘플러, 해상도, 매팅) 조합은 캐시에서 바로 돌려준다.
+    quality: draft | standard | final (생략 시 ROOMIE_QUALITY)
+    """
+    prompt = obj["prompt"]
+    seed = int(obj.get("seed", DEFAULT_SEED))
+    sampler = sampler_for("lora", quality)
+    key = furniture_cache_key(prompt, seed, sampler)
+
+    image_rgba = furniture_cache.get(key)
+    if image_rgba is not None:
+        print(f"[DEBUG] 가구 캐시 히트: {prompt}")
+    else:
+        # 1) 상주 중인 SD+LoRA 파이프라인 (배처 경유)
+        print(f"[DEBUG] Running prompt: {prompt}")
+        image = _lora_batcher.submit(("sd_lora", IMAGE_SIZE, IMAGE_SIZE, *sampler), (prompt, seed))  # PIL(RGB)
+        print("[DEBUG] SD-LoRA 이미지 생성 완료")
 
-    image = result.images[0]               # PIL(RGB)
-    print("[DEBUG] SD-LoRA 이미지 생성 완료")
+        # 2) 배경 제거 --------------------------------
+        with use("carvekit") as remover:
+            image_rgba = remover([image])[0]   # PIL(RGBA)
+        furniture_cache.put(key, image_rgba)
 
-    # 3) 배경 제거 -------------------------------- (추가)
-    image_rgba = remover([image])[0]       # PIL(RGBA)
+    if not persist:
+        return image_rgba
 
-    # 4) 저장 -------------------------------------
+    # 3) 저장 -------------------------------------
     save_dir  = Path("assets")
     save_dir.mkdir(parents=True, exist_ok=True)
     save_path = save_dir / f"{obj_id}.png"
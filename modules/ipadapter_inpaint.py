@@ -1,55 +1,234 @@
 # interior/ipadapter_inpaint.py
 
 from pathlib import Path
-from diffusers import StableDiffusionInpaintPipeline
-from PIL import Image
-import torch
+import os
+import numpy as np
+from PIL import Image, ImageFilter
+
+from modules.model_registry import use
+from modules.artifacts import load_image
+from modules.mask_generator import merge_masks
+from modules.microbatch import MicroBatcher, active_requests
+from modules.quality import Sampler, apply_sampler, sampler_for
 
 ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
 ASSET_DIR.mkdir(exist_ok=True)
 
-pipe = None
+IMAGE_SIZE = 512
+# 스케줄러 / 스텝 수 / guidance 는 품질 티어(modules.quality)에서 결정
+
+# 인페인팅 모드
+#   • full   : 배경 전체를 512×512 로 줄여 인페인팅 (결과도 512×512)
+#   • region : bbox 주변 패딩 창만 잘라 (비율 유지, 긴 변 ≤ 512) 인페인팅하고, 원본 해상도 배경에
+#              페더링 블렌딩. 여러 객체를 합칠 때도 객체마다 자기 창만 인페인팅한다
+INPAINT_MODE = os.getenv("ROOMIE_INPAINT_MODE", "full")
+INPAINT_MODES = ("full", "region")
+REGION_PAD = 0.25       # bbox 크기 대비 크롭 여유 비율 (축별, 주변 문맥 확보)
+REGION_MIN_PAD = 32     # 최소 여유(px)
+FEATHER_PX = 8          # 블렌딩 경계 페더링 반경(px)
+REGION_MIN_RES = 256    # 작은 크롭은 긴 변을 이 해상도까지 낮춰서 인페인팅 (가구 크기에 비례한 비용)
+REGION_MIN_SIDE = 64    # 가로로 긴 창에서 짧은 변의 최소 모델 해상도
+
+
+def _run_inpaint_batch(key, items: list[tuple]):
+    """같은 (모델, 가로, 세로, 스케줄러, 스텝, guidance) 요청을 한 번의 Inpaint 호출로 실행"""
+    _, width, height, *sampler = key
+    sampler = Sampler(*sampler)
+    prompts, images, masks = zip(*items)
+    with use("sd_inpaint") as pipe:
+        apply_sampler(pipe, sampler, "sd_inpaint")
+        return pipe(
+            prompt=list(prompts),
+            image=list(images),
+            mask_image=list(masks),
+            height=height,
+            width=width,
+            guidance_scale=sampler.guidance,
+            num_inference_steps=sampler.steps,
+        ).images
+
+
+# 요청 간 마이크로 배칭 (동시에 들어온 인페인팅 요청을 묶어서 실행)
+# 인페인팅은 요청마다 한 번에 하나씩만 들어오므로 (region 창 여러 개는 submit_many_async 로 한꺼번에)
+# 실행 중인 요청 수만큼 모이면 창을 기다리지 않음
+_inpaint_batcher = MicroBatcher("sd_inpaint", _run_inpaint_batch, producers=active_requests)
+
+
+def _resolve_mode(mode: str | None) -> str:
+    """생략 시 ROOMIE_INPAINT_MODE, 모르는 값은 full 로 바꾸지 않고 ValueError"""
+    mode = mode or INPAINT_MODE
+    if mode not in INPAINT_MODES:
+        raise ValueError(f"inpaint_mode 는 {'|'.join(INPAINT_MODES)} 중 하나: {mode}")
+    return mode
+
+
+def _bbox_mask(size: tuple[int, int], bboxes: list[list[int]]) -> Image.Image:
+    """배경 해상도 기준 bbox([x1, y1, x2, y2]) 들의 합집합 마스크"""
+    mask = np.zeros((size[1], size[0]), dtype=np.uint8)
+    for x1, y1, x2, y2 in bboxes:
+        mask[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = 255
+    return Image.fromarray(mask)
+
+
+def _ceil8(v: float) -> int:
+    return -(-int(v) // 8) * 8
+
+
+def _axis_window(lo: int, hi: int, limit: int) -> tuple[int, int]:
+    """한 축의 창 [start, end): bbox 길이에 비례한 여유 + 8의 배수, 이미지 밖으로 나가지 않게 이동/축소"""
+    length = max(1, hi - lo)
+    pad = max(REGION_MIN_PAD, int(length * REGION_PAD))
+    side = min(_ceil8(length + 2 * pad), limit)
+    start = min(max(0, (lo + hi) // 2 - side // 2), limit - side)
+    return start, start + side
+
+
+def _region_window(bbox: list[int], W: int, H: int) -> tuple[int, int, int, int]:
+    """bbox 를 축별로 패딩한 크롭 창 (bbox 비율 유지 → 이미지 짧은 변보다 넓은 가구도 전부 포함)"""
+    x1, y1, x2, y2 = bbox
+    left, right = _axis_window(x1, x2, W)
+    top, bottom = _axis_window(y1, y2, H)
+    return left, top, right, bottom
+
+
+def _region_res(width: int, height: int) -> tuple[int, int]:
+    """크롭 비율을 유지한 모델 해상도 (8의 배수, 긴 변 REGION_MIN_RES ~ IMAGE_SIZE)"""
+    long_side = max(width, height)
+    target = min(IMAGE_SIZE, max(REGION_MIN_RES, _ceil8(long_side)))
+    scale = target / long_side
+    return (max(REGION_MIN_SIDE, min(IMAGE_SIZE, _ceil8(width * scale))),
+            max(REGION_MIN_SIDE, min(IMAGE_SIZE, _ceil8(height * scale))))
+
+
+def _inpaint_regions(image: Image.Image, regions: list[tuple], sampler: Sampler) -> Image.Image:
+    """(마스크, bbox, 프롬프트) 마다 bbox 주변 창만 모델 해상도로 인페인팅해 원본 해상도 배경에 페더링 블렌딩
+
+    창들은 한꺼번에 배처에 넣으므로 같은 해상도끼리는 한 번의 호출로 묶인다.
+    각 창은 원본에서 잘라 자기 마스크 영역만 덮어쓰고, 창 밖 픽셀은 원본 그대로라
+    결과 해상도·비율이 입력과 같다.
+    """
+    W, H = image.size
+    pending, requests = [], []
+    for mask_full, bbox, prompt in regions:
+        window = _region_window(bbox, W, H)
+        crop = image.crop(window)
+        crop_mask = mask_full.crop(window)
+        size = _region_res(*crop.size)
+        requests.append((("sd_inpaint", *size, *sampler), (prompt, crop.resize(size), crop_mask.resize(size))))
+        pending.append((window, crop_mask))
+    futures = _inpaint_batcher.submit_many_async(requests)
+
+    out = image.copy()
+    for (window, crop_mask), fut in zip(pending, futures):
+        result = fut.result().resize(crop_mask.size, Image.LANCZOS)
+        # 마스크를 살짝 넓힌 뒤 흐려서 경계가 자연스럽게 섞이도록
+        alpha = crop_mask.filter(ImageFilter.MaxFilter(2 * (FEATHER_PX // 2) + 1))
+        alpha = alpha.filter(ImageFilter.GaussianBlur(FEATHER_PX))
+        out.paste(result, window[:2], alpha)
+    return out
+
 
 def run_ipadapter_inpaint(
     background: Path,
     condition_img: Path,
     mask: Path,
-    position: tuple[int, int],
+    bbox: list[int],
     prompt: str,
-    object_id: str
-) -> Path:
+    object_id: str,
+    persist: bool = True,
+    mode: str | None = None,
+    quality: str | None = None,
+):
     """
     IP-Adapter + 마스크 기반 인페인팅 실행
+    - background / condition_img / mask 는 경로 또는 PIL 이미지
+    - persist=False 면 결과를 저장하지 않고 PIL 이미지로 반환 (다음 객체에서 재디코딩 없음)
+    - mode="region" 이면 bbox 주변만 인페인팅하고 원본 해상도·비율을 유지
+      (mask 가 배경과 크기가 다르면 bbox 로 마스크를 만든다)
+    - quality: draft | standard | final → 스케줄러 / 스텝 수 (생략 시 ROOMIE_QUALITY)
     """
-    global pipe
+    sampler = sampler_for("inpaint", quality)
+    if _resolve_mode(mode) == "region":
+        image = load_image(background, "RGB")
+        mask_full = load_image(mask, "L")
+        if mask_full.size != image.size:
+            mask_full = _bbox_mask(image.size, [bbox])
+        result = _inpaint_regions(image, [(mask_full, bbox, prompt)], sampler)
+    else:
+        result = _inpaint_full(background, condition_img, mask, prompt, sampler)
+    return _finish(result, object_id, persist)
+
 
-    if pipe is None:
-        print("[*] Inpaint 파이프라인 로딩 중...")
-        model_id = "stabilityai/stable-diffusion-2-inpainting"
-        pipe = StableDiffusionInpaintPipeline.from_pretrained(
-            model_id,
-            torch_dtype=torch.float16,
-            safety_checker=None,
-        ).to("cuda" if torch.cuda.is_available() else "cpu")
+def _finish(result: Image.Image, object_id: str, persist: bool):
+    if not persist:
+        return result
 
+    output_path = ASSET_DIR / f"output_{object_id}.jpg"
+    result.save(output_path)
+    print(f"[+] Inpainting 결과 저장 완료: {output_path}")
+    return output_path
+
+
+def _inpaint_full(background, condition_img, mask, prompt: str, sampler: Sampler) -> Image.Image:
     # 이미지 로딩
-    image = Image.open(background).convert("RGB").resize((512, 512))
-    mask_img = Image.open(mask).convert("L").resize((512, 512))
-    condition = Image.open(condition_img).convert("RGB").resize((512, 512))
+    size = (IMAGE_SIZE, IMAGE_SIZE)
+    image = load_image(background, "RGB").resize(size)
+    mask_img = load_image(mask, "L").resize(size)
+    condition = load_image(condition_img, "RGB").resize(size)
 
     # 실제로는 IP-Adapter embedder와 adapter 모델을 끼워 넣는 구조가 필요하지만,
     # 지금은 기본 inpaint로 연결만 해두자 (향후 교체)
 
     # 기본 인페인팅 실행 (condition을 직접 활용하지 않음 - placeholder)
-    result = pipe(
-        prompt=prompt,
-        image=image,
-        mask_image=mask_img,
-        guidance_scale=7.5,
-        num_inference_steps=30,
-    ).images[0]
+    # 상주 Inpaint 파이프라인 앞의 배처를 거쳐 다른 요청과 묶여 실행될 수 있음
+    key = ("sd_inpaint", IMAGE_SIZE, IMAGE_SIZE, *sampler)
+    return _inpaint_batcher.submit(key, (prompt, image, mask_img))
 
-    output_path = ASSET_DIR / f"output_{object_id}.jpg"
-    result.save(output_path)
-    print(f"[+] Inpainting 결과 저장 완료: {output_path}")
-    return output_path
+
+def run_ipadapter_inpaint_merged(
+    background: Path,
+    regions: list[dict],
+    object_id: str,
+    persist: bool = True,
+    mode: str | None = None,
+    quality: str | None = None,
+):
+    """
+    서로 겹치지 않는 여러 객체를 한 번의 인페인팅 패스로 합성
+
+    regions 원소: {condition_img, mask, bbox, prompt}
+    full 모드: 마스크는 bbox 들의 합집합(배경 크기)으로, 프롬프트는 객체별 프롬프트를 이어 붙여 하나로 만든다.
+    region 모드: 객체마다 자기 bbox 창 / 프롬프트로 인페인팅 (창들은 배처에서 함께 실행).
+    멀리 떨어진 객체들의 합집합 창을 512 로 줄여 방 전체를 다시 그리는 일이 없다.
+    """
+    if len(regions) == 1:
+        return run_ipadapter_inpaint(background=background, object_id=object_id,
+                                     persist=persist, mode=mode, quality=quality, **regions[0])
+
+    if _resolve_mode(mode) == "region":
+        image = load_image(background, "RGB")
+        result = _inpaint_regions(
+            image,
+            [(_bbox_mask(image.size, [r["bbox"]]), r["bbox"], r["prompt"]) for r in regions],
+            sampler_for("inpaint", quality),
+        )
+        return _finish(result, object_id, persist)
+
+    size = load_image(background).size
+    mask = merge_masks([r["bbox"] for r in regions], size, object_id, persist=persist)
+    prompt = ", ".join(dict.fromkeys(r["prompt"] for r in regions if r["prompt"]))
+    bbox = [
+        min(r["bbox"][0] for r in regions), min(r["bbox"][1] for r in regions),
+        max(r["bbox"][2] for r in regions), max(r["bbox"][3] for r in regions),
+    ]
+    return run_ipadapter_inpaint(
+        background=background,
+        condition_img=regions[0]["condition_img"],
+        mask=mask,
+        bbox=bbox,
+        prompt=prompt,
+        object_id=object_id,
+        persist=persist,
+        mode=mode,
+        quality=quality,
+    )
@@ -0,0 +1,199 @@
+# modules/jobs.py
+
+"""
+비동기 작업 큐
+==============
+
+`run_interior_pipeline` 처럼 수 분씩 걸리는 동기 작업을 이벤트 루프 밖의
+워커 풀에서 실행하고, 상태/결과는 교체 가능한 작업 저장소에 기록한다.
+
+* `JobQueue.submit(fn, **kwargs)` : 즉시 job_id 반환
+* `JobQueue.get(job_id)`          : 상태 조회 (queued → running → done | failed)
+* 저장소                           : `MemoryJobStore` (기본) / `RedisJobStore`
+  (`ROOMIE_JOB_STORE=redis`, `REDIS_URL`)
+* 동시 실행 수                     : `ROOMIE_JOB_WORKERS` (기본 `ROOMIE_BATCH_MAX`)
+  GPU 호출은 마이크로 배처 디스패처가 모델별로 하나씩 실행하므로, 파이프라인을 여러 개 동시에
+  돌려야 요청 간 배칭이 생긴다. 실행 중인 작업 수는 `microbatch.request_scope()` 로 배처에 알림
+* 진행 이벤트                      : `submit(..., events=True)` 이면 작업 함수에 `on_event` 를 넘기고,
+  받은 이벤트를 저장소에 순서대로 쌓는다 (스트리밍 엔드포인트가 읽어감)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules import telemetry
+from modules.microbatch import BATCH_MAX, request_scope
+
+JOB_TTL_SEC = int(os.getenv("ROOMIE_JOB_TTL", str(24 * 3600)))
+
+
+# ────────────────────────────── 작업 저장소 ──────────────────────────────
+
+class JobStore:
+    """작업 상태 저장소 인터페이스"""
+
+    def create(self, job_id: str, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def append_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def events(self, job_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        """start 번째 이후의 이벤트 목록"""
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    """프로세스 메모리 저장소 (단일 서버 프로세스용)"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, record):
+        with self._lock:
+            self._purge()
+            self._jobs[job_id] = dict(record)
+            self._events[job_id] = []
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def append_event(self, job_id, event):
+        with self._lock:
+            if job_id in self._events:
+                self._events[job_id].append(event)
+
+    def events(self, job_id, start=0):
+        with self._lock:
+            return list(self._events.get(job_id, [])[start:])
+
+    def _purge(self):
+        cutoff = time.time() - JOB_TTL_SEC
+        for job_id in [k for k, v in self._jobs.items() if v.get("created_at", 0) < cutoff]:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+
+
+class RedisJobStore(JobStore):
+    """Redis 해시 저장소 (여러 서버 프로세스가 상태를 공유)"""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = "roomie:job:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                                           decode_responses=True)
+        self.prefix = prefix
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}{job_id}"
+
+    def create(self, job_id, record):
+        key = self._key(job_id)
+        self.client.hset(key, mapping={k: json.dumps(v) for k, v in record.items()})
+        self.client.expire(key, JOB_TTL_SEC)
+
+    def update(self, job_id, **fields):
+        self.client.hset(self._key(job_id), mapping={k: json.dumps(v) for k, v in fields.items()})
+
+    def get(self, job_id):
+        raw = self.client.hgetall(self._key(job_id))
+        return {k: json.loads(v) for k, v in raw.items()} if raw else None
+
+    def append_event(self, job_id, event):
+        key = self._key(job_id) + ":events"
+        self.client.rpush(key, json.dumps(event))
+        self.client.expire(key, JOB_TTL_SEC)
+
+    def events(self, job_id, start=0):
+        return [json.loads(e) for e in self.client.lrange(self._key(job_id) + ":events", start, -1)]
+
+
+def make_store(kind: Optional[str] = None) -> JobStore:
+    kind = (kind or os.getenv("ROOMIE_JOB_STORE", "memory")).lower()
+    if kind == "redis":
+        return RedisJobStore()
+    if kind == "memory":
+        return MemoryJobStore()
+    raise ValueError(f"알 수 없는 작업 저장소: {kind}")
+
+
+# ────────────────────────────── 작업 큐 ──────────────────────────────
+
+class JobQueue:
+    """워커 스레드 풀에서 작업을 실행하고 저장소에 상태를 기록"""
+
+    def __init__(self, store: Optional[JobStore] = None, max_workers: Optional[int] = None):
+        self.store = store or make_store()
+        self.max_workers = max_workers or int(os.getenv("ROOMIE_JOB_WORKERS", str(BATCH_MAX)))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="roomie-job")
+
+    def _submit(self, fn: Callable[..., Any], kwargs: Dict[str, Any], events: bool) -> Tuple[str, Future]:
+        job_id = uuid.uuid4().hex
+        created = time.time()
+        self.store.create(job_id, {
+            "id": job_id,
+            "status": "queued",
+            "created_at": created,
+            "result": None,
+            "error": None,
+        })
+        if events:
+            kwargs = {**kwargs, "on_event": lambda e: self.store.append_event(job_id, e)}
+        return job_id, self._pool.submit(self._run, job_id, fn, kwargs, created)
+
+    def submit(self, fn: Callable[..., Any], events: bool = False, **kwargs) -> str:
+        """작업을 큐에 넣고 job_id 를 즉시 반환"""
+        return self._submit(fn, kwargs, events)[0]
+
+    async def run(self, fn: Callable[..., Any], events: bool = False, **kwargs) -> Tuple[str, Any]:
+        """작업을 큐에 넣고 이벤트 루프를 막지 않은 채 끝날 때까지 대기"""
+        job_id, fut = self._submit(fn, kwargs, events)
+        return job_id, await asyncio.wrap_future(fut)
+
+    def _run(self, job_id: str, fn: Callable[..., Any], kwargs: Dict[str, Any], queued_at: float) -> Any:
+        started = time.time()
+        telemetry.QUEUE_SECONDS.observe(started - queued_at, queue="job")
+        self.store.update(job_id, status="running", started_at=started)
+        try:
+            # 작업 안의 스팬 로그는 job_id 를 trace id 로 묶음
+            with telemetry.trace(job_id), telemetry.span("job", fn=getattr(fn, "__name__", str(fn))), \
+                    request_scope():
+                result = fn(**kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+            self.store.update(job_id, status="failed", finished_at=time.time(), error=error)
+            self.store.append_event(job_id, {"type": "failed", "error": error, "ts": time.time()})
+            raise
+        result_str = str(result) if result is not None else None
+        self.store.update(job_id, status="done", finished_at=time.time(), result=result_str)
+        self.store.append_event(job_id, {"type": "done", "result": result_str, "ts": time.time()})
+        return result
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,261 @@
+# modules/llm_cache.py
+
+"""
+LLM 응답 캐시
+=============
+
+`description_parser` / `pose_planner` 의 LLM 호출(`modules.llm_client`)을 감싸서,
+같은 (정규화한 메시지, 모델, temperature) 요청은 저장된 응답을 재사용한다.
+
+* 저장소      : `SqliteLLMCache` (기본, assets/llm_cache.sqlite) / `RedisLLMCache` / `MemoryLLMCache`
+  (`ROOMIE_LLM_CACHE=sqlite|redis|memory|off`, `REDIS_URL`)
+* 만료 / 상한  : `ROOMIE_LLM_CACHE_TTL` 초 (기본 7일), `ROOMIE_LLM_CACHE_MAX` 항목 (기본 10000, 오래 안 쓴 순 삭제)
+* 동시 요청 병합 : 같은 키의 호출이 진행 중이면 새로 호출하지 않고 그 결과를 같이 기다린다
+* 응답은 `parse` 가 성공한 경우에만 저장 (깨진 JSON 을 TTL 동안 재사용하지 않도록)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from modules import telemetry
+
+ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
+
+LLM_CACHE_TTL = int(os.getenv("ROOMIE_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX = int(os.getenv("ROOMIE_LLM_CACHE_MAX", "10000"))
+
+
+# ────────────────────────────── 캐시 저장소 ──────────────────────────────
+
+class LLMCache:
+    """응답 캐시 저장소 인터페이스 (값은 모델이 돌려준 원문 문자열)"""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryLLMCache(LLMCache):
+    """프로세스 메모리 LRU (재시작하면 사라짐)"""
+
+    def __init__(self, ttl: int = LLM_CACHE_TTL, max_items: int = LLM_CACHE_MAX):
+        self.ttl, self.max_items = ttl, max_items
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()     # key → (value, created_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if time.time() - item[1] > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+class SqliteLLMCache(LLMCache):
+    """로컬 sqlite 파일 (단일 호스트에서 재시작 후에도 유지)"""
+
+    def __init__(self, path: Optional[Path] = None, ttl: int = LLM_CACHE_TTL, max_items: int = LLM_CACHE_MAX):
+        self.path = Path(path or ASSET_DIR / "llm_cache.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl, self.max_items = ttl, max_items
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now))
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,))
+
+
+class RedisLLMCache(LLMCache):
+    """Redis (여러 서버 프로세스가 캐시를 공유). 상한은 사용 시각 sorted set 으로 관리"""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = "roomie:llm:",
+                 ttl: int = LLM_CACHE_TTL, max_items: int = LLM_CACHE_MAX):
+        import redis
+
+        self.client = redis.Redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                                           decode_responses=True)
+        self.prefix, self.ttl, self.max_items = prefix, ttl, max_items
+        self._lru = prefix + "lru"
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is not None:
+            self.client.zadd(self._lru, {key: time.time()})
+        return value
+
+    def set(self, key, value):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=self.ttl)
+        pipe.zadd(self._lru, {key: time.time()})
+        pipe.execute()
+
+        overflow = self.client.zcard(self._lru) - self.max_items
+        if overflow > 0:
+            old = self.client.zrange(self._lru, 0, overflow - 1)
+            if old:
+                self.client.delete(*[self.prefix + k for k in old])
+                self.client.zrem(self._lru, *old)
+
+
+def make_llm_cache(kind: Optional[str] = None) -> Optional[LLMCache]:
+    kind = (kind or os.getenv("ROOMIE_LLM_CACHE", "sqlite")).lower()
+    if kind == "sqlite":
+        return SqliteLLMCache()
+    if kind == "redis":
+        return RedisLLMCache()
+    if kind == "memory":
+        return MemoryLLMCache()
+    if kind == "off":
+        return None
+    raise ValueError(f"알 수 없는 LLM 캐시 저장소: {kind}")
+
+
+# ────────────────────────────── 캐시된 호출 ──────────────────────────────
+
+_cache: Optional[LLMCache] = None
+_cache_ready = False
+_inflight: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+llm_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+
+def _get_cache() -> Optional[LLMCache]:
+    global _cache, _cache_ready
+    with _lock:
+        if not _cache_ready:
+            _cache, _cache_ready = make_llm_cache(), True
+        return _cache
+
+
+def normalize_prompt(text: str) -> str:
+    """공백 차이만 있는 프롬프트가 같은 키가 되도록 정규화"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    blob = json.dumps({
+        "model": model,
+        "temperature": round(float(temperature), 4),
+        "messages": [[m["role"], normalize_prompt(m["content"])] for m in messages],
+    }, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _call_llm(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    from modules.llm_client import chat_sync   # 공유 커넥션 풀 / 데드라인 / 재시도 / 회로 차단기
+
+    return chat_sync(model, messages, temperature)
+
+
+def cached_chat(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    parse: Callable[[str], Any] = lambda s: s,
+) -> Any:
+    """LLM 응답을 `parse(content)` 한 결과를 반환 (캐시 / 동시 요청 병합 적용)
+
+    parse 가 예외를 던지면 응답을 저장하지 않고 예외를 그대로 전파한다.
+    """
+    cache = _get_cache()
+    key = cache_key(model, messages, temperature)
+
+    if cache is not None:
+        try:
+            content = cache.get(key)
+        except Exception as e:      # 캐시 장애는 호출 실패로 이어지지 않게
+            print(f"[WARN] LLM 캐시 조회 실패: {e}")
+            content = None
+        if content is not None:
+            try:
+                value = parse(content)
+                llm_cache_stats["hits"] += 1
+                telemetry.CACHE_REQUESTS.inc(cache="llm", result="hit")
+                return value
+            except Exception:
+                pass                # 파서가 바뀌어 더 이상 읽을 수 없는 항목 → 다시 호출
+
+    with _lock:
+        fut = _inflight.get(key)
+        leader = fut is None
+        if leader:
+            fut = _inflight[key] = Future()
+            llm_cache_stats["misses"] += 1
+            telemetry.CACHE_REQUESTS.inc(cache="llm", result="miss")
+        else:
+            llm_cache_stats["coalesced"] += 1
+            telemetry.CACHE_REQUESTS.inc(cache="llm", result="coalesced")
+
+    if not leader:
+        return parse(fut.result())      # 호출자마다 따로 파싱 (결과 객체를 공유하지 않게)
+
+    try:
+        with telemetry.span("llm.call", model=model):
+            content = _call_llm(model, messages, temperature)
+        value = parse(content)
+    except Exception as e:
+        llm_cache_stats["errors"] += 1
+        fut.set_exception(e)
+        raise
+    else:
+        if cache is not None:
+            try:
+                cache.set(key, content)
+            except Exception as e:
+                print(f"[WARN] LLM 캐시 저장 실패: {e}")
+        fut.set_result(content)
+        return value
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
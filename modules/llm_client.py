@@ -0,0 +1,222 @@
+# modules/llm_client.py
+
+"""
+비동기 LLM 클라이언트
+=====================
+
+OpenAI 호환 `/chat/completions` 엔드포인트를 공유 커넥션 풀(httpx.AsyncClient)로 호출한다.
+
+* 엔드포인트   : `OPENAI_BASE_URL` (기본 https://api.openai.com/v1), `OPENAI_API_KEY`
+  → 로컬 스텁 서버(`scripts/llm_stub_server.py`)로 바꿔 끼워 테스트 가능
+* 데드라인     : 호출 1회(재시도 포함) 전체 제한 `ROOMIE_LLM_DEADLINE` 초 (기본 20)
+* 재시도       : 연결 오류 / 타임아웃 / 429 / 5xx 만 `ROOMIE_LLM_RETRIES` 회 (기본 2),
+  지수 백오프 + full jitter (`ROOMIE_LLM_BACKOFF` 초 기준)
+* 회로 차단기  : 연속 실패 `ROOMIE_LLM_CB_FAILURES` 회 (기본 5) 면 `ROOMIE_LLM_CB_COOLDOWN` 초 (기본 30)
+  동안 호출하지 않고 바로 `CircuitOpenError` → 호출부가 즉시 룰 기반 대체로 넘어감.
+  쿨다운이 지나면 한 번만 시험 호출(half-open)해서 성공하면 다시 닫힘.
+
+동기 코드(워커 스레드)에서는 `chat_sync()` 를 쓴다. 전용 이벤트 루프 스레드 하나에서
+모든 요청이 같은 커넥션 풀을 공유한다.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from modules import telemetry
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+LLM_DEADLINE = float(os.getenv("ROOMIE_LLM_DEADLINE", "20"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("ROOMIE_LLM_CONNECT_TIMEOUT", "5"))
+LLM_RETRIES = int(os.getenv("ROOMIE_LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("ROOMIE_LLM_BACKOFF", "0.5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("ROOMIE_LLM_MAX_CONNECTIONS", "16"))
+CB_FAILURES = int(os.getenv("ROOMIE_LLM_CB_FAILURES", "5"))
+CB_COOLDOWN = float(os.getenv("ROOMIE_LLM_CB_COOLDOWN", "30"))
+
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """LLM 호출 실패 (재시도 소진 / 데드라인 초과 / 재시도 불가 응답)"""
+
+
+class LLMRequestError(LLMError):
+    """재시도해도 소용없는 4xx 응답 (요청 문제 — 상류 장애로 세지 않음)"""
+
+
+class CircuitOpenError(LLMError):
+    """회로 차단기가 열려 있어 호출하지 않음"""
+
+
+class CircuitBreaker:
+    """연속 실패 횟수 기반 회로 차단기 (closed → open → half-open → closed)"""
+
+    def __init__(self, failures: int = CB_FAILURES, cooldown: float = CB_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True        # 시험 호출은 하나만
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.failures >= self.max_failures or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, api_key: Optional[str] = None,
+                 deadline: float = LLM_DEADLINE, retries: int = LLM_RETRIES,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+        self.deadline = deadline
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.deadline, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                    max_keepalive_connections=LLM_MAX_CONNECTIONS),
+            )
+        return self._client
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], temperature: float,
+                   deadline: Optional[float] = None) -> str:
+        """chat/completions 호출 → 첫 번째 choice 의 content"""
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise CircuitOpenError(f"LLM 회로 차단 중 ({self.base_url})")
+
+        self.stats["calls"] += 1
+        body = {"model": model, "messages": messages, "temperature": temperature}
+        try:
+            content = await asyncio.wait_for(self._post_with_retries(body), deadline or self.deadline)
+        except LLMRequestError:
+            self.breaker.record(True)
+            self.stats["failures"] += 1
+            raise
+        except asyncio.TimeoutError:
+            self.breaker.record(False)
+            self.stats["failures"] += 1
+            raise LLMError(f"LLM 데드라인 초과 ({deadline or self.deadline}s)")
+        except Exception:
+            self.breaker.record(False)
+            self.stats["failures"] += 1
+            raise
+        self.breaker.record(True)
+        return content
+
+    async def _post_with_retries(self, body: Dict[str, Any]) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                rsp = await self._http().post("/chat/completions", json=body)
+                if rsp.status_code not in _RETRY_STATUS:
+                    if rsp.status_code >= 400:
+                        raise LLMRequestError(f"LLM HTTP {rsp.status_code}: {rsp.text[:200]}")
+                    return rsp.json()["choices"][0]["message"]["content"]
+                error: Exception = LLMError(f"LLM HTTP {rsp.status_code}")
+            except httpx.TransportError as e:   # 연결 실패 / 읽기 타임아웃 등
+                error = e
+
+            if attempt == self.retries:
+                raise LLMError(f"LLM 재시도 소진: {error}") from error
+            self.stats["retries"] += 1
+            # 지수 백오프 + full jitter (동시에 실패한 요청들이 한꺼번에 재시도하지 않게)
+            await asyncio.sleep(random.uniform(0, LLM_BACKOFF * (2 ** attempt)))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# ────────────────────────────── 동기 호출용 ──────────────────────────────
+
+_client: Optional[LLMClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_client() -> LLMClient:
+    global _client
+    with _lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """모든 동기 호출이 공유하는 이벤트 루프 스레드 (커넥션 풀을 한 루프에 묶어 둠)"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client", daemon=True).start()
+        return _loop
+
+
+def chat_sync(model: str, messages: List[Dict[str, str]], temperature: float,
+              deadline: Optional[float] = None) -> str:
+    """워커 스레드에서 호출 — 공유 루프에서 `chat()` 을 실행하고 결과를 기다림"""
+    coro = get_client().chat(model, messages, temperature, deadline)
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def llm_client_stats() -> Dict[str, Any]:
+    client = get_client()
+    return {**client.stats, "circuit": client.breaker.state, "consecutive_failures": client.breaker.failures}
+
+
+_CIRCUIT_STATES = ("closed", "open", "half_open")
+LLM_CLIENT_EVENTS = telemetry.gauge("roomie_llm_client_events", "LLM client calls / retries / failures / short-circuits since start")
+LLM_CIRCUIT_STATE = telemetry.gauge("roomie_llm_circuit_state", "LLM circuit breaker state (1 = current)")
+LLM_CONSECUTIVE_FAILURES = telemetry.gauge("roomie_llm_consecutive_failures", "LLM consecutive failures counted by the breaker")
+
+
+def record_llm_client():
+    """`/metrics` 렌더 직전에 클라이언트 통계를 게이지로 옮김"""
+    stats = llm_client_stats()
+    for event in ("calls", "retries", "failures", "short_circuited"):
+        LLM_CLIENT_EVENTS.set(stats[event], event=event)
+    for state in _CIRCUIT_STATES:
+        LLM_CIRCUIT_STATE.set(1 if stats["circuit"] == state else 0, state=state)
+    LLM_CONSECUTIVE_FAILURES.set(stats["consecutive_failures"])
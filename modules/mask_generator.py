@@ -4,20 +4,23 @@ from pathlib import Path
 import numpy as np
 from PIL import Image
 
+from modules.artifacts import load_image
+
 ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
 ASSET_DIR.mkdir(exist_ok=True)
 
-def generate_mask(rotated_img_path: Path, bbox: list[int], object_id: str) -> Path:
+def generate_mask(rotated_img_path, bbox: list[int], object_id: str, persist: bool = True):
     """
     bbox(x, y, w, h)를 기반으로 회전된 가구 이미지용 마스크 생성
     - 255 영역: 가구 삽입 위치
     - 0 영역: 배경 유지
+    - rotated_img_path 는 경로 또는 PIL 이미지 (PIL 이면 크기만 읽음)
+    - persist=False 면 파일로 저장하지 않고 PIL(L) 마스크 반환
     """
     mask_path = ASSET_DIR / f"mask_{object_id}.jpg"
 
     # 원본 이미지 크기 가져오기
-    original_img = Image.open(rotated_img_path)
-    width, height = original_img.size
+    width, height = load_image(rotated_img_path).size
 
     # 빈 마스크 생성 (0으로 채움)
     mask = np.zeros((height, width), dtype=np.uint8)
@@ -31,7 +34,51 @@ def generate_mask(rotated_img_path: Path, bbox: list[int], object_id: str) -> Pa
     # 해당 영역을 255로 설정
     mask[y1:y2, x1:x2] = 255
 
+    if not persist:
+        return Image.fromarray(mask)
+
     # 저장
     Image.fromarray(mask).save(mask_path)
     print(f"[+] 마스크 생성 완료: {mask_path}")
     return mask_path
+
+
+def _overlaps(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """bbox a(4,) 와 bbox 배열 b(K,4) 가 겹치는지 (경계만 닿으면 겹치지 않음)"""
+    w = np.minimum(a[2], b[:, 2]) - np.maximum(a[0], b[:, 0])
+    h = np.minimum(a[3], b[:, 3]) - np.maximum(a[1], b[:, 1])
+    return (w > 0) & (h > 0)
+
+
+def group_non_overlapping(bboxes: list[list[int]]) -> list[list[int]]:
+    """최종 bbox([x1, y1, x2, y2], 배경 픽셀) 들을 서로 겹치지 않는 그룹(레이어)으로 묶어 인덱스 목록 반환
+
+    앞에서부터 순서대로, 기존 그룹의 어떤 bbox 와도 겹치지 않는 첫 그룹에 넣는다.
+    겹치는 객체만 다음 그룹으로 밀려나므로 그룹 수 = 순차 인페인팅 횟수.
+    (FOPA 로 옮긴 뒤의 bbox 를 넘겨야 실제 합성 위치끼리 비교한다)
+    """
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    groups: list[list[int]] = []
+    for i, box in enumerate(boxes):
+        for group in groups:
+            if not _overlaps(box, boxes[group]).any():
+                group.append(i)
+                break
+        else:
+            groups.append([i])
+    return groups
+
+
+def merge_masks(bboxes: list[list[int]], size: tuple[int, int], object_id: str, persist: bool = True):
+    """bbox([x1, y1, x2, y2], 배경 픽셀) 들의 합집합 마스크를 배경 크기(size=(W, H))로 (persist=False 면 PIL 반환)"""
+    merged = np.zeros((size[1], size[0]), dtype=bool)
+    for x1, y1, x2, y2 in bboxes:
+        merged[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = True
+
+    if not persist:
+        return Image.fromarray(merged.astype(np.uint8) * 255)
+
+    mask_path = ASSET_DIR / f"mask_{object_id}.jpg"
+    Image.fromarray(merged.astype(np.uint8) * 255).save(mask_path)
+    print(f"[+] 병합 마스크 생성 완료: {mask_path} ({len(bboxes)}개)")
+    return mask_path
@@ -0,0 +1,294 @@
+# modules/memory_manager.py
+
+"""
+디바이스 메모리 예산 관리자
+==========================
+
+상주 모델(SD+LoRA, SD Inpaint, CarveKit, FOPA …)이 한 GPU 에 다 들어가지 않을 때,
+모델별 점유량(footprint)을 기억해 두고 예산을 넘지 않도록 오래 안 쓴 모델부터 내린다.
+
+* 예산     : `ROOMIE_GPU_BUDGET_MB` (없으면 GPU 전체 × `ROOMIE_GPU_BUDGET_FRACTION`, CPU 만 있으면 제한 없음)
+  Zero123 처럼 같은 GPU 를 쓰는 별도 프로세스 몫은 `ROOMIE_GPU_RESERVE_MB` 로 빼 둠
+* 내리는 방식 : `ROOMIE_OFFLOAD` = cpu (기본, CPU 로 옮겨 두었다가 다시 쓸 때 올림) | unload (레지스트리에서 제거)
+  `.to()` 가 없는 모델(CarveKit 등)은 항상 unload. CPU 쪽도 `ROOMIE_CPU_BUDGET_MB` 를 넘으면 unload
+* 점유량   : `ROOMIE_MODEL_FOOTPRINT_MB="sd_lora=2600,fopa=300"` > 실제 파라미터/버퍼 크기 > 기본 추정치
+* 사용 중(pin) 인 모델은 내리지 않음. 자리가 안 나면 `ROOMIE_MEMORY_WAIT` 초까지 기다렸다가 예산 초과로 진행
+* 시뮬레이션 : `ROOMIE_MEMORY_SIMULATE=1` 이면 실제로 옮기지 않고 장부만 관리 → CPU 에서 정책 시험
+
+model_registry 가 로딩 / get_model / unload 때 이 관리자를 부른다.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from modules import telemetry
+
+MB = 1024 * 1024
+
+# fp16 기준 대략적인 점유량 (로딩 전 자리 확보용, 로딩 후에는 실측값으로 바뀜)
+DEFAULT_FOOTPRINT_MB = {
+    "sd_lora": 2600,
+    "sd_inpaint": 2600,
+    "carvekit": 900,
+    "fopa": 300,
+    "controlcom": 5200,
+}
+
+DEVICE_BYTES = telemetry.gauge("roomie_model_device_bytes", "Bytes of model weights resident on the device")
+MODEL_MOVES = telemetry.counter("roomie_model_moves_total", "Model offloads, onloads and unloads by the memory manager")
+
+
+def _env_mb(name: str) -> Optional[int]:
+    value = os.getenv(name, "").strip()
+    return int(float(value) * MB) if value else None
+
+
+def _footprint_overrides() -> Dict[str, int]:
+    out = {}
+    for item in os.getenv("ROOMIE_MODEL_FOOTPRINT_MB", "").split(","):
+        if "=" in item:
+            name, mb = item.split("=", 1)
+            out[name.strip()] = int(float(mb) * MB)
+    return out
+
+
+def measure_footprint(model: Any) -> int:
+    """torch 모듈(또는 diffusers 파이프라인 / 모듈을 속성으로 가진 객체)의 파라미터+버퍼 바이트 수"""
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return 0
+    if isinstance(model, torch.nn.Module):
+        modules = [model]
+    else:
+        components = getattr(model, "components", None)
+        values = components.values() if isinstance(components, dict) else vars(model).values() \
+            if hasattr(model, "__dict__") else []
+        modules = [v for v in values if isinstance(v, torch.nn.Module)]
+
+    seen, total = set(), 0
+    for module in modules:
+        for tensor in (*module.parameters(), *module.buffers()):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    __slots__ = ("model", "footprint", "where", "pins")
+
+    def __init__(self, model: Any, footprint: int):
+        self.model = model
+        self.footprint = footprint
+        self.where = "device"
+        self.pins = 0
+
+
+class MemoryManager:
+    """디바이스 예산 안에서 모델 상주 위치를 LRU 로 관리"""
+
+    def __init__(self, budget_bytes: Optional[int] = None, cpu_budget_bytes: Optional[int] = None,
+                 offload: str = "cpu", device: Optional[str] = None, simulate: bool = False,
+                 wait_sec: float = 30.0, footprints: Optional[Dict[str, int]] = None,
+                 on_unload: Optional[Callable[[str], None]] = None, auto_budget: bool = False):
+        if offload not in ("cpu", "unload"):
+            raise ValueError(f"offload 는 cpu | unload: {offload}")
+        self.budget_bytes = budget_bytes
+        self.cpu_budget_bytes = cpu_budget_bytes
+        self.offload = offload
+        self.device = device
+        self.simulate = simulate
+        self.wait_sec = wait_sec
+        self.footprints = dict(footprints or {})
+        self.on_unload = on_unload
+        self._auto_budget = auto_budget and budget_bytes is None
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()   # 오래 안 쓴 순서
+        self._cond = threading.Condition()
+        self.counters = {"offloads": 0, "onloads": 0, "unloads": 0, "over_budget": 0, "waits": 0}
+
+    @classmethod
+    def from_env(cls, on_unload: Optional[Callable[[str], None]] = None) -> "MemoryManager":
+        simulate = os.getenv("ROOMIE_MEMORY_SIMULATE", "0") == "1"
+        return cls(
+            budget_bytes=_env_mb("ROOMIE_GPU_BUDGET_MB"),
+            cpu_budget_bytes=_env_mb("ROOMIE_CPU_BUDGET_MB"),
+            offload=os.getenv("ROOMIE_OFFLOAD", "cpu"),
+            device="cpu" if simulate else None,
+            simulate=simulate,
+            wait_sec=float(os.getenv("ROOMIE_MEMORY_WAIT", "30")),
+            footprints=_footprint_overrides(),
+            on_unload=on_unload,
+            auto_budget=not simulate,
+        )
+
+    # ── 예산 / 점유량 ─────────────────────────────────────
+    def _resolve_budget(self):
+        """예산을 지정하지 않았으면 첫 사용 때 GPU 용량에서 계산 (import 시점에 torch 를 건드리지 않게)"""
+        if not self._auto_budget:
+            return
+        self._auto_budget = False
+        torch = sys.modules.get("torch")
+        if torch is None or not torch.cuda.is_available():
+            return
+        total = torch.cuda.get_device_properties(0).total_memory
+        fraction = float(os.getenv("ROOMIE_GPU_BUDGET_FRACTION", "0.9"))
+        self.budget_bytes = int(total * fraction) - (_env_mb("ROOMIE_GPU_RESERVE_MB") or 0)
+        self.device = self.device or "cuda"
+        print(f"[*] GPU 메모리 예산: {self.budget_bytes / MB:.0f}MB")
+
+    def estimate(self, name: str, model: Any = None) -> int:
+        if name in self.footprints:
+            return self.footprints[name]
+        measured = measure_footprint(model) if model is not None else 0
+        return measured or DEFAULT_FOOTPRINT_MB.get(name, 0) * MB
+
+    def device_bytes(self) -> int:
+        return sum(e.footprint for e in self._entries.values() if e.where == "device")
+
+    def cpu_bytes(self) -> int:
+        return sum(e.footprint for e in self._entries.values() if e.where == "cpu")
+
+    # ── 이동 ─────────────────────────────────────────────
+    def _target_device(self) -> str:
+        if self.device:
+            return self.device
+        torch = sys.modules.get("torch")
+        return "cuda" if torch is not None and torch.cuda.is_available() else "cpu"
+
+    def _move(self, entry: _Entry, where: str):
+        if not self.simulate:
+            entry.model.to(self._target_device() if where == "device" else "cpu")
+            if where == "cpu":
+                torch = sys.modules.get("torch")
+                if torch is not None and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+        entry.where = where
+
+    def _evict(self, name: str, entry: _Entry):
+        movable = self.simulate or hasattr(entry.model, "to")
+        if self.offload == "cpu" and movable:
+            self._move(entry, "cpu")
+            self.counters["offloads"] += 1
+            MODEL_MOVES.inc(model=name, action="offload")
+            print(f"[*] 모델 CPU 로 내림: {name} ({entry.footprint / MB:.0f}MB)")
+            self._trim_cpu()
+        else:
+            self._drop(name)
+
+    def _drop(self, name: str):
+        entry = self._entries.pop(name)
+        entry.model = None
+        self.counters["unloads"] += 1
+        MODEL_MOVES.inc(model=name, action="unload")
+        print(f"[*] 모델 내림(unload): {name}")
+        if self.on_unload is not None:
+            self.on_unload(name)
+
+    def _trim_cpu(self):
+        if self.cpu_budget_bytes is None:
+            return
+        for name, entry in list(self._entries.items()):
+            if self.cpu_bytes() <= self.cpu_budget_bytes:
+                break
+            if entry.where == "cpu" and entry.pins == 0:
+                self._drop(name)
+
+    def _make_room(self, need: int, keep: str, wait: bool) -> bool:
+        """`need` 바이트가 들어갈 때까지 LRU 순으로 내림. wait=False 면 자리가 안 나도 기다리지 않음"""
+        self._resolve_budget()
+        if self.budget_bytes is None:
+            return True
+        deadline = time.monotonic() + self.wait_sec
+        while self.device_bytes() + need > self.budget_bytes:
+            victim = next(((n, e) for n, e in self._entries.items()
+                           if n != keep and e.where == "device" and e.pins == 0), None)
+            if victim is not None:
+                self._evict(*victim)
+                continue
+            # 남은 모델이 모두 사용 중 → 풀릴 때까지 대기
+            remaining = deadline - time.monotonic()
+            if not wait or remaining <= 0:
+                if wait:
+                    self.counters["over_budget"] += 1
+                    print(f"[!] 메모리 예산 초과로 진행: {keep} "
+                          f"({(self.device_bytes() + need) / MB:.0f}/{self.budget_bytes / MB:.0f}MB)")
+                return False
+            self.counters["waits"] += 1
+            self._cond.wait(remaining)
+        return True
+
+    def _gauge(self):
+        DEVICE_BYTES.set(self.device_bytes())
+
+    # ── 레지스트리 쪽 API ────────────────────────────────
+    def reserve(self, name: str, wait: bool = True) -> bool:
+        """로딩 전 예상 점유량만큼 자리 확보 (로더가 모델을 바로 디바이스에 올리므로)"""
+        with self._cond:
+            ok = self._make_room(self.estimate(name), keep=name, wait=wait)
+            self._gauge()
+            return ok
+
+    def admit(self, name: str, model: Any, pin: bool = False):
+        """새로 로딩된 모델 등록 (디바이스에 올라와 있다고 봄)"""
+        with self._cond:
+            entry = self._entries[name] = _Entry(model, self.estimate(name, model))
+            self._entries.move_to_end(name)
+            entry.pins += int(pin)
+            self._make_room(0, keep=name, wait=False)     # 추정치보다 컸으면 다른 모델을 더 내림
+            self._gauge()
+
+    def acquire(self, name: str, model: Any, pin: bool = False, wait: bool = True) -> bool:
+        """사용 직전 호출 — CPU 로 내려가 있으면 자리를 만들고 다시 올림. 관리 대상이 아니면 False"""
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is None or entry.model is not model:
+                return False
+            self._entries.move_to_end(name)
+            entry.pins += int(pin)
+            if entry.where == "cpu":
+                if not self._make_room(entry.footprint, keep=name, wait=wait) and not wait:
+                    return True         # prefetch: 자리가 없으면 CPU 에 둔 채로
+                self._move(entry, "device")
+                self.counters["onloads"] += 1
+                MODEL_MOVES.inc(model=name, action="onload")
+                print(f"[*] 모델 다시 올림: {name}")
+            self._gauge()
+            return True
+
+    def unpin(self, name: str):
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is not None and entry.pins > 0:
+                entry.pins -= 1
+            self._cond.notify_all()
+
+    def release(self, name: str):
+        """레지스트리에서 내린 모델을 장부에서도 제거"""
+        with self._cond:
+            self._entries.pop(name, None)
+            self._gauge()
+            self._cond.notify_all()
+
+    def on_device(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.where == "device"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self.counters,
+                "budget_mb": None if self.budget_bytes is None else round(self.budget_bytes / MB, 1),
+                "device_mb": round(self.device_bytes() / MB, 1),
+                "cpu_mb": round(self.cpu_bytes() / MB, 1),
+                "offload": self.offload,
+                "simulate": self.simulate,
+                "models": [
+                    {"name": n, "where": e.where, "mb": round(e.footprint / MB, 1), "pins": e.pins}
+                    for n, e in self._entries.items()
+                ],
+            }
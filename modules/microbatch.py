@@ -0,0 +1,181 @@
+# modules/microbatch.py
+
+"""
+요청 간 동적 마이크로 배칭
+==========================
+
+공유 디퓨전 파이프라인 앞단에서, 짧은 시간 창(window) 안에 들어온 호환 요청
+(같은 모델 · 해상도 · 스텝 수 = 같은 key)을 모아 한 번의 배치 호출로 실행하고
+결과를 각 호출자에게 돌려준다.
+
+* `ROOMIE_BATCH_WINDOW_MS` : 첫 요청 이후 추가 요청을 기다리는 시간 (기본 20ms)
+* `ROOMIE_BATCH_MAX`       : 최대 배치 크기 (기본 4)
+* `batcher_stats()`        : 대기 시간 / 배치 채움률 등 지표
+
+작업 큐와의 관계
+----------------
+요청 간 배칭은 파이프라인이 동시에 여러 개 돌아야 생긴다. 작업 큐(`modules.jobs`)는
+기본으로 `ROOMIE_JOB_WORKERS = BATCH_MAX` 개를 동시에 실행하고 (GPU 호출은 배처의
+디스패처 스레드가 어차피 하나씩 실행), 실행 중인 요청 수를 `request_scope()` 로 알려 준다.
+`producers=active_requests` 로 만든 배처는 대기 중인 요청이 실행 중인 요청 수만큼 모이면
+창을 기다리지 않고 바로 실행하므로, 요청이 하나뿐일 때는 창 대기 비용이 없다.
+(요청 하나 안에서 여러 건을 동시에 넣는 LoRA 배처는 창을 그대로 쓴다)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from modules import telemetry
+
+BATCH_WINDOW_MS = float(os.getenv("ROOMIE_BATCH_WINDOW_MS", "20"))
+BATCH_MAX = int(os.getenv("ROOMIE_BATCH_MAX", "4"))
+
+_BATCHERS: Dict[str, "MicroBatcher"] = {}
+
+_active_requests = 0
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def request_scope():
+    """요청(파이프라인 실행) 하나가 진행 중인 동안 생산자 수에 포함"""
+    global _active_requests
+    with _active_lock:
+        _active_requests += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active_requests -= 1
+
+
+def active_requests() -> int:
+    return _active_requests
+
+
+class MicroBatcher:
+    """key 별로 요청을 모아 `run_batch(key, items) -> results` 로 한 번에 실행
+
+    배치 실행은 전용 디스패처 스레드 하나에서 순서대로 이뤄지므로
+    (GPU 파이프라인은 스레드 안전하지 않음) 같은 모델을 동시에 두 번 돌리지 않는다.
+
+    producers 를 주면 (요청마다 한 번에 한 건씩만 넣는 배처) 대기 요청이 그 수에 이르는 즉시 실행.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[Hashable, List[Any]], Sequence[Any]],
+                 window_ms: Optional[float] = None, max_batch: Optional[int] = None,
+                 producers: Optional[Callable[[], int]] = None):
+        self.name = name
+        self.run_batch = run_batch
+        self.window = (BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch = max_batch or BATCH_MAX
+        self.producers = producers
+
+        self._pending: Dict[Hashable, List[tuple]] = {}   # key → [(item, future, enqueued_at)]
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        # 지표
+        self.requests = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        _BATCHERS[name] = self
+
+    # ── 호출부 API ───────────────────────────────────────
+    def submit_async(self, key: Hashable, item: Any) -> Future:
+        return self.submit_many_async([(key, item)])[0]
+
+    def submit_many_async(self, requests: Sequence[tuple]) -> List[Future]:
+        """(key, item) 여러 건을 한 번에 넣음 — 디스패처가 중간에 일부만 집어 가지 않음"""
+        futs: List[Future] = []
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"batch-{self.name}", daemon=True)
+                self._thread.start()
+            now = time.perf_counter()
+            for key, item in requests:
+                fut: Future = Future()
+                self._pending.setdefault(key, []).append((item, fut, now))
+                futs.append(fut)
+            self.requests += len(futs)
+            self._cond.notify()
+        return futs
+
+    def submit(self, key: Hashable, item: Any) -> Any:
+        """요청 하나를 넣고 배치 실행이 끝날 때까지 대기"""
+        return self.submit_async(key, item).result()
+
+    # ── 디스패처 ─────────────────────────────────────────
+    def _next_batch(self):
+        """실행할 (key, 요청들) 을 고르거나, 기다려야 할 시간을 반환"""
+        now = time.perf_counter()
+        wait = None
+        quorum = max(1, self.producers()) if self.producers is not None else self.max_batch
+        for key, reqs in self._pending.items():
+            deadline = reqs[0][2] + self.window
+            if len(reqs) >= min(self.max_batch, quorum) or now >= deadline:
+                batch, rest = reqs[:self.max_batch], reqs[self.max_batch:]
+                if rest:
+                    self._pending[key] = rest
+                else:
+                    del self._pending[key]
+                return (key, batch), None
+            wait = deadline - now if wait is None else min(wait, deadline - now)
+        return None, wait
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                job, wait = self._next_batch()
+                while job is None:
+                    self._cond.wait(timeout=wait)
+                    job, wait = self._next_batch()
+
+            key, batch = job
+            started = time.perf_counter()
+            waits = [started - t for _, _, t in batch]
+            self.batches += 1
+            self.batched_items += len(batch)
+            self.wait_total += sum(waits)
+            self.wait_max = max(self.wait_max, *waits)
+            for w in waits:
+                telemetry.QUEUE_SECONDS.observe(w, queue=f"batch:{self.name}")
+            telemetry.BATCH_SIZE.observe(len(batch), batcher=self.name)
+
+            try:
+                with telemetry.span(f"batch.{self.name}", size=len(batch)):
+                    results = self.run_batch(key, [item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"배치 결과 개수 불일치: {len(results)} != {len(batch)}")
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut, _), result in zip(batch, results):
+                fut.set_result(result)
+
+    # ── 지표 ─────────────────────────────────────────────
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = sum(len(v) for v in self._pending.values())
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "pending": pending,
+            "avg_batch_size": self.batched_items / self.batches if self.batches else 0.0,
+            "batch_fill_ratio": self.batched_items / (self.batches * self.max_batch) if self.batches else 0.0,
+            "avg_queue_wait_ms": self.wait_total / self.batched_items * 1000.0 if self.batched_items else 0.0,
+            "max_queue_wait_ms": self.wait_max * 1000.0,
+        }
+
+
+def batcher_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: b.stats() for name, b in _BATCHERS.items()}
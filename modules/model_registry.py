@@ -0,0 +1,265 @@
+# modules/model_registry.py
+
+"""
+프로세스 상주 모델 레지스트리
+============================
+
+무거운 파이프라인(SD+LoRA, SD Inpaint, CarveKit 등)을 프로세스당 한 번만 로딩하고
+메모리에 상주시킨 뒤, 호출부에는 바로 쓸 수 있는 핸들만 넘겨준다.
+
+* `get_model(name)`   : 로딩돼 있으면 그대로, 아니면 최초 1회 로딩 후 반환
+* `use(name)`         : get_model + 사용하는 동안 메모리 관리자가 내리지 못하게 고정(pin)
+* `prefetch(*names)`  : 다음 단계 모델을 백그라운드에서 미리 로딩 / GPU 로 올림
+* `preload(names)`    : 서버 시작 시점에 미리 로딩 (환경 변수 `ROOMIE_PRELOAD_MODELS`)
+* `warmup(mode)`      : 워밍업 단계 — `ROOMIE_WARMUP` = eager | background | lazy
+    - eager      : 서버 시작 시 동기 로딩 (끝나야 트래픽 수신)
+    - background : 서버는 바로 뜨고, 별도 스레드에서 로딩 (로딩 중인 모델을 쓰는 요청은 락에서 대기)
+    - lazy       : 아무것도 미리 하지 않음, 첫 사용 시 로딩 (기본)
+  로딩할 모델은 `ROOMIE_PRELOAD_MODELS`, 비어 있으면 등록된 전체
+* `warmup_status()`   : /readyz 용 — 워밍업 상태, 로딩 완료 / 로딩 중 모델
+* `register(name)`    : 새 로더 등록용 데코레이터
+
+GPU 예산 / CPU offload / LRU 는 `modules.memory_manager` 가 담당한다.
+
+torch / diffusers / carvekit 은 로더 안에서만 import 하므로
+이 모듈 자체는 가볍게 import 된다.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from modules import telemetry
+from modules.memory_manager import MemoryManager
+
+SD_BASE_MODEL = "stabilityai/stable-diffusion-2-1"
+SD_LORA_MODEL = "triggah61/lora-home-furniture"
+SD_INPAINT_MODEL = "stabilityai/stable-diffusion-2-inpainting"
+CARVEKIT_OBJECT_TYPE = "object"    # or "hairs-like" / "human"
+
+_LOADERS: Dict[str, Callable[[], Any]] = {}
+_MODELS: Dict[str, Any] = {}
+_LOAD_LOCKS: Dict[str, threading.Lock] = {}
+_LOADING: Dict[str, float] = {}     # 로딩 중인 모델 → 시작 시각
+_REGISTRY_LOCK = threading.Lock()
+
+# 메모리 관리자가 모델을 내릴 때는 레지스트리에서도 뺌 (로딩 락은 잡지 않음 — 다른 모델 로딩 중에 불림)
+memory = MemoryManager.from_env(on_unload=lambda name: _MODELS.pop(name, None))
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-prefetch")
+
+WARMUP_MODES = ("eager", "background", "lazy")
+# 예전 설정 호환: ROOMIE_PRELOAD_MODELS 만 지정돼 있으면 eager
+WARMUP_MODE = os.getenv("ROOMIE_WARMUP", "eager" if os.getenv("ROOMIE_PRELOAD_MODELS") else "lazy").strip().lower()
+_warmup: Dict[str, Any] = {"mode": WARMUP_MODE, "state": "pending", "models": [], "error": None,
+                           "started_at": None, "finished_at": None}
+
+
+def register(name: str):
+    """`name` 으로 로더 함수를 등록하는 데코레이터"""
+    def deco(fn: Callable[[], Any]) -> Callable[[], Any]:
+        with _REGISTRY_LOCK:
+            _LOADERS[name] = fn
+            _LOAD_LOCKS.setdefault(name, threading.Lock())
+        return fn
+    return deco
+
+
+def _get(name: str, pin: bool = False, wait: bool = True) -> Optional[Any]:
+    model = _MODELS.get(name)
+    if model is not None and memory.acquire(name, model, pin=pin, wait=wait):
+        return model
+
+    if name not in _LOADERS:
+        raise KeyError(f"등록되지 않은 모델: {name}")
+
+    # 같은 모델을 여러 스레드가 동시에 로딩하지 않도록 모델별 락 사용
+    with _LOAD_LOCKS[name]:
+        model = _MODELS.get(name)
+        if model is not None:
+            if not memory.acquire(name, model, pin=pin, wait=wait):
+                memory.admit(name, model, pin=pin)
+            return model
+        # 로더가 바로 디바이스에 올리므로 로딩 전에 자리부터 확보
+        if not memory.reserve(name, wait=wait) and not wait:
+            return None
+        print(f"[*] 모델 로딩 중: {name}")
+        t0 = time.perf_counter()
+        _LOADING[name] = time.time()
+        try:
+            with telemetry.span("model_load", model=name):
+                model = _LOADERS[name]()
+        finally:
+            _LOADING.pop(name, None)
+        _MODELS[name] = model
+        memory.admit(name, model, pin=pin)
+        elapsed = time.perf_counter() - t0
+        telemetry.MODEL_LOAD_SECONDS.observe(elapsed, model=name)
+        print(f"[+] 모델 로딩 완료: {name} ({elapsed:.1f}s)")
+    return model
+
+
+def get_model(name: str) -> Any:
+    """등록된 모델 핸들을 반환 (최초 호출 시에만 로딩, CPU 로 내려가 있으면 다시 올림)"""
+    return _get(name)
+
+
+@contextmanager
+def use(name: str) -> Iterator[Any]:
+    """블록 안에서는 메모리 관리자가 이 모델을 내리지 않음"""
+    model = _get(name, pin=True)
+    try:
+        yield model
+    finally:
+        memory.unpin(name)
+
+
+def prefetch(*names: str) -> None:
+    """다음 단계 모델을 백그라운드에서 로딩 / 디바이스로 올림
+
+    사용 중인 모델을 기다리면서까지 자리를 만들지는 않음 (자리가 없으면 건너뜀)
+    """
+    for name in names:
+        if name not in _LOADERS or memory.on_device(name) or name in _LOADING:
+            continue
+        _prefetcher.submit(_prefetch_one, name)
+
+
+def _prefetch_one(name: str):
+    try:
+        if _get(name, wait=False) is not None and memory.on_device(name):
+            print(f"[DEBUG] 모델 미리 올림: {name}")
+    except Exception as e:
+        print(f"[!] 모델 prefetch 실패 ({name}): {e}")
+
+
+def preload(names: Optional[Iterable[str]] = None) -> List[str]:
+    """모델들을 미리 로딩. names 가 없으면 `ROOMIE_PRELOAD_MODELS` (쉼표 구분) 사용"""
+    if names is None:
+        env = os.getenv("ROOMIE_PRELOAD_MODELS", "")
+        names = [n.strip() for n in env.split(",") if n.strip()]
+        if env.strip().lower() == "all":
+            names = list(_LOADERS)
+    names = list(names)
+    for name in names:
+        get_model(name)
+    return names
+
+
+def warmup(mode: Optional[str] = None, names: Optional[Iterable[str]] = None,
+           prepare: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """워밍업 실행. prepare 는 로딩 전에 부를 함수 (예: 로더를 등록하는 모듈 import)"""
+    mode = (mode or WARMUP_MODE).lower()
+    if mode not in WARMUP_MODES:
+        raise ValueError(f"ROOMIE_WARMUP 은 {'|'.join(WARMUP_MODES)} 중 하나: {mode}")
+    _warmup["mode"] = mode
+    if mode == "lazy":
+        _warmup["state"] = "skipped"
+        return warmup_status()
+
+    def run():
+        _warmup.update(state="running", started_at=time.time(), error=None)
+        try:
+            if prepare is not None:
+                prepare()
+            targets = names
+            if targets is None and not os.getenv("ROOMIE_PRELOAD_MODELS", "").strip():
+                targets = registered_models()
+            _warmup["models"] = preload(targets)
+            _warmup["state"] = "done"
+            print(f"[+] 워밍업 완료 ({mode}): {', '.join(_warmup['models']) or '-'}")
+        except Exception as e:
+            _warmup.update(state="failed", error=f"{type(e).__name__}: {e}")
+            print(f"[!] 워밍업 실패 ({mode}): {e}")
+            if mode == "eager":
+                raise
+        finally:
+            _warmup["finished_at"] = time.time()
+
+    if mode == "eager":
+        run()
+    else:
+        _warmup["state"] = "running"
+        threading.Thread(target=run, name="model-warmup", daemon=True).start()
+    return warmup_status()
+
+
+def warmup_status() -> Dict[str, Any]:
+    """워밍업 상태 + 로딩 완료 / 로딩 중 / 등록된 모델"""
+    now = time.time()
+    return {
+        **_warmup,
+        "loaded": loaded_models(),
+        "loading": {name: round(now - t0, 1) for name, t0 in list(_LOADING.items())},
+        "registered": registered_models(),
+    }
+
+
+def is_loaded(name: str) -> bool:
+    return name in _MODELS
+
+
+def loaded_models() -> List[str]:
+    return list(_MODELS)
+
+
+def registered_models() -> List[str]:
+    return list(_LOADERS)
+
+
+def unload(name: str) -> None:
+    """상주 중인 모델을 내림 (다음 get_model 에서 다시 로딩)"""
+    with _LOAD_LOCKS.get(name, _REGISTRY_LOCK):
+        _MODELS.pop(name, None)
+        memory.release(name)
+
+
+# ────────────────────────────── 기본 로더들 ──────────────────────────────
+
+def _device_dtype():
+    import torch
+    if torch.cuda.is_available():
+        return "cuda", torch.float16
+    return "cpu", torch.float32
+
+
+@register("sd_lora")
+def _load_sd_lora():
+    """SD 2.1 + 가구 LoRA (텍스트 → 가구 이미지)"""
+    from diffusers import StableDiffusionPipeline
+
+    device, dtype = _device_dtype()
+    print(f"[DEBUG] Loading base model: {SD_BASE_MODEL}")
+    pipe = StableDiffusionPipeline.from_pretrained(SD_BASE_MODEL, torch_dtype=dtype).to(device)
+
+    print(f"[DEBUG] Loading LoRA: {SD_LORA_MODEL}")
+    pipe.load_lora_weights(SD_LORA_MODEL)
+    print("[DEBUG] LoRA 적용 완료")
+    return pipe
+
+
+@register("sd_inpaint")
+def _load_sd_inpaint():
+    """SD 2 Inpainting (배경 합성)"""
+    from diffusers import StableDiffusionInpaintPipeline
+
+    device, dtype = _device_dtype()
+    return StableDiffusionInpaintPipeline.from_pretrained(
+        SD_INPAINT_MODEL,
+        torch_dtype=dtype,
+        safety_checker=None,
+    ).to(device)
+
+
+@register("carvekit")
+def _load_carvekit():
+    """CarveKit 배경 제거기"""
+    from carvekit.api.high import HiInterface
+
+    device, _ = _device_dtype()
+    return HiInterface(
+        object_type=CARVEKIT_OBJECT_TYPE,
+        device=device,
+    )
@@ -6,27 +6,40 @@ from __future__ import annotations
 
 1. **LLM** 으로부터 초기 bbox / yaw / pitch 값을 (0~1 정규화 좌표계 기준) 받아옴
 2. bbox 값을 `1/GRID_N` 단위 그리드로 스냅(snap)하여 정렬
-3. ±`MAX_JITTER` 만큼 좌 · 우 / 상 · 하로 흔들어(jitter) 여러 후보를 만듦
-4. 이미 배치된 객체(bbox)와 충돌하는 후보를 제거
-5. **FOPA** 점수를 계산해 가장 자연스러운 후보를 선택
+3. 그리드 위 모든 위치 × 여러 크기(`SCALES`) 후보를 NumPy 배열로 한 번에 생성
+4. 후보마다 (이미 배치된 bbox 와의 겹침, 벽 정렬, LLM 위치와의 거리, FOPA 점수)를
+   벡터 연산으로 계산해 가중합
+5. 점수가 가장 높은 후보를 선택 (충돌 없는 후보가 항상 우선)
+
+`plan_layout` 은 방 하나의 모든 객체를 **LLM 1회 호출**로 함께 배치한다.
+객체 순서대로 위 탐색을 하되, 앞서 고른 객체들의 bbox 를 배치된 bbox 로 넘긴다.
+LLM 응답에 빠졌거나 잘못된 객체는 `_rule_fallback` 으로 대체한다.
 
 가정 및 의존성
 --------------
 * 배경 이미지가 정사각형이 아닐 수 있으므로, 실제 이미지 크기를 읽어 W/H 를 사용
-* `modules.fopa_runner` 안에 `score_bbox(bg_path, obj_dict, bbox_norm) -> float` 함수가 정의되어 있다고 가정
+* FOPA 점수는 `modules.fopa_runner.score_bboxes` 로 계산 (히트맵 1회 forward 후 후보별 조회)
+* FOPA 는 `obj["fg_image"]` / `obj["fg_path"]` (가구) 가 있어야 동작하며, 없으면 FOPA 항 없이 순위를 매김
 """
 
 from pathlib import Path
 from typing import List, Tuple, Dict, Optional
 import json, os, re
+import numpy as np
 from PIL import Image  # 배경 이미지 크기 읽기 위해 추가
 
-import openai  # OpenAI Python SDK 사용
+from modules.llm_cache import cached_chat  # OpenAI 호출 + 응답 캐시
 
 # ─────────────────────────── 환경 변수 및 하이퍼파라미터 ───────────────────────────
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # 사용할 LLM 모델명
 GRID_N = 20          # bbox 스냅용 그리드 분할 수 (1/20 단위)
-MAX_JITTER = 0.05    # 후보 좌표를 흔들 때 최대 5% 이동
+SCALES = (0.8, 0.9, 1.0, 1.1, 1.25)  # LLM bbox 크기 대비 탐색할 배율
+
+# 후보 순위 가중치 (점수 = FOPA + 벽 정렬 - 거리 - 충돌)
+W_FOPA = 1.0         # FOPA 히트맵 값 (0~1)
+W_DIST = 4.0         # LLM bbox 에서 벗어난 거리 (정규화 좌표, 0.25 이동 = FOPA 1.0)
+W_WALL = 2.0         # rel 이 벽일 때 벽까지 거리 (W_DIST 보다 작게 → 이유 없이 LLM 위치를 떠나지 않음)
+W_COLLIDE = 100.0    # 배치된 bbox 와 겹치는 면적 비율 (사실상 제약)
 
 # ────────────────────────────── LLM 프롬프트 템플릿 ────────────────────────────────
 _SYSTEM = """
@@ -41,6 +54,20 @@ _USER = (
     "Return bbox and yaw/pitch in JSON (see system instructions)."
 )
 
+_LAYOUT_SYSTEM = """
+너는 공간 추론 전문가야. 입력으로 받은 객체들을 한 방 안에 서로 겹치지 않게 배치해야 해.
+객체마다 아래 형식의 JSON 을 담은 **JSON 배열** 하나만 반환해. 순서는 입력 순서와 같게.
+예시: [{"i":0,"x1":0.1,"y1":0.5,"x2":0.35,"y2":0.7,"yaw":90,"pitch":-5}, ...]
+좌표는 정규화(0~1) 기준, (0,0)은 좌상단, (1,1)은 우하단이야.
+"""
+
+_LAYOUT_USER = (
+    "Place all of these objects in the room without overlaps:\n{objects}\n"
+    "Return one bbox and yaw/pitch per object as a JSON array (see system instructions)."
+)
+
+_POSE_KEYS = ("x1", "y1", "x2", "y2", "yaw", "pitch")
+
 # ────────────────────────────── 보조 함수들 ──────────────────────────────
 
 def _snap(val: float) -> float:
@@ -65,6 +92,117 @@ def _rule_fallback(rel: str) -> Tuple[List[float], float, float]:
         bbox = [0.30, 0.60, 0.55, 0.80];   yaw, pitch =   0, -5
     return bbox, yaw, pitch
 
+def _parse_pose(content: str) -> Dict:
+    """LLM 응답에서 pose JSON 추출 (필수 키가 없으면 예외 → 캐시에 저장되지 않음)"""
+    raw_json = re.search(r"\{.*\}", content.strip(), re.S).group(0)
+    pred = json.loads(raw_json)
+    for k in _POSE_KEYS:
+        float(pred[k])
+    return pred
+
+
+def _parse_layout(content: str) -> List[Dict]:
+    """LLM 응답에서 객체별 pose JSON 배열 추출 (배열이 아니면 예외)"""
+    raw_json = re.search(r"\[.*\]", content.strip(), re.S).group(0)
+    preds = json.loads(raw_json)
+    if not isinstance(preds, list):
+        raise ValueError("layout 응답이 배열이 아닙니다.")
+    return preds
+
+
+def grid_candidates(anchor: List[float]) -> np.ndarray:
+    """anchor 크기의 SCALES 배 크기들로, GRID_N 격자 위 가능한 모든 위치의 bbox (K,4)
+
+    0번째 후보는 항상 스냅된 anchor 자신 (동점이면 LLM 위치 유지).
+    """
+    x1, y1, x2, y2 = anchor
+    sizes = sorted({
+        (int(np.clip(round((x2 - x1) * s * GRID_N), 1, GRID_N)),
+         int(np.clip(round((y2 - y1) * s * GRID_N), 1, GRID_N)))
+        for s in SCALES
+    })
+    boxes = [np.clip(np.asarray([anchor], dtype=np.float64), 0.0, 1.0)]
+    for wc, hc in sizes:
+        gx, gy = np.meshgrid(np.arange(GRID_N - wc + 1), np.arange(GRID_N - hc + 1))
+        gx, gy = gx.ravel(), gy.ravel()
+        boxes.append(np.stack([gx, gy, gx + wc, gy + hc], axis=1) / GRID_N)
+    return np.concatenate(boxes)
+
+
+def _wall_distance(cands: np.ndarray, rel: str) -> np.ndarray:
+    """rel 이 벽이면 후보와 해당 벽 사이 거리 (정규화), 아니면 0"""
+    if rel == "left_wall":
+        return cands[:, 0]
+    if rel == "right_wall":
+        return 1.0 - cands[:, 2]
+    if rel == "back_wall":  # 뒷벽 바닥선 (_rule_fallback 의 back_wall bbox 하단)
+        return np.abs(cands[:, 3] - 0.55)
+    return np.zeros(len(cands))
+
+
+def rank_candidates(
+    cands: np.ndarray,
+    anchor: List[float],
+    rel: str,
+    placed: np.ndarray,
+    fopa: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """후보별 종합 점수 (클수록 좋음). placed 는 정규화 bbox (P,4)
+
+    충돌 없는 후보가 하나라도 있으면 겹치는 후보는 모두 -inf (사전식 순위: 충돌 여부 → 점수).
+    모두 겹치면 W_COLLIDE 항 때문에 겹침 비율이 작은 후보가 앞선다.
+    """
+    area = (cands[:, 2] - cands[:, 0]) * (cands[:, 3] - cands[:, 1])
+    if len(placed):
+        collide = _overlap_matrix(cands, placed).sum(axis=1) / np.maximum(area, 1e-9)
+    else:
+        collide = np.zeros(len(cands))
+    dist = np.abs(cands - np.asarray(anchor, dtype=np.float64)).sum(axis=1) / 2
+
+    score = W_WALL * -_wall_distance(cands, rel) - W_DIST * dist - W_COLLIDE * collide
+    if fopa is not None:
+        score = score + W_FOPA * fopa
+    free = collide <= 1e-9
+    if free.any():
+        score = np.where(free, score, -np.inf)
+    return score
+
+
+def _search(bg_path, obj: Dict, anchor: List[float], placed: np.ndarray, use_fopa: bool) -> List[float]:
+    """격자 후보 전체에서 최고 점수 bbox (정규화) 를 반환"""
+    cands = grid_candidates(anchor)
+    fopa = None
+    if use_fopa:
+        try:
+            from modules.fopa_runner import score_bboxes  # 지연 로딩
+            fopa = np.asarray(score_bboxes(bg_path, obj, cands), dtype=np.float64)
+        except Exception:
+            fopa = None  # FOPA 실패 시 FOPA 항 없이
+    score = rank_candidates(cands, anchor, obj.get("rel", ""), placed, fopa)
+    return cands[int(np.argmax(score))].tolist()
+
+
+def _overlap_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """bbox 배열 a(M,4) × b(K,4) 의 교집합 넓이 (M,K) — 0 이면 겹치지 않음"""
+    w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    return np.clip(w, 0, None) * np.clip(h, 0, None)
+
+
+def _bg_size(bg_path) -> Tuple[int, int]:
+    """배경 이미지 (W, H) — 경로 또는 아티팩트 버스로 넘어온 PIL 이미지"""
+    if isinstance(bg_path, Image.Image):
+        return bg_path.size
+    with Image.open(bg_path) as im:
+        return im.size
+
+
+def _to_px(bbox_norm: List[float], W: int, H: int) -> List[int]:
+    return [
+        int(bbox_norm[0] * W), int(bbox_norm[1] * H),
+        int(bbox_norm[2] * W), int(bbox_norm[3] * H)
+    ]
+
 # ────────────────────────────── 메인 함수 ──────────────────────────────
 
 def plan_pose(
@@ -81,62 +219,89 @@ def plan_pose(
     # LLM을 호출하여 초기 예측값 생성 ------------------------------------------------
     prompt = _USER.format(label=obj.get("label", "object"), rel=obj.get("rel", ""))
     try:
-        resp = openai.ChatCompletion.create(
-            model=MODEL,
-            messages=[{"role": "system", "content": _SYSTEM},
-                      {"role": "user", "content": prompt}],
+        # 같은 (label, rel) 요청은 캐시된 응답을 재사용 (modules.llm_cache)
+        pred = cached_chat(
+            MODEL,
+            [{"role": "system", "content": _SYSTEM},
+             {"role": "user", "content": prompt}],
             temperature=0.2,
+            parse=_parse_pose,
         )
-        raw_json = re.search(r"\{.*\}", resp.choices[0].message.content.strip()).group(0)
-        pred = json.loads(raw_json)
         bbox_norm = [pred["x1"], pred["y1"], pred["x2"], pred["y2"]]
         yaw, pitch = float(pred["yaw"]), float(pred["pitch"])
     except Exception:  # LLM 실패 시 룰 기반으로 대체
         bbox_norm, yaw, pitch = _rule_fallback(obj.get("rel", ""))
 
-    # 스냅 및 후보 생성 (속도 최적화)
-    # ---------------------------------------------------------
-    # 기본적으로는 스냅된 1개 bbox만 사용하고, FOPA를 쓸 때만
-    # 4개의 소규모 지터 후보를 추가해 점수를 계산
-    bbox_norm = _snap_bbox(bbox_norm)
-    candidates = [bbox_norm]
+    # 스냅 후 격자 후보 탐색 --------------------------------------------------------
+    W, H = _bg_size(bg_path)
+    placed = np.asarray(placed_boxes or [], dtype=np.float64).reshape(-1, 4) / [W, H, W, H]
+    bbox_norm = _search(bg_path, obj, _snap_bbox(bbox_norm), placed, use_fopa)
 
-    if use_fopa:
-        # 좌/우/상/하 4‑방향으로만 작은 지터(±MAX_JITTER) 생성
-        CAND_OFFSET = [(-MAX_JITTER, 0), (MAX_JITTER, 0), (0, -MAX_JITTER), (0, MAX_JITTER)]
-        for dx, dy in CAND_OFFSET:
-            b = [bbox_norm[0]+dx, bbox_norm[1]+dy, bbox_norm[2]+dx, bbox_norm[3]+dy]
-            b = [max(0, min(1, v)) for v in b]
-            candidates.append(b)
-
-    # 후보 개수는 최대 5개이므로 계산 비용이 크게 늘지 X
-
-    # 기존 배치와 충돌 제거 ----------------------------------------- -----------------------------------------------------------
-    if placed_boxes:
-        def overlap(a, b):
-            return not (a[2] < b[0] or a[0] > b[2] or a[3] < b[1] or a[1] > b[3])
-        candidates = [b for b in candidates if all(not overlap(b, p) for p in placed_boxes)] or [bbox_norm]
-
-    # FOPA 점수로 가장 자연스러운 후보 선택 -------------------------------------------
-    if use_fopa:
+    # 정규화 bbox를 픽셀 좌표로 변환 -----------------------------------------------
+    return _to_px(bbox_norm, W, H), yaw, pitch
+
+
+def plan_layout(
+    bg_path: Path,
+    objects: List[Dict],
+    use_fopa: bool = True,
+) -> List[Tuple[List[int], float, float]]:
+    """방 안의 모든 객체를 한 번에 배치해 객체별 (bbox_px, yaw, pitch) 리스트를 반환한다.
+
+    * LLM 호출은 객체 수와 상관없이 1회
+    * 충돌 검사는 객체마다 (후보 × 이미 고른 bbox) 겹침 행렬 한 번
+    * 모든 후보가 겹치면 겹침 비율이 가장 작은 후보를 사용
+    """
+    if not objects:
+        return []
+
+    # LLM 1회 호출 → 객체별 초기 예측 -------------------------------------------------
+    listing = "\n".join(
+        f"{i}. '{obj.get('label', 'object')}' positioned '{obj.get('rel', '')}'"
+        for i, obj in enumerate(objects)
+    )
+    try:
+        preds = cached_chat(
+            MODEL,
+            [{"role": "system", "content": _LAYOUT_SYSTEM},
+             {"role": "user", "content": _LAYOUT_USER.format(objects=listing)}],
+            temperature=0.2,
+            parse=_parse_layout,
+        )
+    except Exception:  # LLM 실패 시 모든 객체를 룰 기반으로
+        preds = []
+
+    by_index = {}
+    for pos, pred in enumerate(preds):
         try:
-            from modules.fopa_runner import score_bbox  # 지연 로딩
-            scores = [score_bbox(bg_path, obj, b) for b in candidates]
-            best_idx = max(range(len(scores)), key=lambda i: scores[i])
-            bbox_norm = candidates[best_idx]
-        except Exception:
-            # FOPA 실패 시 첫 후보 사용
-            bbox_norm = candidates[0]
-    else:
-        bbox_norm = candidates[0]
+            idx = int(pred.get("i", pos))     # "i": "0" 처럼 문자열로 와도 인정
+        except (AttributeError, TypeError, ValueError):
+            print(f"[!] layout 응답 {pos}번 항목 무시 (객체 인덱스 없음): {pred!r}")
+            continue
+        if not 0 <= idx < len(objects) or idx in by_index:
+            print(f"[!] layout 응답 {pos}번 항목 무시 (인덱스 {idx} 범위 밖 또는 중복)")
+            continue
+        by_index[idx] = pred
 
-    # 정규화 bbox를 픽셀 좌표로 변환 -----------------------------------------------
-    # 배경 이미지 실제 크기 읽기
-    with Image.open(bg_path) as im:
-        W, H = im.size  # (width, height)
-    bbox_px = [
-        int(bbox_norm[0] * W), int(bbox_norm[1] * H),
-        int(bbox_norm[2] * W), int(bbox_norm[3] * H)
-    ]
+    poses = []
+    for i, obj in enumerate(objects):
+        try:
+            pred = by_index[i]
+            bbox_norm = [float(pred[k]) for k in _POSE_KEYS[:4]]
+            yaw, pitch = float(pred["yaw"]), float(pred["pitch"])
+        except (KeyError, TypeError, ValueError):  # 응답에 없거나 잘못된 객체만 룰 기반으로
+            if preds:
+                print(f"[!] layout 응답에 객체 {i} ({obj.get('label')}) 가 없거나 잘못됨 → 룰 기반 배치")
+            bbox_norm, yaw, pitch = _rule_fallback(obj.get("rel", ""))
+        poses.append((_snap_bbox(bbox_norm), yaw, pitch))
+
+    # 객체 순서대로 격자 탐색 (앞서 고른 bbox 를 배치된 bbox 로) -------------------------
+    W, H = _bg_size(bg_path)
+    chosen = np.zeros((0, 4))
+    layout = []
+    for obj, (bbox_norm, yaw, pitch) in zip(objects, poses):
+        best = _search(bg_path, obj, bbox_norm, chosen, use_fopa)
+        chosen = np.vstack([chosen, best])
+        layout.append((_to_px(best, W, H), yaw, pitch))
 
-    return bbox_px, yaw, pitch
+    return layout
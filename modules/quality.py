@@ -0,0 +1,143 @@
+# modules/quality.py
+
+"""
+품질 / 지연 티어
+================
+
+디퓨전 단계마다 스케줄러와 스텝 수를 요청 단위로 고른다.
+
+| 티어      | lora / inpaint (diffusers)          | controlcom (ldm DDIM) |
+|-----------|-------------------------------------|-----------------------|
+| draft     | DPM-Solver++ 8 스텝 (LCM LoRA 가 있으면 LCM 4 스텝) | 15 스텝 |
+| standard  | UniPC 16 스텝                        | 25 스텝               |
+| final     | DPM-Solver++ (Karras) 30 스텝        | 50 스텝               |
+
+* 기본 티어 `ROOMIE_QUALITY` (기본 final), 요청마다 `quality=` 로 바꿀 수 있음
+* LCM 은 증류된 LoRA 가 있어야 제대로 나오므로 `ROOMIE_LCM_LORA_SD_LORA` /
+  `ROOMIE_LCM_LORA_SD_INPAINT` (HF repo 또는 경로)를 지정했을 때만 draft 에서 사용
+* Zero123 워커는 이미 DDIM 1 스텝이라 티어와 무관
+
+스케줄러 교체는 `apply_sampler(pipe, sampler, model_name)` — 파이프라인마다 원래 스케줄러 설정을
+기억해 두고, 같은 (종류, Karras 여부)는 한 번 만든 스케줄러 객체를 재사용한다. 공유 파이프라인은 마이크로 배처
+디스패처 스레드 하나에서만 호출되고, 배치 키에 스케줄러가 들어가므로 배치 중간에 바뀌지 않는다.
+"""
+
+import os
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class Sampler(NamedTuple):
+    scheduler: str      # default | dpmpp | unipc | lcm | ddim
+    steps: int
+    guidance: float
+    karras: bool = False    # Karras 시그마 간격 (dpmpp 만 해당)
+
+
+TIERS: Dict[str, Dict[str, Sampler]] = {
+    "draft": {
+        "lora": Sampler("dpmpp", 8, 7.5),
+        "inpaint": Sampler("dpmpp", 8, 7.5),
+        "controlcom": Sampler("ddim", 15, 5.0),
+    },
+    "standard": {
+        "lora": Sampler("unipc", 16, 7.5),
+        "inpaint": Sampler("unipc", 16, 7.5),
+        "controlcom": Sampler("ddim", 25, 5.0),
+    },
+    "final": {
+        "lora": Sampler("dpmpp", 30, 7.5, karras=True),
+        "inpaint": Sampler("dpmpp", 30, 7.5, karras=True),
+        "controlcom": Sampler("ddim", 50, 5.0),
+    },
+}
+LCM_DRAFT = Sampler("lcm", 4, 1.5)
+
+# 단계 → 레지스트리 모델 이름 (LCM LoRA 환경 변수 이름에 사용)
+STAGE_MODELS = {"lora": "sd_lora", "inpaint": "sd_inpaint"}
+
+DEFAULT_TIER = os.getenv("ROOMIE_QUALITY", "final")
+
+
+def lcm_lora(model_name: str) -> Optional[str]:
+    return os.getenv(f"ROOMIE_LCM_LORA_{model_name.upper()}") or None
+
+
+def resolve_tier(quality: Optional[str]) -> str:
+    tier = (quality or DEFAULT_TIER).strip().lower()
+    if tier not in TIERS:
+        raise ValueError(f"quality 는 {'|'.join(TIERS)} 중 하나: {tier}")
+    return tier
+
+
+def sampler_for(stage: str, quality: Optional[str] = None) -> Sampler:
+    """티어 + 단계(lora / inpaint / controlcom) → 스케줄러 / 스텝 / guidance"""
+    tier = resolve_tier(quality)
+    model = STAGE_MODELS.get(stage)
+    if tier == "draft" and model and lcm_lora(model):
+        return LCM_DRAFT
+    return TIERS[tier][stage]
+
+
+# ────────────────────────────── diffusers 스케줄러 교체 ──────────────────────────────
+
+_lock = threading.Lock()
+
+
+def _make_scheduler(name: str, config, karras: bool = False):
+    if name == "dpmpp":
+        from diffusers import DPMSolverMultistepScheduler
+        return DPMSolverMultistepScheduler.from_config(config, algorithm_type="dpmsolver++",
+                                                       use_karras_sigmas=karras)
+    if name == "unipc":
+        from diffusers import UniPCMultistepScheduler
+        return UniPCMultistepScheduler.from_config(config)
+    if name == "lcm":
+        from diffusers import LCMScheduler
+        return LCMScheduler.from_config(config)
+    raise ValueError(f"지원하지 않는 스케줄러: {name}")
+
+
+def _pipe_state(pipe) -> Dict[str, Any]:
+    """파이프라인에 붙여 두는 상태: 원래 스케줄러, 만들어 둔 스케줄러들, LCM 외 활성 어댑터"""
+    with _lock:
+        state = getattr(pipe, "_roomie_samplers", None)
+        if state is None:
+            state = {"base": pipe.scheduler, "schedulers": {("default", False): pipe.scheduler}, "adapters": None}
+            pipe._roomie_samplers = state
+        return state
+
+
+def _set_lcm_adapter(pipe, state: Dict[str, Any], model_name: str, enabled: bool):
+    """LCM LoRA 를 처음 쓸 때 어댑터로 붙이고, 이후에는 켜고 끄기만 함"""
+    if state["adapters"] is None:
+        if not enabled:
+            return
+        base = list(pipe.get_active_adapters()) if hasattr(pipe, "get_active_adapters") else []
+        print(f"[DEBUG] LCM LoRA 로딩 ({model_name}): {lcm_lora(model_name)}")
+        pipe.load_lora_weights(lcm_lora(model_name), adapter_name="lcm")
+        state["adapters"] = base
+    base = state["adapters"]
+    if enabled:
+        if not base:
+            pipe.enable_lora()
+        pipe.set_adapters([*base, "lcm"])
+    elif base:
+        pipe.set_adapters(base)
+    else:
+        pipe.disable_lora()
+
+
+def apply_sampler(pipe, sampler: Sampler, model_name: str):
+    """파이프라인 스케줄러를 sampler 에 맞게 교체 (스케줄러가 없는 스텁 등은 그대로)"""
+    if not hasattr(pipe, "scheduler"):
+        return
+    state = _pipe_state(pipe)
+    name = sampler.scheduler
+    key = (name, sampler.karras)
+    scheduler = state["schedulers"].get(key)
+    if scheduler is None:
+        scheduler = state["schedulers"][key] = _make_scheduler(name, state["base"].config, sampler.karras)
+    pipe.scheduler = scheduler
+    if name == "lcm" or state["adapters"] is not None:
+        _set_lcm_adapter(pipe, state, model_name, enabled=(name == "lcm"))
@@ -0,0 +1,72 @@
+# modules/sessions.py
+
+"""
+초안(draft) → 다듬기(refine) 세션 저장소
+========================================
+
+미리보기 실행에서 만든 배치 계획(객체, bbox / yaw / pitch, 가구 PNG, 회전 뷰, 마스크)을
+세션 id 로 보관해 두고, 다듬기 요청은 마지막 인페인팅만 원본 해상도 / 높은 품질로 다시 돌린다.
+
+* 세션은 PIL 이미지를 그대로 들고 있으므로 프로세스 메모리에만 둔다 (서버 재시작 시 사라짐)
+* 만료 : `ROOMIE_SESSION_TTL` 초 (기본 1시간, 조회할 때마다 연장)
+* 개수 : `ROOMIE_SESSION_MAX` 개 (기본 32, 넘치면 가장 오래 안 쓴 세션부터 제거)
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from modules import telemetry
+
+SESSION_TTL_SEC = int(os.getenv("ROOMIE_SESSION_TTL", "3600"))
+SESSION_MAX = int(os.getenv("ROOMIE_SESSION_MAX", "32"))
+
+ACTIVE_SESSIONS = telemetry.gauge("roomie_draft_sessions", "Draft sessions kept for refine")
+
+
+class SessionStore:
+    """세션 id → 배치 계획 dict (LRU + TTL)"""
+
+    def __init__(self, ttl_sec: int = SESSION_TTL_SEC, max_sessions: int = SESSION_MAX):
+        self.ttl_sec = ttl_sec
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, record: Dict[str, Any]) -> str:
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._purge()
+            self._sessions[session_id] = {**record, "id": session_id, "touched_at": time.time()}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            ACTIVE_SESSIONS.set(len(self._sessions))
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session["touched_at"] = time.time()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            found = self._sessions.pop(session_id, None) is not None
+            ACTIVE_SESSIONS.set(len(self._sessions))
+            return found
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl_sec
+        for session_id in [k for k, v in self._sessions.items() if v["touched_at"] < cutoff]:
+            del self._sessions[session_id]
+        ACTIVE_SESSIONS.set(len(self._sessions))
+
+
+sessions = SessionStore()
@@ -0,0 +1,96 @@
+# modules/stage_dag.py
+
+"""
+스테이지 DAG 스케줄러
+=====================
+
+파이프라인을 (이름, 함수, 선행 스테이지, 실행 풀) 로 이루어진 DAG 로 표현하고,
+선행 스테이지가 모두 끝난 스테이지부터 풀별 스레드 풀에서 동시에 실행한다.
+
+* 풀은 자원 단위로 나눈다 (예: "lora", "zero123", "inpaint", "cpu").
+  GPU 파이프라인 풀은 작게, CPU 작업 풀은 넉넉하게.
+* `run()` 은 스테이지 결과와 함께 시간 리포트를 돌려준다.
+  saved = (스테이지 소요 시간 합) - (실제 wall time) → 겹쳐 실행해서 아낀 시간
+  queued = 선행 스테이지가 끝난 뒤 풀 자리를 기다린 시간 (roomie_queue_seconds{queue="dag:<풀>"})
+* 스테이지는 run() 을 호출한 쪽의 contextvars(텔레메트리 trace 등)를 물려받아 실행된다.
+"""
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from modules.telemetry import QUEUE_SECONDS
+
+DEFAULT_POOL = "cpu"
+
+
+class StageGraph:
+    """스테이지 함수는 `fn(results)` 형태로, 지금까지 끝난 스테이지 결과 dict 를 받는다"""
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], List[str], str]] = {}
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any],
+            deps: Iterable[Optional[str]] = (), pool: str = DEFAULT_POOL) -> str:
+        if name in self._stages:
+            raise ValueError(f"중복 스테이지: {name}")
+        deps = [d for d in deps if d]           # None 은 '선행 없음' 으로 취급
+        for d in deps:
+            if d not in self._stages:
+                raise ValueError(f"{name}: 정의되지 않은 선행 스테이지 {d}")
+        self._stages[name] = (fn, deps, pool)
+        return name
+
+    def run(self, pool_sizes: Dict[str, int]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """DAG 전체 실행 → (results, report)"""
+        pools = {name: ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"dag-{name}")
+                 for name, size in pool_sizes.items()}
+        results: Dict[str, Any] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        running: Dict[Future, str] = {}
+        remaining = dict(self._stages)
+        t0 = time.perf_counter()
+
+        def _timed(name: str, fn, ready: float):
+            start = time.perf_counter()
+            pool = self._stages[name][2]
+            QUEUE_SECONDS.observe(start - ready, queue=f"dag:{pool}")
+            try:
+                return fn(results)
+            finally:
+                timings[name] = {"start": start - t0, "end": time.perf_counter() - t0,
+                                 "queued": start - ready, "pool": pool}
+
+        try:
+            while remaining or running:
+                ready = [n for n, (_, deps, _) in remaining.items() if all(d in results for d in deps)]
+                for name in ready:
+                    fn, _, pool = remaining.pop(name)
+                    executor = pools.get(pool) or pools.setdefault(
+                        pool, ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"dag-{pool}"))
+                    ctx = contextvars.copy_context()
+                    running[executor.submit(ctx.run, _timed, name, fn, time.perf_counter())] = name
+
+                if not running:
+                    raise RuntimeError(f"실행할 수 없는 스테이지(순환 의존?): {list(remaining)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    results[name] = fut.result()     # 실패 시 예외 그대로 전파
+        finally:
+            for fut in running:
+                fut.cancel()
+            for executor in pools.values():
+                executor.shutdown(wait=True)
+
+        wall = time.perf_counter() - t0
+        stage_total = sum(t["end"] - t["start"] for t in timings.values())
+        report = {
+            "wall": round(wall, 3),
+            "stage_total": round(stage_total, 3),
+            "saved": round(max(0.0, stage_total - wall), 3),
+            "stages": timings,
+        }
+        return results, report
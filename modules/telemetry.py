@@ -0,0 +1,268 @@
+# modules/telemetry.py
+
+"""
+텔레메트리 (스팬 · Prometheus 지표)
+===================================
+
+외부 의존성 없이 파이프라인 단계 / 서브프로세스 / 큐 대기 / 모델 로딩 / 캐시를 계측한다.
+
+* `span(name, **attrs)` : 구간 시간을 `roomie_span_seconds{span=...}` 히스토그램에 기록하고,
+  끝날 때 JSON 한 줄 스팬 로그(trace_id, span_id, parent_id, 소요 ms, 상태, 속성)를 남김
+* `trace(trace_id)`     : 요청(작업) 단위 trace id — 안쪽 스팬 로그가 같은 id 로 묶임
+  (contextvars 기반이라 스레드 풀로 넘길 때는 `contextvars.copy_context()` 로 전달)
+* `@traced(name)`       : 함수 전체를 trace + span 으로 감쌈
+* 지표                  : `QUEUE_SECONDS`, `MODEL_LOAD_SECONDS`, `CACHE_REQUESTS`,
+  `SUBPROCESS_LAUNCHES`, `BATCH_SIZE`, 메모리 최고치 게이지 (CPU RSS / GPU)
+* `render()`            : Prometheus 텍스트 포맷 (main.py 의 GET /metrics)
+
+스팬 로그 출력은 `ROOMIE_SPAN_LOG` (기본 "stderr", 파일 경로 지정 가능, 빈 값이면 끔).
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 16, 32)
+
+SPAN_LOG = os.getenv("ROOMIE_SPAN_LOG", "stderr")
+
+_log = logging.getLogger("roomie.trace")
+_log.propagate = False
+if SPAN_LOG:
+    _handler = logging.StreamHandler(sys.stderr) if SPAN_LOG == "stderr" else logging.FileHandler(SPAN_LOG)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _log.addHandler(_handler)
+    _log.setLevel(logging.INFO)
+
+
+# ────────────────────────────── 지표 ──────────────────────────────
+
+LabelKey = Tuple[Tuple[str, str], ...]
+_METRICS: Dict[str, "_Metric"] = {}
+_METRICS_LOCK = threading.Lock()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._series: Dict[LabelKey, Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _lines(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        with self._lock:
+            lines = list(self._lines())
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *lines])
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def _lines(self):
+        for key, value in self._series.items():
+            yield f"{self.name}{_fmt_labels(key)} {value}"
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def set_max(self, value: float, **labels):
+        """최고치(high-water mark) 갱신"""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = max(self._series.get(key, value), value)
+
+    def _lines(self):
+        for key, value in self._series.items():
+            yield f"{self.name}{_fmt_labels(key)} {value}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def _lines(self):
+        for key, s in self._series.items():
+            for bound, count in zip(self.buckets, s["counts"]):
+                yield f"{self.name}_bucket{_fmt_labels(key, ('le', repr(float(bound))))} {count}"
+            yield f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {s['count']}"
+            yield f"{self.name}_sum{_fmt_labels(key)} {s['sum']}"
+            yield f"{self.name}_count{_fmt_labels(key)} {s['count']}"
+
+
+def _get_or_create(cls, name: str, help: str, **kw) -> Any:
+    with _METRICS_LOCK:
+        metric = _METRICS.get(name)
+        if metric is None:
+            metric = _METRICS[name] = cls(name, help, **kw)
+        return metric
+
+
+def counter(name: str, help: str) -> Counter:
+    return _get_or_create(Counter, name, help)
+
+
+def gauge(name: str, help: str) -> Gauge:
+    return _get_or_create(Gauge, name, help)
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help, buckets=buckets)
+
+
+def render() -> str:
+    """등록된 모든 지표를 Prometheus 텍스트 포맷으로"""
+    record_memory()
+    with _METRICS_LOCK:
+        metrics = list(_METRICS.values())
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+SPAN_SECONDS = histogram("roomie_span_seconds", "Duration of traced spans (pipeline stages, subprocesses, batches)")
+QUEUE_SECONDS = histogram("roomie_queue_seconds", "Time spent waiting in a queue before execution")
+MODEL_LOAD_SECONDS = histogram("roomie_model_load_seconds", "Model load time per registry entry")
+CACHE_REQUESTS = counter("roomie_cache_requests_total", "Cache lookups by cache and result")
+SUBPROCESS_LAUNCHES = counter("roomie_subprocess_launches_total", "External processes started")
+BATCH_SIZE = histogram("roomie_batch_size", "Items per micro-batch", buckets=SIZE_BUCKETS)
+RSS_PEAK_BYTES = gauge("roomie_process_rss_peak_bytes", "Process resident set size high-water mark")
+GPU_PEAK_BYTES = gauge("roomie_gpu_memory_peak_bytes", "torch.cuda max_memory_allocated per device")
+
+
+def record_memory():
+    """CPU RSS / GPU 메모리 최고치 갱신 (torch 는 이미 import 된 경우에만 조회)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    RSS_PEAK_BYTES.set_max(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        try:
+            if torch.cuda.is_available():
+                for i in range(torch.cuda.device_count()):
+                    GPU_PEAK_BYTES.set_max(torch.cuda.max_memory_allocated(i), device=f"cuda:{i}")
+        except Exception:
+            pass
+
+
+# ────────────────────────────── 스팬 ──────────────────────────────
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("roomie_trace_id", default=None)
+_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("roomie_span_id", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None) -> Iterator[str]:
+    """요청 단위 trace — 이미 trace 안이면 바깥 id 를 그대로 사용"""
+    outer = _trace_id.get()
+    if outer is not None:
+        yield outer
+        return
+    token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """구간 계측. yield 된 dict 에 속성을 추가하면 스팬 로그에 함께 남음"""
+    span_id = uuid.uuid4().hex[:8]
+    parent = _span_id.get()
+    token = _span_id.set(span_id)
+    status = "ok"
+    start_wall, t0 = time.time(), time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        status = f"error:{type(e).__name__}"
+        raise
+    finally:
+        duration = time.perf_counter() - t0
+        _span_id.reset(token)
+        SPAN_SECONDS.observe(duration, span=name)
+        record_memory()
+        if SPAN_LOG:
+            _log.info(json.dumps({
+                "trace_id": _trace_id.get(),
+                "span_id": span_id,
+                "parent_id": parent,
+                "name": name,
+                "start": round(start_wall, 6),
+                "duration_ms": round(duration * 1000, 3),
+                "status": status,
+                "thread": threading.current_thread().name,
+                "attrs": attrs,
+            }, ensure_ascii=False, default=str))
+
+
+def traced(name: str):
+    """함수 호출 전체를 trace + span 으로 감싸는 데코레이터 (바깥 trace 가 있으면 그 id 사용)"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace(), span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
@@ -1,41 +1,231 @@
-import subprocess, os
+import subprocess, os, json, threading, atexit, itertools, hashlib, time
 from pathlib import Path
-from huggingface_hub import hf_hub_download
 
-# 0) venv38 Python 경로 확인 ────────────────────────────
-python_path = "/workspace/venv38/bin/python"
-if not os.path.exists(python_path):
-    raise RuntimeError("venv38 Python not found.")
+from modules import telemetry
+from modules.asset_cache import AssetCache
+
+# 0) venv38 Python 경로 (워커를 띄울 때 확인 — import 만으로는 실패하지 않음) ─────────
+python_path = os.getenv("ZERO123_PYTHON", "/workspace/venv38/bin/python")
+
+CONFIG_PATH = "/workspace/roomie-interior/external/zero123/zero123/configs/sd-objaverse-finetune-c_concat-256.yaml"
+SCRIPT_PATH = "/workspace/roomie-interior/infer_zero123.py"
+MAX_RESTARTS = 2   # 한 작업에서 워커가 죽었을 때 재시작 후 재시도 횟수
+# 작업 1회 응답 제한 (초) — 넘기면 멈춘 워커로 보고 죽인 뒤 재시작해서 재시도
+REQUEST_TIMEOUT = float(os.getenv("ZERO123_TIMEOUT", "300"))
+
+# 뷰 캐시 양자화 간격 (도) — 같은 빈에 들어오는 각도는 빈 중심 각도로 렌더링해 재사용
+YAW_BIN_DEG   = float(os.getenv("ZERO123_YAW_BIN", "10"))
+PITCH_BIN_DEG = float(os.getenv("ZERO123_PITCH_BIN", "5"))
+VIEW_CACHE_DIR = Path("assets") / "zero123_views"
+VIEW_CACHE_MAX_BYTES = int(float(os.getenv("ZERO123_VIEW_CACHE_MB", "1024")) * 1024 * 1024)
+
+
+# ──────────────────────────────────────────────────────
+class Zero123Worker:
+    """venv38 인터프리터에서 도는 상주 Zero123 프로세스
+
+    `infer_zero123.py --serve` 를 한 번 띄워 모델을 한 번만 로딩하고,
+    이후 회전 작업은 stdin/stdout 파이프(JSON 한 줄)로 주고받는다.
+    프로세스가 죽으면 다음 요청에서 자동으로 다시 띄운다.
+    """
+
+    def __init__(self, python: str = python_path, script: str = SCRIPT_PATH,
+                 config: str = CONFIG_PATH, checkpoint: str | None = None):
+        self.python = python
+        self.script = script
+        self.config = config
+        self.checkpoint = checkpoint
+        self.proc: subprocess.Popen | None = None
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    # ── 프로세스 관리 ─────────────────────────────────────
+    def _alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def _start(self):
+        if not os.path.exists(self.python):
+            raise RuntimeError("venv38 Python not found.")
+
+        # 체크포인트는 캐시에 한 번만 내려받음
+        if self.checkpoint is None:
+            from huggingface_hub import hf_hub_download   # 워커를 띄울 때만 필요
+            self.checkpoint = hf_hub_download(
+                repo_id="cvlab/zero123-weights",
+                filename="105000.ckpt"
+            )
+
+        command = [
+            self.python, self.script, "--serve",
+            "--checkpoint", self.checkpoint,
+            "--config",     self.config,
+        ]
+        print("[DEBUG] Zero-123 워커 시작:", " ".join(map(str, command)))
+        telemetry.SUBPROCESS_LAUNCHES.inc(name="zero123")
+        with telemetry.span("subprocess.zero123_start") as attrs:
+            self.proc = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+            attrs["pid"] = self.proc.pid
+            # 모델 로딩이 끝나면 워커가 {"ready": true} 를 보냄
+            line = self.proc.stdout.readline()
+            if not line or not json.loads(line).get("ready"):
+                self._kill()
+                raise RuntimeError("Zero-123 워커 시작 실패")
+        print("[INFO] Zero-123 워커 준비 완료 (pid=%d)" % self.proc.pid)
+
+    def _kill(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+        self.proc = None
+
+    def close(self):
+        with self._lock:
+            if self._alive():
+                try:
+                    self.proc.stdin.close()
+                    self.proc.wait(timeout=5)
+                except Exception:
+                    pass
+            self._kill()
+
+    # ── 작업 요청 ─────────────────────────────────────────
+    def _roundtrip(self, job: dict, timeout: float = REQUEST_TIMEOUT) -> dict:
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+
+        # 응답 한 줄을 별도 스레드에서 읽고 timeout 까지만 기다림 (멈추면 request() 가 죽이고 재시작)
+        lines, stdout = [], self.proc.stdout
+        reader = threading.Thread(target=lambda: lines.append(stdout.readline()), daemon=True)
+        reader.start()
+        reader.join(timeout)
+        if reader.is_alive():
+            print(f"[WARN] Zero-123 워커가 {timeout:.0f}초 동안 응답 없음 (pid={self.proc.pid})")
+            raise TimeoutError("Zero-123 워커 응답 시간 초과")
+        if not lines[0]:
+            raise BrokenPipeError("Zero-123 워커 응답 없음")
+        return json.loads(lines[0])
+
+    def request(self, job: dict) -> dict:
+        job = {**job, "id": next(self._ids)}
+        queued = time.perf_counter()
+        with self._lock, telemetry.span("zero123.request", views=len(job.get("poses") or [1])):
+            telemetry.QUEUE_SECONDS.observe(time.perf_counter() - queued, queue="zero123")
+            for attempt in range(MAX_RESTARTS + 1):
+                if not self._alive():
+                    if self.proc is not None:
+                        self.restarts += 1
+                        print(f"[WARN] Zero-123 워커 종료 감지 → 재시작 ({self.restarts})")
+                        self._kill()
+                    self._start()
+                try:
+                    rsp = self._roundtrip(job)
+                    break
+                except (BrokenPipeError, OSError, ValueError):
+                    if attempt == MAX_RESTARTS:
+                        raise RuntimeError("Zero-123 워커가 반복해서 종료됨")
+                    self._kill()
+                    self.restarts += 1
+
+        if not rsp.get("ok"):
+            raise RuntimeError(f"Zero-123 실패: {rsp.get('error')}")
+        return rsp
+
+
+_worker: Zero123Worker | None = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> Zero123Worker:
+    """프로세스 전역 Zero123 워커 (최초 요청 시 생성)"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = Zero123Worker()
+            atexit.register(_worker.close)
+        return _worker
+
+
+# ────────────────────────────── 뷰 캐시 ──────────────────────────────
+# key = (이미지 해시, yaw 빈, pitch 빈) → assets/zero123_views/<hash>_<yb>_<pb>.png
+# 워커가 파일을 직접 쓰므로 AssetCache 는 경로 조회(get_path) / 등록(adopt) 만 쓰고,
+# 총 용량이 ZERO123_VIEW_CACHE_MB 를 넘으면 가장 오래 안 쓴 뷰부터 지운다.
+_view_cache: AssetCache | None = None
+_view_cache_lock = threading.Lock()
+
+
+def get_view_cache() -> AssetCache:
+    """VIEW_CACHE_DIR 의 뷰 캐시 (최초 사용 시 디스크 인덱스 복원)"""
+    global _view_cache
+    with _view_cache_lock:
+        if _view_cache is None or _view_cache.root != VIEW_CACHE_DIR:
+            _view_cache = AssetCache(VIEW_CACHE_DIR, max_bytes=VIEW_CACHE_MAX_BYTES, hot_items=0,
+                                     name="zero123_views")
+        return _view_cache
+
+
+def _image_hash(image_path) -> str:
+    return hashlib.sha1(Path(image_path).read_bytes()).hexdigest()[:16]
+
+
+def _quantize(yaw: float, pitch: float) -> tuple[int, int]:
+    return round(yaw / YAW_BIN_DEG), round(pitch / PITCH_BIN_DEG)
+
+
+def _cache_key(img_hash: str, yaw_bin: int, pitch_bin: int) -> str:
+    return f"{img_hash}_{yaw_bin}_{pitch_bin}"
+
+
+def render_views(image_path: str, poses: list[tuple[float, float]]) -> list[str]:
+    """가구 이미지 한 장에 대해 여러 (yaw, pitch) 뷰를 반환
+
+    캐시에 없는 빈만 모아서 워커에 한 번의 배치 렌더링으로 요청한다.
+    반환 순서는 poses 순서와 같다.
+    """
+    cache = get_view_cache()
+    img_hash = _image_hash(image_path)
+
+    bins = [_quantize(yaw, pitch) for yaw, pitch in poses]
+    keys = [_cache_key(img_hash, yb, pb) for yb, pb in bins]
+
+    # 캐시에 없는 빈만 (중복 제거) 렌더링
+    paths, missing = {}, {}
+    for key, (yb, pb) in zip(keys, bins):
+        if key in paths or key in missing:
+            continue
+        path = cache.get_path(key)
+        if path is not None:
+            paths[key] = path
+        else:
+            missing[key] = (yb, pb)
+
+    if missing:
+        get_worker().request({
+            "input":   str(Path(image_path).resolve()),
+            "poses":   [[yb * YAW_BIN_DEG, pb * PITCH_BIN_DEG] for yb, pb in missing.values()],
+            "outputs": [str(cache.path_for(k).resolve()) for k in missing],
+        })
+        for key in missing:
+            paths[key] = cache.adopt(key, keep=keys)     # 이번 요청의 뷰는 축출하지 않음
+        print(f"[INFO] Zero-123 배치 렌더링: {len(missing)}개 뷰")
+
+    return [str(paths[k]) for k in keys]
+
 
 # ──────────────────────────────────────────────────────
 def rotate_with_zero123(image_path: str, yaw: float, pitch: float, object_id: str) -> str:
+    # 양자화된 뷰 캐시를 거쳐 렌더링 (같은 가구를 비슷한 각도로 다시 놓으면 캐시 히트)
+    out_path = render_views(image_path, [(float(yaw), float(pitch))])[0]
 
-    # 1) 체크포인트는 캐시에 한 번만 내려받음
-    ckpt_path = hf_hub_download(
-        repo_id="cvlab/zero123-weights",
-        filename="105000.ckpt"
-    )
-
-    # 2) 경로·이름 세팅
-    config_path  = "/workspace/roomie-interior/external/zero123/zero123/configs/sd-objaverse-finetune-c_concat-256.yaml"
-    script_path  = "/workspace/roomie-interior/infer_zero123.py"
-    out_dir      = Path("assets")                       # 수정 (폴더 통일)
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path     = out_dir / f"{object_id}_rot.png"
-
-    # 3) 서브프로세스 커맨드
-    command = [
-        python_path,  script_path,
-        "--input",  image_path,                  # 수정 (변수명 일치)
-        "--yaw",    str(yaw),
-        "--pitch",  str(pitch),
-        "--output", str(out_path),               # 수정 (전체 경로 전달)
-        "--checkpoint", ckpt_path,
-        "--config",    config_path,
-    ]
-
-    print("[DEBUG] Zero-123 cmd:", " ".join(map(str, command)))
-    subprocess.run(command, check=True)
-
-    print("[INFO] 회전 PNG 저장:", out_path)
-    return str(out_path)
+    print(f"[INFO] 회전 PNG ({object_id}):", out_path)
+    return out_path
@@ -1,69 +1,425 @@
 from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Optional
+import base64, io, os, time
 import uuid
 
+from PIL import Image
+
 # ── 단계별 모듈 ──────────────────────────────────────────────
 from modules.description_parser import parse_description          # 텍스트 → 객체 리스트(JSON)
-from modules.pose_planner import plan_pose                        # 객체 → (bbox, yaw, pitch)
+from modules.pose_planner import plan_layout                      # 객체들 → [(bbox, yaw, pitch)] (LLM 1회)
 from modules.furniture_generator import generate_lora_furniture   # LoRA 가구 PNG
 from modules.zero123_runner import rotate_with_zero123            # 회전 뷰 생성
-from modules.mask_generator import generate_mask                  # bbox → mask PNG
+from modules.mask_generator import generate_mask, group_non_overlapping  # bbox → mask PNG
 from modules.fopa_runner import run_fopa_selection                # (선택) 위치 미세 조정
-from modules.ipadapter_inpaint import run_ipadapter_inpaint       # IP‑Adapter 기반 인페인팅
+from modules.ipadapter_inpaint import run_ipadapter_inpaint, run_ipadapter_inpaint_merged  # IP‑Adapter 기반 인페인팅
+from modules.artifacts import ArtifactStore, ASSET_DIR, load_image  # 단계 간 이미지 참조 전달
+from modules.stage_dag import StageGraph                          # 스테이지 DAG 스케줄러
+from modules.microbatch import BATCH_MAX
+from modules import model_registry
+from modules.quality import resolve_tier
+from modules.sessions import sessions                             # 초안 → 다듬기 세션
+from modules import telemetry
+
+# 중간 산출물(가구 PNG, 마스크, 객체별 합성)도 디스크에 남길지 여부 (디버깅용)
+PERSIST_ARTIFACTS = os.getenv("ROOMIE_PERSIST_ARTIFACTS", "0") == "1"
+
+PREVIEW_MAX_SIDE = 384   # 중간 합성 미리보기 최대 변 길이(px)
+
+# 초안(draft) → 다듬기(refine)
+#   • draft  : 배경을 DRAFT_MAX_SIDE 로 줄이고 적은 스텝으로 전체 파이프라인 실행 → 세션 id
+#   • refine : 세션의 객체 / 배치 / 가구 / 회전 뷰를 그대로 쓰고 인페인팅만 원본 배경에서 다시
+DRAFT_MAX_SIDE = int(os.getenv("ROOMIE_DRAFT_MAX_SIDE", "512"))
+DRAFT_QUALITY = os.getenv("ROOMIE_DRAFT_QUALITY", "draft")
+REFINE_QUALITY = os.getenv("ROOMIE_REFINE_QUALITY", "final")
+
+# 합성 모드
+#   • sequential : 객체마다 인페인팅 1회 (이전 합성 결과 위에 순서대로)
+#   • merged     : 모든 객체를 먼저 계획하고, 겹치지 않는 객체끼리 마스크를 합쳐 한 번에 인페인팅
+COMPOSITE_MODE = os.getenv("ROOMIE_COMPOSITE_MODE", "sequential")
+COMPOSITE_MODES = ("sequential", "merged")
+
+# DAG 실행 풀 크기 (자원별)
+#   • lora    : 여러 객체의 가구 생성을 동시에 넣어 마이크로 배처가 한 배치로 묶도록 배치 크기만큼
+#   • zero123 : 상주 워커 1개
+#   • inpaint : 합성 결과가 객체마다 이어지므로 1
+#   • cpu     : layout / mask / fopa 등
+DAG_POOLS = {
+    "cpu": int(os.getenv("ROOMIE_DAG_CPU_WORKERS", "4")),
+    "lora": BATCH_MAX,
+    "zero123": 1,
+    "inpaint": 1,
+}
+
+# 단계가 시작될 때 다음 단계 모델을 미리 올림 (메모리 예산 안에서, 백그라운드)
+#   parse → lora(sd_lora, carvekit) → rotate(Zero123, 별도 프로세스) → fopa → inpaint(sd_inpaint)
+PREFETCH_NEXT = {
+    "parse": ("sd_lora", "carvekit"),
+    "rotate": ("fopa",),
+    "fopa": ("sd_inpaint",),
+}
+
+EventCallback = Callable[[dict], None]
+
+
+def _resolve_composite_mode(composite_mode: Optional[str]) -> str:
+    """생략 시 ROOMIE_COMPOSITE_MODE, 모르는 값은 기본값으로 바꾸지 않고 ValueError"""
+    mode = composite_mode or COMPOSITE_MODE
+    if mode not in COMPOSITE_MODES:
+        raise ValueError(f"composite_mode 는 {'|'.join(COMPOSITE_MODES)} 중 하나: {mode}")
+    return mode
+
+
+# ── 진행 이벤트 ──────────────────────────────────────────────
+def _emit(on_event: Optional[EventCallback], **event):
+    if on_event is not None:
+        event.setdefault("ts", time.time())
+        on_event(event)
+
+
+@contextmanager
+def _stage(on_event: Optional[EventCallback], stage: str, **info):
+    """단계 시작/종료 이벤트와 소요 시간(초)을 보냄 (텔레메트리 스팬 stage.<이름> 도 기록)"""
+    _emit(on_event, type="stage", stage=stage, status="start", **info)
+    model_registry.prefetch(*PREFETCH_NEXT.get(stage, ()))
+    t0 = time.perf_counter()
+    with telemetry.span(f"stage.{stage}", **info):
+        yield
+    _emit(on_event, type="stage", stage=stage, status="end",
+          elapsed=round(time.perf_counter() - t0, 3), **info)
 
-# ── 에셋 저장 경로 ───────────────────────────────────────────
-ASSET_DIR = Path(__file__).resolve().parent.parent / "assets"
-ASSET_DIR.mkdir(exist_ok=True)
 
+def encode_preview(img, max_side: int = PREVIEW_MAX_SIDE) -> str:
+    """합성 이미지를 작은 progressive JPEG(base64)로 인코딩"""
+    im = img if isinstance(img, Image.Image) else Image.open(img)
+    im = im.convert("RGB")
+    im.thumbnail((max_side, max_side))
+    buf = io.BytesIO()
+    im.save(buf, format="JPEG", quality=70, progressive=True, optimize=True)
+    return base64.b64encode(buf.getvalue()).decode("ascii")
 
-def run_interior_pipeline(description: str, image_path: Path) -> Path:
-    """Roomie Interior 파이프라인 (IP‑Adapter 버전)
+
+def _add_lora_stage(graph: StageGraph, obj: dict, obj_id: str, info: dict,
+                    store: ArtifactStore, on_event: Optional[EventCallback], quality: Optional[str] = None) -> str:
+    """Step 2a. LoRA로 정면 가구 이미지 생성 — 선행 스테이지 없이 바로 시작"""
+    def lora(_):
+        with _stage(on_event, "lora", **info):
+            furniture = store.put(f"{obj_id}/furniture",
+                                  generate_lora_furniture(obj, obj_id, persist=False, quality=quality))
+            obj["fg_image"] = furniture
+            return furniture
+
+    return graph.add(f"lora_{info['index']}", lora, pool="lora")
+
+
+def _add_object_stages(graph: StageGraph, obj: dict, obj_id: str, info: dict, bg_stage: str,
+                       layout_stage: str, store: ArtifactStore, on_event: Optional[EventCallback]) -> str:
+    """객체 하나의 회전 ~ 위치 결정 스테이지(2c~2e)를 DAG 에 추가하고 마지막 스테이지 이름 반환
+
+    * pose 는 layout_stage 결과(객체별 (bbox, yaw, pitch) 리스트)에서 꺼내 씀
+    * fopa 만 bg_stage(현재 합성 이미지)와 앞 객체의 fopa 를 기다림 (앞 객체의 인페인팅과 겹쳐 실행)
+    중간 산출물은 store 에 메모리로 보관하고, Zero123 워커(서브프로세스)에
+    넘길 가구 이미지만 디스크에 기록한다.
+    """
+    i = info["index"]
+
+    # Step 2c. Zero123로 회전 뷰 생성 (서브프로세스 경계 → 파일로 주고받음)
+    def rotate(r):
+        _, yaw, pitch = r[layout_stage][i]
+        with _stage(on_event, "rotate", **info):
+            rotated_png = rotate_with_zero123(str(store.path(f"{obj_id}/furniture")), yaw, pitch, obj_id)
+            return store.put(f"{obj_id}/rotated", Image.open(rotated_png).convert("RGB"))
+
+    # Step 2d. bbox → mask 이미지 생성 (흰 = 삽입 영역)
+    def mask(r):
+        bbox = r[layout_stage][i][0]
+        with _stage(on_event, "mask", **info):
+            return store.put(f"{obj_id}/mask", generate_mask(r[f"rotate_{i}"], bbox, obj_id, persist=False))
+
+    # Step 2e. (선택) FOPA로 위치 미세 조정
+    #   layout 이 고른 충돌 없는 배치를 깨지 않도록, 앞 객체의 최종 bbox 와 뒤 객체의 layout bbox 를 피함
+    def fopa(r):
+        bbox = r[layout_stage][i][0]
+        avoid = [r[f"plan_{j}"]["bbox"] for j in range(i)] + [pose[0] for pose in r[layout_stage][i + 1:]]
+        with _stage(on_event, "fopa", **info):
+            best_x, best_y = run_fopa_selection(r[bg_stage], r[f"rotate_{i}"], r[f"mask_{i}"], bbox,
+                                                avoid=avoid)
+            w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+            best_bbox = [best_x, best_y, best_x + w, best_y + h]
+            # 인페인팅 마스크는 옮긴 bbox 로 배경 크기에 다시 그림 (mask 스테이지 것은 FOPA 입력용)
+            final_mask = generate_mask(store.get("background"), [best_x, best_y, w, h], obj_id, persist=False)
+        return {
+            "object_id": obj_id,
+            "condition_img": r[f"rotate_{i}"],
+            "mask": final_mask,
+            "bbox": best_bbox,
+            "prompt": obj.get("prompt", ""),
+        }
+
+    graph.add(f"rotate_{i}", rotate, [f"lora_{i}", layout_stage], pool="zero123")
+    graph.add(f"mask_{i}", mask, [f"rotate_{i}", layout_stage])
+    return graph.add(f"plan_{i}", fopa, [f"mask_{i}", bg_stage, f"plan_{i - 1}" if i else None])
+
+
+@telemetry.traced("pipeline")
+def run_interior_pipeline(
+    description: str,
+    image_path: Path,
+    room_summary: str = "",
+    on_event: Optional[EventCallback] = None,
+    composite_mode: Optional[str] = None,
+    persist_artifacts: Optional[bool] = None,
+    inpaint_mode: Optional[str] = None,
+    quality: Optional[str] = None,
+    plans_out: Optional[list] = None,
+) -> Path:
+    """Roomie Interior 파이프라인 (IP‑Adapter 버전)
 
     1. LLM / 규칙으로 텍스트 → 객체(JSON)
     2. 객체별로
-       a. pose_planner → 초기 (bbox, yaw, pitch)
-       b. LoRA로 가구 PNG 생성
+       a. LoRA로 가구 PNG 생성
+       b. pose_planner.plan_layout → 모든 객체의 (bbox, yaw, pitch) 를 LLM 1회로 함께 계획
+          (객체 간 충돌 회피 — 가구를 기다리지 않도록 FOPA 점수 없이)
        c. Zero123로 yaw/pitch 회전
        d. bbox 기반 mask 생성
-       e. (선택) FOPA로 bbox 미세 조정
+       e. (선택) FOPA로 bbox 미세 조정 (다른 객체 bbox 와 겹치는 위치는 제외)
        f. IP‑Adapter Inpaint로 합성
     3. 최종 합성 이미지 경로 반환
+
+    2a~2f 는 스테이지 DAG 로 실행한다. 합성 이미지에 의존하지 않는 스테이지
+    (가구 생성, 회전 등)는 앞 객체의 인페인팅과 겹쳐 실행되고, fopa / 인페인팅만
+    진화하는 합성 이미지를 따라 직렬로 진행된다. layout 은 가구 생성과 동시에 원본 배경
+    기준으로 한 번 실행되므로, 먼저 생성된 가구부터 회전 ~ 인페인팅으로 넘어간다.
+    fopa 는 객체 순서대로 실행되어, 앞 객체는 옮긴 뒤의 bbox, 뒤 객체는 layout bbox 를 피한다.
+
+    composite_mode="merged" 이면 2a~2e 를 모든 객체에 대해 먼저 수행한 뒤,
+    마스크가 겹치지 않는 객체끼리 묶어 그룹마다 인페인팅을 한 번만 실행한다.
+    (겹치는 객체만 다음 그룹으로 밀려 순차 패스로 처리)
+
+    inpaint_mode="region" 이면 bbox 주변 창만 인페인팅해 원본 해상도에 블렌딩한다.
+    ("full" 은 배경 전체를 512×512 로 인페인팅, 생략 시 ROOMIE_INPAINT_MODE)
+
+    quality 는 draft | standard | final 품질 티어로, 가구 생성 / 인페인팅의 스케줄러와
+    스텝 수를 정한다 (modules.quality, 생략 시 ROOMIE_QUALITY).
+
+    on_event 를 넘기면 단계별 진행 이벤트(parse, layout, lora, rotate, mask, fopa, inpaint)와
+    객체(또는 그룹)마다 중간 합성 미리보기(preview), 그리고 스케줄 리포트(schedule:
+    겹쳐 실행해서 아낀 시간)를 dict 로 전달한다.
+
+    단계 사이에는 디코딩된 이미지를 참조로 넘기고(ArtifactStore), 최종 결과만
+    JPEG 로 한 번 저장한다. persist_artifacts=True 면 중간 산출물도 PNG 로 남긴다.
+
+    image_path 는 경로 또는 PIL 이미지. plans_out 에 리스트를 넘기면 객체별 최종 배치 계획
+    ({object_id, condition_img, mask, bbox, prompt})을 순서대로 채운다 (draft 세션용).
+    """
+    mode = _resolve_composite_mode(composite_mode)
+    quality = resolve_tier(quality)
+    persist = PERSIST_ARTIFACTS if persist_artifacts is None else persist_artifacts
+    store = ArtifactStore(persist=persist)
+
+    # Step 1 : 자연어 → 객체 리스트
+    with _stage(on_event, "parse"):
+        objects = parse_description(description, room_summary)
+
+    # 현재 합성 이미지 (초기 = 배경, 한 번만 디코딩)
+    graph = StageGraph()
+    current = graph.add("background", lambda _: store.put("background", load_image(image_path, "RGB")))
+
+    def _preview(img, info):
+        if on_event is not None:
+            _emit(on_event, type="preview", mime="image/jpeg", image=encode_preview(img), **info)
+
+    infos = [{"index": idx, "total": len(objects), "label": obj.get("label")}
+             for idx, obj in enumerate(objects)]
+    obj_ids = [str(uuid.uuid4())[:8] for _ in objects]
+
+    # Step 2a. 가구 생성 (전부 동시에 → 마이크로 배처가 한 배치로 묶음)
+    for obj, obj_id, info in zip(objects, obj_ids, infos):
+        _add_lora_stage(graph, obj, obj_id, info, store, on_event, quality)
+
+    # Step 2b. 모든 객체를 한 번에 배치 (LLM 1회 + 충돌 회피)
+    #   가구 생성을 기다리지 않도록 FOPA 점수 없이 — FOPA 는 객체별 미세 조정(2e)에서
+    def layout(r):
+        with _stage(on_event, "layout", total=len(objects)):
+            return plan_layout(r["background"], objects, use_fopa=False)
+
+    layout_stage = graph.add("layout", layout, ["background"])
+
+    if mode == "merged":
+        plans = [
+            _add_object_stages(graph, obj, obj_id, info, current, layout_stage, store, on_event)
+            for obj, obj_id, info in zip(objects, obj_ids, infos)
+        ]
+
+        # Step 2f. 겹치지 않는 객체끼리 한 번에 인페인팅
+        def inpaint_merged(r):
+            img = r["background"]
+            groups = group_non_overlapping([r[p]["bbox"] for p in plans])
+            for g_idx, group in enumerate(groups):
+                info = {"index": g_idx, "total": len(groups), "objects": group}
+                regions = [{k: r[plans[i]][k] for k in ("condition_img", "mask", "bbox", "prompt")}
+                           for i in group]
+                group_id = "_".join(r[plans[i]]["object_id"] for i in group)
+                with _stage(on_event, "inpaint", **info):
+                    img = store.put(f"{group_id}/composite", run_ipadapter_inpaint_merged(
+                        background=img,
+                        regions=regions,
+                        object_id=group_id,
+                        persist=False,
+                        mode=inpaint_mode,
+                        quality=quality,
+                    ))
+                _preview(img, info)
+            return img
+
+        current = graph.add("inpaint", inpaint_merged, [current, *plans], pool="inpaint")
+    else:
+        plans = []
+        for idx, (obj, obj_id, info) in enumerate(zip(objects, obj_ids, infos)):
+            plan = _add_object_stages(graph, obj, obj_id, info, current, layout_stage, store, on_event)
+            plans.append(plan)
+
+            # Step 2f. IP‑Adapter 인페인팅 (이전 합성 결과 위에)
+            def inpaint(r, plan=plan, bg=current, info=info):
+                p = r[plan]
+                with _stage(on_event, "inpaint", **info):
+                    img = store.put(f"{p['object_id']}/composite", run_ipadapter_inpaint(
+                        background=r[bg],
+                        condition_img=p["condition_img"],
+                        mask=p["mask"],
+                        bbox=p["bbox"],
+                        prompt=p["prompt"],
+                        object_id=p["object_id"],
+                        persist=False,
+                        mode=inpaint_mode,
+                        quality=quality,
+                    ))
+                # 중간 합성 미리보기 전송
+                _preview(img, info)
+                return img
+
+            current = graph.add(f"inpaint_{idx}", inpaint, [plan, current], pool="inpaint")
+
+    results, report = graph.run(DAG_POOLS)
+    print(f"[+] 스케줄: wall {report['wall']}s / 스테이지 합 {report['stage_total']}s "
+          f"(겹쳐 실행으로 {report['saved']}s 절약)")
+    _emit(on_event, type="schedule", **report)
+
+    if plans_out is not None:
+        plans_out.extend(results[p] for p in plans)
+    return _save_output(store, results[current])
+
+
+@telemetry.traced("pipeline.draft")
+def draft_interior_pipeline(
+    description: str,
+    image_path: Path,
+    room_summary: str = "",
+    on_event: Optional[EventCallback] = None,
+    composite_mode: Optional[str] = None,
+    inpaint_mode: Optional[str] = None,
+    quality: Optional[str] = None,
+) -> tuple[str, Path]:
+    """레이아웃 반복용 초안: 줄인 배경 + draft 티어로 전체 파이프라인을 돌리고 (세션 id, 결과 경로) 반환
+
+    배경은 긴 변이 DRAFT_MAX_SIDE 가 되도록 줄이고 (LLM 배치 / FOPA / 인페인팅 모두 작은 해상도),
+    quality 생략 시 ROOMIE_DRAFT_QUALITY(기본 draft) 를 쓴다. 객체별 배치 계획과 원본 배경은
+    세션에 남겨 refine_interior_pipeline 이 이어 쓴다 (session 이벤트로도 id 전달).
     """
+    background = load_image(image_path, "RGB")
+    small = background.copy()
+    small.thumbnail((DRAFT_MAX_SIDE, DRAFT_MAX_SIDE))
+    mode = _resolve_composite_mode(composite_mode)
+
+    plans = []
+    output_path = run_interior_pipeline(
+        description, small, room_summary, on_event,
+        composite_mode=mode,
+        inpaint_mode=inpaint_mode,
+        quality=quality or DRAFT_QUALITY,
+        plans_out=plans,
+    )
+    session_id = sessions.create({
+        "background": image_path,
+        "scale": (background.width / small.width, background.height / small.height),
+        "composite_mode": mode,
+        "inpaint_mode": inpaint_mode,
+        "plans": plans,
+    })
+    print(f"[+] 초안 세션 생성: {session_id} (객체 {len(plans)}개, {small.width}x{small.height})")
+    _emit(on_event, type="session", session_id=session_id)
+    return session_id, output_path
 
-    # Step 1 : 자연어 → 객체 리스트
-    objects = parse_description(description)
 
-    # 현재 합성 이미지 (초기 = 배경)
-    current_img = image_path
+def _scale_bbox(bbox: list[int], sx: float, sy: float) -> list[int]:
+    return [round(bbox[0] * sx), round(bbox[1] * sy), round(bbox[2] * sx), round(bbox[3] * sy)]
 
-    for obj in objects:
-        obj_id = str(uuid.uuid4())[:8]
 
-        # Step 2a. 초기 pose 계산 (bbox, yaw, pitch)
-        bbox, yaw, pitch = plan_pose(current_img, obj)
+@telemetry.traced("pipeline.refine")
+def refine_interior_pipeline(
+    session_id: str,
+    on_event: Optional[EventCallback] = None,
+    inpaint_mode: Optional[str] = None,
+    quality: Optional[str] = None,
+) -> Path:
+    """초안 세션의 배치 계획으로 인페인팅만 원본 배경 위에서 다시 실행하고 결과 경로 반환
 
-        # Step 2b. LoRA로 정면 가구 이미지 생성
-        furniture_png = generate_lora_furniture(obj, obj_id)
+    parse / layout / 가구 생성 / 회전 / FOPA 는 건너뛰고, bbox 를 원본 해상도로 키운 뒤
+    마스크도 그 bbox 로 원본 크기에 다시 그린다 (fopa 단계의 final_mask 와 같은 방식).
+    composite_mode 는 초안과 같게 (merged 면 겹치지 않는 객체끼리 한 번에), inpaint_mode 생략 시
+    초안 때 값, quality 생략 시 ROOMIE_REFINE_QUALITY(기본 final).
+    결과는 항상 원본 배경 크기 ("full" 의 512×512 결과는 그룹마다 원본 크기로 되돌림)
+    세션이 없거나 만료됐으면 KeyError.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        raise KeyError(f"초안 세션이 없거나 만료됨: {session_id}")
+    quality = resolve_tier(quality or REFINE_QUALITY)
+    inpaint_mode = inpaint_mode or session["inpaint_mode"]
+    store = ArtifactStore(persist=PERSIST_ARTIFACTS)
+    background = load_image(session["background"], "RGB")
+    img = store.put("background", background)
 
-        # Step 2c. Zero123로 회전 뷰 생성
-        rotated_png = rotate_with_zero123(furniture_png, yaw, pitch, obj_id)
+    sx, sy = session["scale"]
+    plans = []
+    for p in session["plans"]:
+        x1, y1, x2, y2 = bbox = _scale_bbox(p["bbox"], sx, sy)
+        mask = generate_mask(background, [x1, y1, x2 - x1, y2 - y1], p["object_id"], persist=False)
+        plans.append({**p, "bbox": bbox, "mask": mask})
+    if session["composite_mode"] == "merged":
+        groups = group_non_overlapping([p["bbox"] for p in plans])
+    else:
+        groups = [[i] for i in range(len(plans))]
 
-        # Step 2d. bbox → mask 이미지 생성 (흰 = 삽입 영역)
-        mask_png = generate_mask(rotated_png, bbox, obj_id)
+    for g_idx, group in enumerate(groups):
+        info = {"index": g_idx, "total": len(groups), "objects": group}
+        regions = [{k: plans[i][k] for k in ("condition_img", "mask", "bbox", "prompt")} for i in group]
+        group_id = "_".join(plans[i]["object_id"] for i in group)
+        with _stage(on_event, "inpaint", **info):
+            result = run_ipadapter_inpaint_merged(
+                background=img,
+                regions=regions,
+                object_id=group_id,
+                persist=False,
+                mode=inpaint_mode,
+                quality=quality,
+            )
+            if result.size != background.size:     # full 모드 512×512 → 원본 크기 (다음 그룹 bbox / 마스크와 맞춤)
+                result = result.resize(background.size, Image.LANCZOS)
+            img = store.put(f"{group_id}/composite", result)
+        if on_event is not None:
+            _emit(on_event, type="preview", mime="image/jpeg", image=encode_preview(img), **info)
 
-        # Step 2e. (선택) FOPA로 위치 미세 조정
-        best_bbox = run_fopa_selection(current_img, rotated_png, mask_png, bbox) or bbox
+    return _save_output(store, img)
 
-        # Step 2f. IP‑Adapter 인페인팅
-        current_img = run_ipadapter_inpaint(
-            background=current_img,
-            condition_img=rotated_png,
-            mask=mask_png,
-            bbox=best_bbox,
-            prompt=obj.get("prompt", ""),
-            object_id=obj_id,
-        )
 
-    return current_img
+def _save_output(store: ArtifactStore, image) -> Path:
+    """최종 합성 이미지만 JPEG 로 한 번 저장"""
+    store.put("output", image)
+    output_path = store.save("output", ASSET_DIR / f"output_{store.run_id}.jpg", quality=95)
+    print(f"[+] 최종 합성 저장 완료: {output_path}")
+    return output_path
 
 
 if __name__ == "__main__":
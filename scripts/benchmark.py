@@ -0,0 +1,545 @@
+# scripts/benchmark.py
+
+"""
+파이프라인 벤치마크 (CPU, 스텁 모델)
+====================================
+
+실제 가중치 없이 레지스트리 로더를 작은 스텁 모델로 바꿔 끼우고,
+단계별 함수와 `run_interior_pipeline` 전체를 객체 수 × 해상도 조합으로 실행해
+wall time / 최대 RSS / 파일 I/O 를 JSON 으로 기록한다.
+
+    python scripts/benchmark.py --objects 1,2,4 --resolutions 512,1024 --out bench.json
+    python scripts/benchmark.py --baseline bench.json --tolerance 0.25   # 느려지면 exit 1
+
+* LLM      : `modules.llm_cache._call_llm` 을 고정 응답 함수로 교체 (캐시 끔)
+* SD/LoRA, Inpaint, CarveKit, FOPA : `model_registry.register` 로 스텁 로더 등록
+* Zero123  : 이 스크립트 자신을 `--serve` 워커로 띄움 (서브프로세스 왕복 비용은 그대로 측정)
+* 가구 / 시점 / 히트맵 캐시는 케이스마다 비운 임시 디렉터리를 사용 (콜드 실행)
+* --gpu-budget-mb : 메모리 관리자를 시뮬레이션 모드로 켜고 실제 모델 점유량(기본 추정치) 기준
+  예산을 걸어 offload / 재로딩 횟수를 결과의 `memory` 에 기록
+* --quality-tiers draft,standard,final : 품질 티어마다 e2e 를 돌려 티어별 wall time 과 단계별
+  스케줄러 / 스텝 수를 결과의 `tiers` 에 기록
+  - 스텁 모델(기본)   : 지연만 비교 (`quality_proxy` 는 null). 스텁 LoRA / Inpaint 는
+    num_inference_steps 에 비례해 일할 뿐 화질이 없으므로 화질 지표를 만들지 않는다
+  - --real-weights   : 실제 가중치 / Zero123 워커로 실행하고 (LLM 만 고정 응답), 같은 입력·시드의
+    가장 높은 티어(보통 final) 결과 대비 PSNR / SSIM 을 티어별 지연 옆에 기록
+
+최대 RSS 는 케이스 시작 시 /proc/self/clear_refs 로 초기화한 VmHWM,
+파일 I/O 는 /proc/self/io (+ Zero123 워커 프로세스) 의 증가분이다.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# ────────────────────────────── Zero123 스텁 워커 ──────────────────────────────
+
+def serve_zero123_stub():
+    """infer_zero123.py --serve 와 같은 JSON 한 줄 프로토콜 (회전 대신 간단한 이미지 변환)"""
+    from PIL import Image, ImageOps
+
+    out = sys.stdout
+    out.write(json.dumps({"ready": True}) + "\n")
+    out.flush()
+    for line in sys.stdin:
+        job = json.loads(line)
+        try:
+            img = Image.open(job["input"]).convert("RGB")
+            size = job.get("size", 256)
+            poses = job.get("poses") or [[job["yaw"], job["pitch"]]]
+            outputs = job.get("outputs") or [job["output"]]
+            for (yaw, pitch), path in zip(poses, outputs):
+                view = img.rotate(float(yaw) / 10, fillcolor=(255, 255, 255)).resize((size, size))
+                if abs(float(yaw)) > 90:
+                    view = ImageOps.mirror(view)
+                view.save(path)
+            rsp = {"id": job.get("id"), "ok": True, "outputs": outputs, "output": outputs[0]}
+        except Exception as e:
+            rsp = {"id": job.get("id"), "ok": False, "error": str(e)}
+        out.write(json.dumps(rsp) + "\n")
+        out.flush()
+
+
+# ────────────────────────────── 스텁 모델 ──────────────────────────────
+
+class _Result:
+    def __init__(self, images):
+        self.images = images
+
+
+def install_stubs(n_objects_ref: dict, real_weights: bool = False):
+    """레지스트리 로더 / LLM 호출 / Zero123 워커를 스텁으로 교체 (real_weights 면 LLM 만)"""
+    import numpy as np
+    import torch
+    from PIL import Image, ImageDraw, ImageFilter
+
+    from modules import model_registry, zero123_runner
+
+    install_stub_llm(n_objects_ref)
+    if real_weights:
+        return zero123_runner.get_worker()
+
+    def denoise(img, steps):
+        """스텝 수에 비례한 연산만 흉내 냄 (출력은 입력과 거의 같음 — 화질 지표로 쓰지 말 것)"""
+        arr = np.asarray(img, dtype=np.float32)
+        for _ in range(steps):
+            arr = 0.999 * arr + 0.001 * np.roll(arr, 1, axis=0)
+        return Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+
+    class StubLoRA:
+        device = torch.device("cpu")
+
+        def __call__(self, prompts, height, width, generator=None, num_inference_steps=30, **_):
+            images = []
+            for i, _prompt in enumerate(prompts):
+                g = generator[i] if generator else None
+                color = tuple(int(c) for c in (torch.rand(3, generator=g) * 200).tolist())
+                img = Image.new("RGB", (width, height), (255, 255, 255))
+                ImageDraw.Draw(img).ellipse(
+                    [width // 6, height // 4, width * 5 // 6, height * 3 // 4], fill=color)
+                images.append(denoise(img, num_inference_steps))
+            return _Result(images)
+
+    class StubInpaint:
+        def __call__(self, prompt, image, mask_image, height, width, num_inference_steps=30, **_):
+            images = []
+            for img, mask in zip(image, mask_image):
+                img, mask = img.resize((width, height)), mask.resize((width, height))
+                fill = denoise(img.filter(ImageFilter.GaussianBlur(8)), num_inference_steps)
+                images.append(Image.composite(fill, img, mask))
+            return _Result(images)
+
+    def stub_matting(images):
+        out = []
+        for img in images:
+            arr = np.asarray(img.convert("RGB"), dtype=np.int16)
+            alpha = ((255 - arr).sum(axis=2) > 30).astype(np.uint8) * 255
+            rgba = img.convert("RGBA")
+            rgba.putalpha(Image.fromarray(alpha))
+            out.append(rgba)
+        return out
+
+    class TinyFopa(torch.nn.Module):
+        """FOPA 입력 규약(bg, fg, mask → 히트맵)을 따르는 작은 합성곱"""
+
+        def __init__(self):
+            super().__init__()
+            torch.manual_seed(0)
+            self.conv = torch.nn.Conv2d(7, 1, kernel_size=5, padding=2)
+
+        def forward(self, bg, fg, mask):
+            return self.conv(torch.cat([bg, fg, mask], dim=1))
+
+    for name, loader in {
+        "sd_lora": StubLoRA,
+        "sd_inpaint": StubInpaint,
+        "carvekit": lambda: stub_matting,
+        "fopa": lambda: TinyFopa().eval(),
+    }.items():
+        model_registry.register(name)(loader)
+        model_registry.unload(name)
+
+    worker = zero123_runner.Zero123Worker(python=sys.executable, script=str(Path(__file__).resolve()),
+                                          config="stub", checkpoint="stub")
+    zero123_runner._worker = worker
+    return worker
+
+
+def install_stub_llm(n_objects_ref: dict):
+    """LLM 호출을 고정 응답으로 (객체 수는 n_objects_ref["n"])"""
+    from modules import llm_cache
+
+    def stub_llm(model, messages, temperature):
+        user = messages[-1]["content"]
+        pose = {"x1": 0.1, "y1": 0.55, "x2": 0.3, "y2": 0.8, "yaw": 30, "pitch": -5}
+        if "Place all of these objects" in user:
+            n = user.count("' positioned '")
+            return json.dumps([{**pose, "i": i, "x1": 0.05 + 0.9 * i / max(n, 1),
+                                "x2": 0.05 + 0.9 * (i + 0.8) / max(n, 1)} for i in range(n)])
+        if "Place the object" in user:
+            return json.dumps(pose)
+        return json.dumps([{"label": f"object{i}", "rel": ["left_wall", "right_wall", "back_wall", "center"][i % 4],
+                            "prompt": f"furniture {i}"} for i in range(n_objects_ref["n"])])
+
+    llm_cache._call_llm = stub_llm
+
+
+def isolate_caches(tmp: Path):
+    """콜드 실행: 가구 / 시점 / 히트맵 캐시와 출력 경로를 새 임시 디렉터리로"""
+    import pipeline
+    from modules import asset_cache, furniture_generator, zero123_runner, fopa_runner, mask_generator
+
+    furniture_generator.furniture_cache = asset_cache.AssetCache(tmp / "furniture", max_bytes=1 << 30)
+    zero123_runner.VIEW_CACHE_DIR = tmp / "zero123_views"
+    fopa_runner._heatmaps.clear()
+    pipeline.ASSET_DIR = tmp
+    mask_generator.ASSET_DIR = tmp
+
+
+# ────────────────────────────── 측정 ──────────────────────────────
+
+def _read_io(pid="self") -> dict:
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            return {k: int(v) for k, v in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def measure(name: str, fn, worker=None, **meta) -> dict:
+    child_pid = worker.proc.pid if worker is not None and worker._alive() else None
+    _reset_peak_rss()
+    io0, cio0 = _read_io(), _read_io(child_pid) if child_pid else {}
+    t0 = time.perf_counter()
+    extra = fn()
+    wall = time.perf_counter() - t0
+    io1, cio1 = _read_io(), _read_io(child_pid) if child_pid else {}
+
+    io = {k: io1[k] - io0.get(k, 0) for k in ("rchar", "wchar", "read_bytes", "write_bytes") if k in io1}
+    for k in ("rchar", "wchar", "read_bytes", "write_bytes"):
+        if k in cio1:
+            io[k] = io.get(k, 0) + cio1[k] - cio0.get(k, 0)
+    case = {"name": name, **meta, "wall_s": round(wall, 4), "peak_rss_mb": round(_peak_rss_mb(), 1), "io": io}
+    if isinstance(extra, dict):
+        case.update(extra)
+    print(f"[bench] {name:<40} {wall * 1000:9.1f} ms  rss {case['peak_rss_mb']:8.1f} MB", file=sys.stderr)
+    return case
+
+
+# ────────────────────────────── 케이스 ──────────────────────────────
+
+def make_background(path: Path, res: int):
+    from PIL import Image, ImageDraw
+
+    w, h = res, res * 3 // 4
+    img = Image.new("RGB", (w, h), (225, 220, 210))
+    ImageDraw.Draw(img).polygon([(0, h * 0.6), (w, h * 0.6), (w, h), (0, h)], fill=(170, 140, 110))
+    img.save(path)
+
+
+def run_stage_cases(res: int, tmp: Path, worker, repeat: int) -> list:
+    from PIL import Image
+    from modules.description_parser import parse_description
+    from modules.pose_planner import plan_pose, plan_layout
+    from modules.furniture_generator import _lora_batcher, IMAGE_SIZE
+    from modules.quality import sampler_for
+    from modules.model_registry import get_model
+    from modules.zero123_runner import rotate_with_zero123
+    from modules.mask_generator import generate_mask, merge_masks
+    from modules.fopa_runner import run_fopa_selection
+    from modules.ipadapter_inpaint import run_ipadapter_inpaint
+
+    bg_path = tmp / f"bg_{res}.jpg"
+    make_background(bg_path, res)
+    bg = Image.open(bg_path).convert("RGB")
+    meta = {"stage": True, "objects": 1, "resolution": res}
+    cases, state = [], {}
+
+    def lora():
+        key = ("sd_lora", IMAGE_SIZE, IMAGE_SIZE, *sampler_for("lora"))
+        state["rgb"] = _lora_batcher.submit(key, ("bench sofa", 0))
+
+    def matting():
+        state["rgba"] = get_model("carvekit")([state["rgb"]])[0]
+        state["obj"] = {"label": "sofa", "rel": "left_wall", "prompt": "bench sofa", "fg_image": state["rgba"]}
+        state["fg_path"] = tmp / f"fg_{res}_{uuid.uuid4().hex[:6]}.png"
+        state["rgba"].save(state["fg_path"])
+
+    def pose():
+        state["bbox"], state["yaw"], state["pitch"] = plan_pose(bg, state["obj"])
+
+    def rotate():
+        state["rotated"] = Image.open(rotate_with_zero123(str(state["fg_path"]), state["yaw"],
+                                                          state["pitch"], "bench")).convert("RGB")
+
+    def mask():
+        state["mask"] = generate_mask(state["rotated"], state["bbox"], "bench", persist=False)
+
+    def fopa():
+        run_fopa_selection(bg, state["rotated"], state["mask"], state["bbox"])
+
+    def inpaint(mode):
+        return lambda: run_ipadapter_inpaint(bg, state["rotated"], state["mask"], state["bbox"],
+                                             "bench sofa", "bench", persist=False, mode=mode)
+
+    stages = [
+        ("parse", lambda: parse_description("bench room")),
+        ("lora", lora),
+        ("matting", matting),
+        ("plan_pose", pose),
+        ("plan_layout", lambda: plan_layout(bg, [state["obj"]])),
+        ("zero123", rotate),
+        ("mask", mask),
+        # 기본(persist=True) 경로 — merged 모드 마스크 저장
+        ("mask_merge", lambda: merge_masks([state["bbox"]], bg.size, "bench")),
+        ("fopa", fopa),
+        ("inpaint_full", inpaint("full")),
+        ("inpaint_region", inpaint("region")),
+    ]
+    for r in range(repeat):
+        isolate_caches(tmp / f"stage_{res}_{r}")
+        for name, fn in stages:
+            cases.append(measure(f"stage/{name}/{res}", fn, worker, repeat=r, **meta))
+    return cases
+
+
+def run_e2e_cases(n: int, res: int, tmp: Path, worker, n_ref: dict, repeat: int, composite_mode: str,
+                  quality: str | None = None, outputs: dict | None = None) -> list:
+    """outputs 에 dict 를 넘기면 반복마다 결과 이미지(RGB 배열)를 outputs[repeat] 에 담는다 (티어 화질 비교용)"""
+    import torch
+    from PIL import Image
+    from pipeline import run_interior_pipeline
+
+    bg_path = tmp / f"bg_{res}.jpg"
+    make_background(bg_path, res)
+    n_ref["n"] = n
+    name = f"e2e/{composite_mode}/{n}obj/{res}" + (f"/{quality}" if quality else "")
+    cases = []
+    for r in range(repeat):
+        isolate_caches(tmp / f"e2e_{n}_{res}_{composite_mode}_{quality or 'default'}_{r}")
+        events, out = [], {}
+
+        def run():
+            torch.manual_seed(r)      # 시드가 없는 단계(인페인팅)도 티어 간 같은 노이즈에서 시작
+            out["path"] = run_interior_pipeline("bench room", bg_path, on_event=events.append,
+                                                composite_mode=composite_mode, quality=quality)
+            stage_s = {}
+            for e in events:
+                if e.get("type") == "stage" and e.get("status") == "end":
+                    stage_s[e["stage"]] = round(stage_s.get(e["stage"], 0.0) + e["elapsed"], 4)
+            schedule = next((e for e in events if e.get("type") == "schedule"), {})
+            return {"stage_s": stage_s, "overlap_saved_s": schedule.get("saved")}
+
+        cases.append(measure(name, run, worker, stage=False, objects=n, resolution=res,
+                             repeat=r, quality=quality))
+        if outputs is not None:       # 측정 밖에서 디코딩 (임시 디렉터리가 지워지기 전에)
+            import numpy as np
+            outputs[r] = np.asarray(Image.open(out["path"]).convert("RGB"), dtype=np.float64)
+    return cases
+
+
+# ────────────────────────────── 티어 화질 비교 ──────────────────────────────
+
+def psnr(a, b) -> float:
+    import numpy as np
+
+    mse = float(np.mean((a - b) ** 2))
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def ssim(a, b, block: int = 8) -> float:
+    """휘도 SSIM, 겹치지 않는 block×block 창 평균 (a, b 는 같은 크기의 RGB 배열)"""
+    import numpy as np
+
+    ya, yb = (x @ np.array([0.299, 0.587, 0.114]) for x in (a, b))
+    h, w = (ya.shape[0] // block) * block, (ya.shape[1] // block) * block
+    ya, yb = (y[:h, :w].reshape(h // block, block, w // block, block).swapaxes(1, 2).reshape(-1, block * block)
+              for y in (ya, yb))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ma, mb = ya.mean(1), yb.mean(1)
+    va, vb = ya.var(1), yb.var(1)
+    cov = ((ya - ma[:, None]) * (yb - mb[:, None])).mean(1)
+    return float(np.mean((2 * ma * mb + c1) * (2 * cov + c2) / ((ma ** 2 + mb ** 2 + c1) * (va + vb + c2))))
+
+
+def score_tiers(cases: list, outputs: dict, reference: str):
+    """같은 (모드, 객체 수, 해상도, 반복) 의 reference 티어 결과 대비 PSNR / SSIM 을 케이스에 기록"""
+    for c in cases:
+        key = c.get("quality"), c["name"].rsplit("/", 1)[0], c["repeat"]
+        ref = outputs.get((reference, key[1], key[2]))
+        img = outputs.get(key)
+        if ref is None or img is None or c["quality"] == reference:
+            continue
+        if img.shape != ref.shape:
+            continue
+        c["psnr_vs_ref"] = round(psnr(img, ref), 2)
+        c["ssim_vs_ref"] = round(ssim(img, ref), 4)
+
+
+def summarize_tiers(cases: list, reference: str | None = None) -> dict:
+    """티어별 평균 wall time, 단계별 스케줄러 / 스텝 수, reference 티어 대비 평균 PSNR / SSIM
+
+    reference 가 None 이면 (스텁 모델) 지연만 비교 — quality_proxy 는 null.
+    """
+    from modules.quality import sampler_for
+
+    by_tier = {}
+    for c in cases:
+        if c.get("quality"):
+            by_tier.setdefault(c["quality"], []).append(c)
+
+    def mean(values):
+        return round(sum(values) / len(values), 4) if values else None
+
+    summary = {}
+    for tier, cs in by_tier.items():
+        if reference is None:
+            proxy = None
+        elif tier == reference:
+            proxy = {"reference": reference, "psnr_db": None, "ssim": 1.0}
+        else:
+            proxy = {
+                "reference": reference,
+                "psnr_db": mean([c["psnr_vs_ref"] for c in cs if "psnr_vs_ref" in c]),
+                "ssim": mean([c["ssim_vs_ref"] for c in cs if "ssim_vs_ref" in c]),
+            }
+        summary[tier] = {
+            "cases": len(cs),
+            "mean_wall_s": mean([c["wall_s"] for c in cs]),
+            "quality_proxy": proxy,
+            "samplers": {stage: sampler_for(stage, tier)._asdict() for stage in ("lora", "inpaint", "controlcom")},
+        }
+    return summary
+
+
+def compare(cases: list, baseline_path: Path, tolerance: float) -> list:
+    """baseline 대비 (같은 이름 케이스 최소 wall time 기준) 느려진 케이스 목록"""
+    def best(cs):
+        out = {}
+        for c in cs:
+            out[c["name"]] = min(out.get(c["name"], float("inf")), c["wall_s"])
+        return out
+
+    base = best(json.loads(baseline_path.read_text())["cases"])
+    now = best(cases)
+    return [{"name": k, "baseline_s": base[k], "now_s": v, "ratio": round(v / base[k], 3)}
+            for k, v in now.items() if k in base and base[k] > 0 and v > base[k] * (1 + tolerance)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--objects", default="1,2,4")
+    ap.add_argument("--resolutions", default="512,1024")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--composite-modes", default="sequential,merged")
+    ap.add_argument("--skip-stages", action="store_true")
+    ap.add_argument("--out", type=Path)
+    ap.add_argument("--baseline", type=Path)
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--gpu-budget-mb", type=float)
+    ap.add_argument("--quality-tiers", default="", help="예: draft,standard,final (비우면 ROOMIE_QUALITY 한 번)")
+    ap.add_argument("--real-weights", action="store_true",
+                    help="스텁 대신 실제 모델 / Zero123 워커 (티어별 PSNR / SSIM 기록)")
+    args = ap.parse_args()
+
+    os.environ["ROOMIE_LLM_CACHE"] = "off"
+    os.environ.setdefault("ROOMIE_SPAN_LOG", "")     # 스팬 로그가 측정 출력에 섞이지 않게
+    sys.path.insert(0, str(ROOT))
+    if args.gpu_budget_mb:
+        from modules.memory_manager import DEFAULT_FOOTPRINT_MB
+        os.environ["ROOMIE_MEMORY_SIMULATE"] = "1"
+        os.environ["ROOMIE_GPU_BUDGET_MB"] = str(args.gpu_budget_mb)
+        os.environ.setdefault("ROOMIE_MODEL_FOOTPRINT_MB",
+                              ",".join(f"{k}={v}" for k, v in DEFAULT_FOOTPRINT_MB.items()))
+
+    n_ref = {"n": 1}
+    worker = install_stubs(n_ref, real_weights=args.real_weights)
+    objects = [int(v) for v in args.objects.split(",")]
+    resolutions = [int(v) for v in args.resolutions.split(",")]
+    tiers = [t for t in args.quality_tiers.split(",") if t]
+
+    # 화질 비교 기준: 요청한 티어 중 가장 높은 것 (실제 가중치일 때만)
+    reference = None
+    if tiers and args.real_weights:
+        from modules.quality import TIERS
+        reference = max(tiers, key=list(TIERS).index)
+    outputs = {}
+
+    cases = []
+    with tempfile.TemporaryDirectory(prefix="roomie-bench-") as tmp:
+        tmp = Path(tmp)
+        try:
+            for res in resolutions:
+                if not args.skip_stages:
+                    cases += run_stage_cases(res, tmp, worker, args.repeat)
+                for mode in args.composite_modes.split(","):
+                    for n in objects:
+                        for quality in tiers or [None]:
+                            tier_out = {} if reference else None
+                            new = run_e2e_cases(n, res, tmp, worker, n_ref, args.repeat, mode, quality,
+                                                outputs=tier_out)
+                            for r, img in (tier_out or {}).items():
+                                outputs[(quality, new[0]["name"].rsplit("/", 1)[0], r)] = img
+                            cases += new
+        finally:
+            worker.close()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    result = {
+        "meta": {
+            "timestamp": time.time(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "objects": objects,
+            "resolutions": resolutions,
+            "repeat": args.repeat,
+            "quality_tiers": tiers,
+            "real_weights": args.real_weights,
+            "quality_proxy": f"PSNR / SSIM vs {reference}" if reference else "none (stub models, latency only)",
+        },
+        "cases": cases,
+    }
+    if tiers:
+        if reference:
+            score_tiers(cases, outputs, reference)
+        result["tiers"] = summarize_tiers(cases, reference)
+    if args.gpu_budget_mb:
+        from modules import model_registry
+        result["memory"] = model_registry.memory.stats()
+
+    if args.baseline:
+        result["regressions"] = compare(cases, args.baseline, args.tolerance)
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        args.out.write_text(text)
+    else:
+        print(text)
+
+    if result.get("regressions"):
+        for r in result["regressions"]:
+            print(f"[regression] {r['name']}: {r['baseline_s']}s → {r['now_s']}s (x{r['ratio']})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:      # Zero123Worker 가 스텁 워커로 띄운 경우
+        serve_zero123_stub()
+    else:
+        main()
@@ -0,0 +1,83 @@
+# scripts/llm_stub_server.py
+
+"""
+로컬 LLM 스텁 서버 (OpenAI 호환 /v1/chat/completions)
+=====================================================
+
+네트워크 없이 `modules.llm_client` 의 타임아웃 / 재시도 / 회로 차단기와
+파이프라인 LLM 단계를 시험하기 위한 서버.
+
+    python scripts/llm_stub_server.py --port 8901 --latency 0.2 --fail-rate 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 uvicorn main:app
+
+* --latency   : 응답마다 기다리는 시간(초) → 데드라인 시험
+* --fail-rate : 이 비율만큼 --fail-status 로 응답 → 재시도 / 회로 차단기 시험
+* 응답 내용은 요청 종류(설명 파싱 / 단일 pose / 전체 layout)에 맞는 고정 JSON
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+opts = argparse.Namespace(latency=0.0, fail_rate=0.0, fail_status=503)
+
+_OBJECTS = [
+    {"label": "sofa", "rel": "left_wall", "color/material": "mint fabric",
+     "prompt": "a mint fabric sofa, product photo, white background"},
+    {"label": "table", "rel": "center", "color/material": "oak wood",
+     "prompt": "a small oak wood coffee table, product photo, white background"},
+]
+_POSE = {"x1": 0.1, "y1": 0.55, "x2": 0.35, "y2": 0.8, "yaw": 30, "pitch": -5}
+
+
+def _answer(messages: list[dict]) -> str:
+    user = messages[-1]["content"] if messages else ""
+    if "Place all of these objects" in user:
+        n = len(re.findall(r"^\d+\. ", user, re.M))
+        return json.dumps([
+            {"i": i, **_POSE, "x1": round(0.05 + 0.3 * i, 2), "x2": round(0.3 + 0.3 * i, 2)}
+            for i in range(n)
+        ])
+    if "Place the object" in user:
+        return json.dumps(_POSE)
+    return json.dumps(_OBJECTS, ensure_ascii=False)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if opts.latency:
+        await asyncio.sleep(opts.latency)
+    if random.random() < opts.fail_rate:
+        return JSONResponse({"error": {"message": "stub failure"}}, status_code=opts.fail_status)
+
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": _answer(body.get("messages", []))},
+            "finish_reason": "stop",
+        }],
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8901)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--fail-status", type=int, default=503)
+    opts = ap.parse_args()
+    uvicorn.run(app, host=opts.host, port=opts.port)
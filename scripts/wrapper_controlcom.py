@@ -20,7 +20,13 @@ INFERENCE_SCRIPT = CTRL_PATH / "scripts" / "inference.py"
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--text", type=str, required=True)
+    parser.add_argument("--background", type=str, required=True)
+    parser.add_argument("--foreground", type=str, required=True)
+    parser.add_argument("--bbox", type=int, nargs=4, required=True)   # x1 y1 x2 y2 (픽셀)
+    parser.add_argument("--fg-mask", type=str)
+    parser.add_argument("--task", type=str, default="composition")   # blending/harmonization/viewsynthesis/composition
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--scale", type=float, default=5)
     parser.add_argument("--out", type=str, required=True)
     args = parser.parse_args()
 
@@ -34,17 +40,18 @@ def main():
     fg_dir.mkdir()
     bbox_dir.mkdir()
 
-    # 테스트용 더미 파일 생성 (실제 파이프라인에서는 이 부분을 구현해야 함)
-    dummy_img = Path("assets/input.jpg")
-    dummy_bbox = "256 256 512 512"  # x1, y1, x2, y2 (normalized 아님)
+    # 입력 파일 배치 (inference.py 는 같은 이름의 background / foreground / bbox 를 찾음)
+    bg_path = bg_dir / "input.png"
+    fg_path = fg_dir / "input.png"
+    bbox_path = bbox_dir / "input.txt"
 
-    bg_path = bg_dir / "dummy.jpg"
-    fg_path = fg_dir / "dummy.jpg"
-    bbox_path = bbox_dir / "dummy.txt"
-
-    bg_path.write_bytes(dummy_img.read_bytes())
-    fg_path.write_bytes(dummy_img.read_bytes())
-    bbox_path.write_text(dummy_bbox)
+    bg_path.write_bytes(Path(args.background).read_bytes())
+    fg_path.write_bytes(Path(args.foreground).read_bytes())
+    bbox_path.write_text(" ".join(map(str, args.bbox)))  # x1, y1, x2, y2 (normalized 아님)
+    if args.fg_mask:
+        mask_dir = tmp_dir / "foreground_mask"
+        mask_dir.mkdir()
+        (mask_dir / "input.png").write_bytes(Path(args.fg_mask).read_bytes())
 
     # 🔧 ControlCom inference 실행
     result_dir = tmp_dir / "results"
@@ -54,7 +61,9 @@ def main():
         "python", str(INFERENCE_SCRIPT),
         "--testdir", str(tmp_dir),
         "--outdir", str(result_dir),
-        "--task", "composition",  # or blending/harmonization/viewsynthesis
+        "--task", args.task,
+        "--sample_steps", str(args.steps),
+        "--scale", str(args.scale),
         "--skip_grid"
     ]
 